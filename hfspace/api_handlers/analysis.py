@@ -1,13 +1,201 @@
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from utils.turso_client import TursoClient
 from utils.subtitle_parser import SubtitleParser
+from utils.analysis_context import AnalysisContext
+from utils.lexicon import Lexicon, get_lexicon, lexicon_identity
+from utils.corpus import CorpusFrequencies
+from utils.job_queue import AnalysisJobQueue, JobQueueFullError
+from utils.executors import call_cpu, run_io
+from utils.response import entity_tag
+from utils.tracing import span
+from config.settings import ANALYSIS_INLINE_WAIT
 import json
+import time
+from collections import Counter
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
-async def handle_movie_analysis(movie_id: str, turso_client: TursoClient, subtitle_parser: SubtitleParser) -> Dict[str, Any]:
-    """處理影片分析請求"""
+# 各分析區段的版本，修改某個分析器時只需遞增該區段，其餘區段沿用既有結果
+SECTION_VERSIONS = {
+    "movie_info": 1,
+    "subtitle_statistics": 3,
+    "dialogue_analysis": 1,
+    "pacing_analysis": 1,
+    "vocabulary_analysis": 2,
+    "phrase_analysis": 1,
+    "difficulty_assessment": 2,
+    "learning_recommendations": 1
+}
+# 以其他區段結果為輸入的區段，上游重算時一併重算
+SECTION_DEPENDENCIES = {
+    "difficulty_assessment": ("vocabulary_analysis",),
+    "learning_recommendations": ("vocabulary_analysis", "difficulty_assessment")
+}
+# 結果取決於詞表內容的區段：詞表部署、移除或重新編譯時需重算（下游區段由 with_dependents 一併重算）
+LEXICON_SECTIONS = ("difficulty_assessment",)
+COMPREHENSIVE_ANALYSIS = "comprehensive"
+# 最長對話摘要只附上文字開頭，完整內容由字幕端點依條目範圍取得
+DIALOGUE_EXCERPT_CHARS = 200
+SUPPORTED_ANALYSIS_TYPES = (COMPREHENSIVE_ANALYSIS,)
+
+# 語速分級門檻（每分鐘說話時間內的字數）
+FAST_SPEECH_WPM = 170
+MEDIUM_SPEECH_WPM = 140
+
+# TF-IDF 生字：最短字長，與 IDF 至少需達只出現在一部影片時 IDF 的比例
+MIN_VOCABULARY_LENGTH = 3
+RARE_IDF_RATIO = 0.6
+
+# 每部影片保留的片語數（分析結果與 movie_phrases）
+PHRASE_LIMIT = 30
+
+# 詞彙複雜度評分：達到覆蓋率目標所需的 CEFR 等級
+COVERAGE_LEVEL_POINTS = {"A1": 10, "A2": 10, "B1": 20, "B2": 25, "C1": 30, "C2": 30}
+
+async def handle_movie_analysis(movie_id: str, turso_client: TursoClient, subtitle_parser: SubtitleParser,
+                                job_queue: Optional[AnalysisJobQueue] = None) -> Dict[str, Any]:
+    """處理影片分析請求；有工作佇列時交由背景執行，短時間內完成則直接回傳結果"""
+    if not movie_id:
+        return {
+            "success": False,
+            "error": "影片 ID 不能為空",
+            "message": "請提供有效的 IMDb ID"
+        }
+
+    try:
+        if not job_queue:
+            # 同步分析在 I/O 執行緒等待，分析器本身在程序池執行
+            return await run_io(analyze_movie, movie_id, turso_client, subtitle_parser)
+
+        cached = await run_io(_cached_analysis_response, movie_id, turso_client)
+        if cached:
+            return cached
+
+        job, future = await run_io(job_queue.submit_with_future, movie_id, COMPREHENSIVE_ANALYSIS)
+        if not future.done() and ANALYSIS_INLINE_WAIT > 0:
+            # asyncio.wait 逾時不會取消背景工作，佇列關閉時被取消的工作也不會拋出例外
+            await asyncio.wait([asyncio.wrap_future(future)], timeout=ANALYSIS_INLINE_WAIT)
+        if future.done() and not future.cancelled():
+            # 工作已完成（包含在提交期間就完成的工作），直接回傳結果
+            return future.result()
+
+        job = {**job, **(await run_io(job_queue.get, job['job_id']) or {})}
+        return _job_pending_response(job)
+
+    except JobQueueFullError as e:
+        return {
+            "success": False,
+            "error": "分析佇列已滿",
+            "message": str(e)
+        }
+    except Exception as e:
+        logger.error(f"處理影片分析請求失敗: {e}")
+        return {
+            "success": False,
+            "error": "影片分析失敗",
+            "message": str(e)
+        }
+
+async def handle_analysis_read(movie_id: str, turso_client: TursoClient) -> Dict[str, Any]:
+    """讀取已儲存且未過期的分析結果（唯讀，不觸發分析）"""
+    try:
+        cached = await run_io(_cached_analysis_response, movie_id, turso_client) if movie_id else None
+        if cached:
+            return cached
+        return {
+            "success": False,
+            "error": "尚未分析",
+            "message": f"影片 {movie_id} 尚無最新的分析結果，請以 POST /movies/{movie_id}/analyze 分析"
+        }
+    except Exception as e:
+        logger.error(f"讀取分析結果失敗 {movie_id}: {e}")
+        return {
+            "success": False,
+            "error": "讀取分析結果失敗",
+            "message": str(e)
+        }
+
+def _cached_analysis_response(movie_id: str, turso_client: TursoClient) -> Optional[Dict[str, Any]]:
+    """已有且與目前字幕內容及分析器版本相符的分析結果時的回應"""
+    if not turso_client:
+        return None
+
+    existing_analysis = turso_client.get_analysis(movie_id, COMPREHENSIVE_ANALYSIS)
+    if not existing_analysis:
+        return None
+
+    content_hash = turso_client.get_subtitle_content_hash(movie_id)
+    if stale_sections(existing_analysis, content_hash):
+        return None
+
+    logger.info("使用快取的分析結果")
+    return {
+        "success": True,
+        "cached": True,
+        "data": {
+            "imdb_id": movie_id,
+            "analysis": json.loads(existing_analysis.get('data', '{}')),
+            "created_at": existing_analysis.get('created_at'),
+            "content_hash": content_hash,
+            "analyzer_version": existing_analysis.get('analyzer_version')
+        },
+        "cache_key": ("analysis", movie_id, content_hash, existing_analysis.get('analyzer_version'),
+                      existing_analysis.get('created_at')),
+        "message": "使用快取分析結果"
+    }
+
+def analysis_etag(movie_id: str, turso_client: TursoClient) -> Optional[str]:
+    """分析結果的 ETag：只讀取版本欄位與字幕內容雜湊，結果過期（需要重算）時不提供"""
+    if not movie_id or not turso_client:
+        return None
+
+    version = turso_client.get_analysis_version(movie_id, COMPREHENSIVE_ANALYSIS)
+    content_hash = turso_client.get_subtitle_content_hash(movie_id)
+    if not version or stale_sections(version, content_hash):
+        return None
+    return entity_tag("analysis", movie_id, content_hash, version.get('analyzer_version'), version.get('created_at'))
+
+def section_versions() -> Dict[str, Any]:
+    """各區段目前的版本：程式版本，依賴詞表的區段再加上詞表識別（第一次呼叫時載入詞表）"""
+    identity = lexicon_identity()
+    return {name: f"{version}:{identity}" if name in LEXICON_SECTIONS else version
+            for name, version in SECTION_VERSIONS.items()}
+
+def analyzer_version() -> str:
+    """整體分析器版本（含詞表識別），工作去重與批次分析檢查點以此區分"""
+    return hashlib.sha1(json.dumps(section_versions(), sort_keys=True).encode()).hexdigest()[:12]
+
+def stale_sections(existing_analysis: Optional[Dict], content_hash: Optional[str]) -> List[str]:
+    """需要重算的區段：字幕內容改變時全部重算，否則只重算版本不符的區段"""
+    if not existing_analysis or not content_hash or existing_analysis.get('content_hash') != content_hash:
+        return list(SECTION_VERSIONS)
+
+    try:
+        stored_versions = json.loads(existing_analysis.get('section_versions') or '{}')
+    except (TypeError, ValueError):
+        stored_versions = {}
+
+    return [name for name, version in section_versions().items() if stored_versions.get(name) != version]
+
+def _job_pending_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """分析仍在背景執行時的回應"""
+    return {
+        "success": True,
+        "pending": True,
+        "data": {
+            "imdb_id": job.get('movie_id'),
+            "job": job,
+            "status_endpoint": f"/jobs/{job.get('job_id')}"
+        },
+        "message": "影片分析已排入背景工作，請以工作 ID 查詢進度"
+    }
+
+async def handle_movie_phrases(movie_id: str, data: Dict[str, Any], turso_client: TursoClient) -> Dict[str, Any]:
+    """處理影片片語請求（需先完成影片分析）"""
     try:
         if not movie_id:
             return {
@@ -16,23 +204,44 @@ async def handle_movie_analysis(movie_id: str, turso_client: TursoClient, subtit
                 "message": "請提供有效的 IMDb ID"
             }
 
+        limit = min(int(data.get('limit', PHRASE_LIMIT)), PHRASE_LIMIT)
+        phrases = await run_io(turso_client.get_movie_phrases, movie_id, limit) if turso_client else []
+        if not phrases:
+            return {
+                "success": False,
+                "error": "找不到片語",
+                "message": f"影片 {movie_id} 尚無片語資料，請先分析影片"
+            }
+
+        return {
+            "success": True,
+            "data": {"imdb_id": movie_id, "phrases": phrases},
+            "message": f"取得 {len(phrases)} 個片語"
+        }
+
+    except Exception as e:
+        logger.error(f"取得片語失敗 {movie_id}: {e}")
+        return {
+            "success": False,
+            "error": "取得片語失敗",
+            "message": str(e)
+        }
+
+def analyze_movie(movie_id: str, turso_client: TursoClient, subtitle_parser: SubtitleParser) -> Dict[str, Any]:
+    """同步執行影片分析並儲存結果（供背景工作與無佇列時使用），只重算過期的區段"""
+    try:
         logger.info(f"開始分析影片: {movie_id}")
 
-        # 檢查是否已有分析結果
+        # 檢查是否已有分析結果，並判斷哪些區段過期
+        existing_analysis = None
+        content_hash = None
         if turso_client:
-            existing_analysis = turso_client.get_analysis(movie_id, "comprehensive")
-            if existing_analysis:
-                logger.info("使用快取的分析結果")
-                return {
-                    "success": True,
-                    "cached": True,
-                    "data": {
-                        "imdb_id": movie_id,
-                        "analysis": json.loads(existing_analysis.get('data', '{}')),
-                        "created_at": existing_analysis.get('created_at')
-                    },
-                    "message": "使用快取分析結果"
-                }
+            existing_analysis = turso_client.get_analysis(movie_id, COMPREHENSIVE_ANALYSIS)
+            content_hash = turso_client.get_subtitle_content_hash(movie_id)
+
+        sections = with_dependents(stale_sections(existing_analysis, content_hash))
+        if not sections:
+            return _cached_analysis_response(movie_id, turso_client)
 
         # 取得影片資訊
         movie_info = None
@@ -58,27 +267,35 @@ async def handle_movie_analysis(movie_id: str, turso_client: TursoClient, subtit
                 "message": f"影片 {movie_id} 沒有字幕資料，請先抓取字幕"
             }
 
-        # 執行各種分析
-        analysis_results = {
-            "movie_info": {
-                "title": movie_info.get('title'),
-                "year": movie_info.get('year'),
-                "imdb_id": movie_id
-            },
-            "subtitle_statistics": analyze_subtitle_statistics(subtitle_entries, subtitle_parser),
-            "dialogue_analysis": analyze_dialogues(subtitle_entries, subtitle_parser),
-            "vocabulary_analysis": analyze_vocabulary(subtitle_entries),
-            "difficulty_assessment": assess_difficulty(subtitle_entries),
-            "learning_recommendations": generate_learning_recommendations(subtitle_entries)
-        }
+        # 字幕內容未變時沿用未過期的區段
+        previous = None
+        if len(sections) < len(SECTION_VERSIONS):
+            previous = json.loads(existing_analysis.get('data', '{}'))
+            logger.info(f"部分重算分析區段: {sections}")
+
+        # 生字需要語料庫文件頻率（舊資料在此補建索引）
+        corpus = None
+        if turso_client and "vocabulary_analysis" in sections:
+            corpus = turso_client.get_movie_corpus_frequencies(movie_id, subtitle_entries)
+
+        # 執行各種分析（程序池，呼叫端為工作執行緒）
+        analysis_results = call_cpu(run_analysis, movie_info, movie_id, subtitle_entries, subtitle_parser,
+                                    sections=sections, previous=previous, corpus=corpus)
 
         # 儲存分析結果
         if turso_client:
             turso_client.save_analysis({
                 "movie_id": movie_id,
-                "analysis_type": "comprehensive",
-                "data": analysis_results
+                "analysis_type": COMPREHENSIVE_ANALYSIS,
+                "data": analysis_results,
+                "content_hash": content_hash,
+                "analyzer_version": analyzer_version(),
+                "section_versions": section_versions()
             })
+            # 語料庫索引早於相似影片索引的影片在此補建簽章
+            turso_client.ensure_minhash(movie_id)
+            if "phrase_analysis" in sections:
+                turso_client.save_movie_phrases({movie_id: analysis_results.get("phrase_analysis", {}).get("phrases", [])})
 
         logger.info(f"影片分析完成: {movie_info.get('title')}")
 
@@ -88,6 +305,9 @@ async def handle_movie_analysis(movie_id: str, turso_client: TursoClient, subtit
             "data": {
                 "imdb_id": movie_id,
                 "analysis": analysis_results,
+                "content_hash": content_hash,
+                "analyzer_version": analyzer_version(),
+                "recomputed_sections": sections,
                 "summary": {
                     "total_subtitles": len(subtitle_entries),
                     "duration_minutes": analysis_results.get("subtitle_statistics", {}).get("total_duration_formatted", "未知"),
@@ -99,71 +319,112 @@ async def handle_movie_analysis(movie_id: str, turso_client: TursoClient, subtit
         }
 
     except Exception as e:
-        logger.error(f"處理影片分析請求失敗: {e}")
+        logger.error(f"影片分析失敗 {movie_id}: {e}")
         return {
             "success": False,
             "error": "影片分析失敗",
             "message": str(e)
         }
 
-def analyze_subtitle_statistics(subtitle_entries: List[Dict], subtitle_parser: SubtitleParser) -> Dict[str, Any]:
+def run_analysis(movie_info: Dict, movie_id: str, subtitle_entries: List[Dict], subtitle_parser: SubtitleParser,
+                 sections: Optional[List[str]] = None, previous: Optional[Dict[str, Any]] = None,
+                 corpus: Optional[CorpusFrequencies] = None) -> Dict[str, Any]:
+    """以共用的分析上下文執行分析器，全文只切詞一次；指定 sections 時其餘區段沿用 previous，corpus 供 TF-IDF 生字"""
+    with span("analysis.context", {"subtitle.entries": len(subtitle_entries)}):
+        ctx = AnalysisContext.from_rows(subtitle_entries)
+
+    pending = set(SECTION_VERSIONS if sections is None or previous is None else with_dependents(sections))
+    results = dict(previous or {})
+    # SECTION_VERSIONS 的順序即依賴順序
+    for name in SECTION_VERSIONS:
+        if name in pending or name not in results:
+            with span(f"analysis.{name}"):
+                results[name] = _build_section(name, ctx, subtitle_parser, results, movie_info, movie_id, corpus)
+
+    return {name: results[name] for name in SECTION_VERSIONS}
+
+def with_dependents(sections: List[str]) -> List[str]:
+    """加入依賴這些區段的下游區段，依 SECTION_VERSIONS 順序回傳"""
+    pending = set(sections)
+    for name, upstream in SECTION_DEPENDENCIES.items():
+        if pending.intersection(upstream):
+            pending.add(name)
+    return [name for name in SECTION_VERSIONS if name in pending]
+
+def _build_section(name: str, ctx: AnalysisContext, subtitle_parser: SubtitleParser, results: Dict[str, Any],
+                   movie_info: Dict, movie_id: str, corpus: Optional[CorpusFrequencies] = None) -> Dict[str, Any]:
+    """計算單一分析區段"""
+    if name == "movie_info":
+        return {
+            "title": movie_info.get('title'),
+            "year": movie_info.get('year'),
+            "imdb_id": movie_id
+        }
+    if name == "subtitle_statistics":
+        return analyze_subtitle_statistics(ctx, subtitle_parser)
+    if name == "dialogue_analysis":
+        return analyze_dialogues(ctx, subtitle_parser)
+    if name == "pacing_analysis":
+        return analyze_pacing(ctx)
+    if name == "vocabulary_analysis":
+        return analyze_vocabulary(ctx, corpus)
+    if name == "phrase_analysis":
+        return analyze_phrases(ctx)
+    if name == "difficulty_assessment":
+        return assess_difficulty(ctx, results.get("vocabulary_analysis"))
+    if name == "learning_recommendations":
+        return generate_learning_recommendations(ctx, results.get("vocabulary_analysis", {}), results.get("difficulty_assessment", {}))
+    raise ValueError(f"未知的分析區段: {name}")
+
+def analyze_subtitle_statistics(ctx: AnalysisContext, subtitle_parser: SubtitleParser) -> Dict[str, Any]:
     """分析字幕統計資訊"""
     try:
-        if not subtitle_entries:
+        if not ctx.entries:
             return {}
 
-        # 轉換為 SubtitleEntry 物件
-        entries = []
-        for entry in subtitle_entries:
-            from utils.subtitle_parser import SubtitleEntry
-            entries.append(SubtitleEntry(
-                index=entry.get('sequence_number', entry.get('index', 0)),
-                start_time=entry.get('start_time', ''),
-                end_time=entry.get('end_time', ''),
-                text=entry.get('text', ''),
-                start_ms=0,  # 暫時設為 0
-                end_ms=0     # 暫時設為 0
-            ))
+        entries = ctx.entries
 
         # 使用解析器取得統計資訊
         stats = subtitle_parser.get_statistics(entries)
 
         # 額外的統計分析
-        dialogues = subtitle_parser.extract_dialogues(entries)
+        dialogues = ctx.dialogues(subtitle_parser)
+        longest = max(dialogues, key=lambda d: len(d.get('text', '')), default=None)
 
         return {
             **stats,
             "dialogue_count": len(dialogues),
             "average_dialogue_duration": sum(d.get('duration', 0) for d in dialogues) / len(dialogues) if dialogues else 0,
-            "longest_dialogue": max(dialogues, key=lambda d: len(d.get('text', '')), default=None),
-            "subtitles_per_minute": len(entries) / (stats.get('total_duration_ms', 1) / 60000)
+            "longest_dialogue": summarize_dialogue(longest) if longest else None,
+            "subtitles_per_minute": len(entries) / (stats.get('total_duration_ms') / 60000) if stats.get('total_duration_ms') else 0
         }
 
     except Exception as e:
         logger.error(f"字幕統計分析失敗: {e}")
         return {}
 
-def analyze_dialogues(subtitle_entries: List[Dict], subtitle_parser: SubtitleParser) -> Dict[str, Any]:
+def summarize_dialogue(dialogue: Dict[str, Any]) -> Dict[str, Any]:
+    """對話摘要：條目範圍、時長與截斷的文字（條目可由字幕端點依 start_index 取得）"""
+    text = dialogue.get('text', '')
+    return {
+        "start_index": dialogue.get('start_index'),
+        "end_index": dialogue.get('end_index'),
+        "start_time": dialogue.get('start_time'),
+        "end_time": dialogue.get('end_time'),
+        "duration": dialogue.get('duration', 0),
+        "entry_count": len(dialogue.get('entries') or []),
+        "text_length": len(text),
+        "excerpt": text if len(text) <= DIALOGUE_EXCERPT_CHARS else text[:DIALOGUE_EXCERPT_CHARS].rstrip() + "…"
+    }
+
+def analyze_dialogues(ctx: AnalysisContext, subtitle_parser: SubtitleParser) -> Dict[str, Any]:
     """分析對話內容"""
     try:
-        if not subtitle_entries:
+        if not ctx.entries:
             return {}
 
-        # 轉換為 SubtitleEntry 物件
-        entries = []
-        for entry in subtitle_entries:
-            from utils.subtitle_parser import SubtitleEntry
-            entries.append(SubtitleEntry(
-                index=entry.get('sequence_number', entry.get('index', 0)),
-                start_time=entry.get('start_time', ''),
-                end_time=entry.get('end_time', ''),
-                text=entry.get('text', ''),
-                start_ms=0,
-                end_ms=0
-            ))
-
         # 提取對話片段
-        dialogues = subtitle_parser.extract_dialogues(entries)
+        dialogues = ctx.dialogues(subtitle_parser)
 
         # 分析對話特徵
         dialogue_lengths = [len(d.get('text', '').split()) for d in dialogues]
@@ -182,76 +443,179 @@ def analyze_dialogues(subtitle_entries: List[Dict], subtitle_parser: SubtitlePar
         logger.error(f"對話分析失敗: {e}")
         return {}
 
-def analyze_vocabulary(subtitle_entries: List[Dict]) -> Dict[str, Any]:
-    """分析詞彙使用"""
+def analyze_pacing(ctx: AnalysisContext) -> Dict[str, Any]:
+    """分析語速、字幕密度與停頓（每分鐘序列供節奏圖表使用）"""
     try:
-        if not subtitle_entries:
+        if not ctx.entries:
             return {}
+        return ctx.pacing()
 
-        # 收集所有文字
-        all_text = " ".join(entry.get('text', '') for entry in subtitle_entries)
+    except Exception as e:
+        logger.error(f"語速分析失敗: {e}")
+        return {}
 
-        # 簡單的詞彙分析
-        import re
-        words = re.findall(r'\b[a-zA-Z]+\b', all_text.lower())
+def analyze_vocabulary(ctx: AnalysisContext, corpus: Optional[CorpusFrequencies] = None) -> Dict[str, Any]:
+    """分析詞彙使用；語料庫足夠時以 TF-IDF 挑選生字並排除專有名詞"""
+    try:
+        if not ctx.entries:
+            return {}
 
-        # 詞頻統計
-        word_freq = {}
-        for word in words:
-            word_freq[word] = word_freq.get(word, 0) + 1
+        total_words = ctx.total_tokens
+        unique_words = ctx.unique_terms
 
         # 排序並取得常用詞
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-
-        # 識別可能的生字 (出現次數少的詞)
-        rare_words = [word for word, freq in sorted_words if freq <= 2]
+        sorted_words = ctx.sorted_terms()
 
         # 常用詞彙
-        common_words = sorted_words[:20] if len(sorted_words) >= 20 else sorted_words
+        common_words = sorted_words[:20]
 
-        return {
-            "total_words": len(words),
-            "unique_words_count": len(word_freq),
+        result = {
+            "total_words": total_words,
+            "unique_words_count": unique_words,
             "word_frequency": dict(sorted_words[:50]),  # 前 50 個常用詞
             "common_words": common_words,
-            "rare_words": rare_words[:20],  # 前 20 個可能生字
-            "vocabulary_diversity": len(word_freq) / len(words) if words else 0,  # 詞彙多樣性
-            "average_word_length": sum(len(word) for word in words) / len(words) if words else 0
+            "vocabulary_diversity": unique_words / total_words if total_words else 0,  # 詞彙多樣性
+            "average_word_length": ctx.total_characters() / total_words if total_words else 0
         }
 
+        if corpus and corpus.usable:
+            result.update(_tfidf_vocabulary(ctx, corpus))
+        else:
+            # 語料庫不足時沿用片內詞頻：識別可能的生字 (出現次數少的詞)
+            rare_words = [word for word, freq in sorted_words if freq <= 2]
+            result.update({
+                "rare_words": rare_words[:20],  # 前 20 個可能生字
+                "rare_word_method": "film_frequency"
+            })
+
+        return result
+
     except Exception as e:
         logger.error(f"詞彙分析失敗: {e}")
         return {}
 
-def assess_difficulty(subtitle_entries: List[Dict]) -> Dict[str, Any]:
-    """評估影片難度"""
+def _tfidf_vocabulary(ctx: AnalysisContext, corpus: CorpusFrequencies) -> Dict[str, Any]:
+    """以語料庫 IDF 計算片中單字的 TF-IDF，挑出本片重要且在語料庫中少見的單字"""
+    terms = ctx.vocabulary
+    counts = np.frombuffer(ctx.term_counts, dtype=np.uint32).astype(np.float64)
+    idf = corpus.idf(terms)
+    tfidf = counts / max(ctx.total_tokens, 1) * idf
+
+    # 片中與語料庫中都不曾以小寫出現的單字視為專有名詞
+    lowercase = ctx.lowercase_terms()
+    proper_nouns = np.fromiter(
+        (term not in lowercase and not corpus.lower_df.get(term, 0) for term in terms), dtype=bool, count=len(terms)
+    )
+    candidates = ~proper_nouns & (np.fromiter(map(len, terms), dtype=np.int64, count=len(terms)) >= MIN_VOCABULARY_LENGTH)
+    # 出現在多數影片的單字不算生字
+    candidates &= idf >= RARE_IDF_RATIO * corpus.max_idf()
+
+    ranked = np.flatnonzero(candidates)
+    ranked = ranked[np.argsort(-tfidf[ranked], kind='stable')]
+
+    key_vocabulary = [
+        {
+            "word": terms[index],
+            "count": int(counts[index]),
+            "document_frequency": corpus.df.get(terms[index], 0),
+            "tfidf": round(float(tfidf[index]), 6)
+        }
+        for index in ranked[:20]
+    ]
+
+    return {
+        "rare_words": [item["word"] for item in key_vocabulary],
+        "key_vocabulary": key_vocabulary,
+        "rare_word_method": "tfidf",
+        "rare_word_candidates": int(len(ranked)),
+        "proper_nouns_excluded": int(proper_nouns.sum()),
+        "corpus_documents": corpus.documents
+    }
+
+def analyze_phrases(ctx: AnalysisContext) -> Dict[str, Any]:
+    """擷取 2~4 字的片語與搭配詞（片語動詞、慣用語），以 PMI 排序"""
     try:
-        if not subtitle_entries:
+        if not ctx.entries:
             return {}
 
-        # 詞彙分析
-        vocab_analysis = analyze_vocabulary(subtitle_entries)
+        started = time.perf_counter()
+        collocations = ctx.collocations()
+        extraction_ms = (time.perf_counter() - started) * 1000
+
+        phrases = collocations[:PHRASE_LIMIT]
+        return {
+            "phrases": phrases,
+            "candidate_count": len(collocations),
+            "phrase_count_by_length": dict(Counter(str(item["n"]) for item in collocations)),
+            "scoring_method": "pmi",
+            "extraction_ms": round(extraction_ms, 2)
+        }
+
+    except Exception as e:
+        logger.error(f"片語分析失敗: {e}")
+        return {}
+
+def assess_difficulty(ctx: AnalysisContext, vocab_analysis: Optional[Dict[str, Any]] = None,
+                      lexicon: Optional[Lexicon] = None) -> Dict[str, Any]:
+    """評估影片難度；有詞表時以 CEFR 等級覆蓋率評分，否則使用字長與片內低頻詞的啟發式規則"""
+    try:
+        if not ctx.entries:
+            return {}
+
+        # 詞彙分析（可沿用已計算的結果）
+        if vocab_analysis is None:
+            vocab_analysis = analyze_vocabulary(ctx)
+        if lexicon is None:
+            lexicon = get_lexicon()
 
         # 字幕統計
-        total_words = vocab_analysis.get('total_words', 0)
         unique_words = vocab_analysis.get('unique_words_count', 0)
         avg_word_length = vocab_analysis.get('average_word_length', 0)
         vocab_diversity = vocab_analysis.get('vocabulary_diversity', 0)
 
-        # 對話速度分析
-        all_text = " ".join(entry.get('text', '') for entry in subtitle_entries)
-        dialogue_speed = total_words / 10  # 假設 10 分鐘的影片內容
+        # 對話速度分析：以實際說話時間計算的每分鐘字數
+        dialogue_speed = ctx.pacing().get('speech_wpm', 0)
 
         # 難度評分邏輯
         difficulty_score = 0
-
-        # 詞彙複雜度 (30%)
-        if avg_word_length > 5:
-            difficulty_score += 30
-        elif avg_word_length > 4:
-            difficulty_score += 20
+        lexical_profile = None
+
+        if lexicon:
+            lexical_profile = ctx.lexical_profile(lexicon)
+            coverage_level = lexical_profile.get('coverage_level')
+            advanced_ratio = lexical_profile.get('advanced_ratio', 0)
+
+            # 詞彙複雜度 (30%)：達到覆蓋率目標所需的 CEFR 等級
+            difficulty_score += COVERAGE_LEVEL_POINTS.get(coverage_level, 20)
+            vocabulary_complexity = "high" if coverage_level in ("C1", "C2") else "medium" if coverage_level in ("B1", "B2") else "low"
+
+            # 內容複雜度 (20%)：C1 以上或低頻詞的比例
+            if advanced_ratio > 0.05:
+                difficulty_score += 20
+            elif advanced_ratio > 0.02:
+                difficulty_score += 15
+            else:
+                difficulty_score += 10
+            content_complexity = "complex" if advanced_ratio > 0.05 else "moderate" if advanced_ratio > 0.02 else "simple"
         else:
-            difficulty_score += 10
+            # 詞彙複雜度 (30%)
+            if avg_word_length > 5:
+                difficulty_score += 30
+            elif avg_word_length > 4:
+                difficulty_score += 20
+            else:
+                difficulty_score += 10
+            vocabulary_complexity = "high" if avg_word_length > 5 else "medium" if avg_word_length > 4 else "low"
+
+            # 內容複雜度 (20%)
+            rare_words_ratio = len(vocab_analysis.get('rare_words', [])) / unique_words if unique_words > 0 else 0
+            if rare_words_ratio > 0.3:
+                difficulty_score += 20
+            elif rare_words_ratio > 0.2:
+                difficulty_score += 15
+            else:
+                difficulty_score += 10
+            content_complexity = "complex" if rare_words_ratio > 0.3 else "moderate" if rare_words_ratio > 0.2 else "simple"
 
         # 詞彙多樣性 (25%)
         if vocab_diversity > 0.7:
@@ -262,22 +626,13 @@ def assess_difficulty(subtitle_entries: List[Dict]) -> Dict[str, Any]:
             difficulty_score += 5
 
         # 對話速度 (25%)
-        if dialogue_speed > 15:
+        if dialogue_speed > FAST_SPEECH_WPM:
             difficulty_score += 25
-        elif dialogue_speed > 10:
+        elif dialogue_speed > MEDIUM_SPEECH_WPM:
             difficulty_score += 15
         else:
             difficulty_score += 5
 
-        # 內容複雜度 (20%)
-        rare_words_ratio = len(vocab_analysis.get('rare_words', [])) / unique_words if unique_words > 0 else 0
-        if rare_words_ratio > 0.3:
-            difficulty_score += 20
-        elif rare_words_ratio > 0.2:
-            difficulty_score += 15
-        else:
-            difficulty_score += 10
-
         # 決定難度等級
         if difficulty_score >= 80:
             level = "Advanced"
@@ -299,24 +654,30 @@ def assess_difficulty(subtitle_entries: List[Dict]) -> Dict[str, Any]:
             "overall_score": difficulty_score,
             "overall_level": level,
             "overall_level_zh": level_zh,
-            "vocabulary_complexity": "high" if avg_word_length > 5 else "medium" if avg_word_length > 4 else "low",
-            "speaking_speed": "fast" if dialogue_speed > 15 else "medium" if dialogue_speed > 10 else "slow",
-            "content_complexity": "complex" if rare_words_ratio > 0.3 else "moderate" if rare_words_ratio > 0.2 else "simple"
+            "vocabulary_complexity": vocabulary_complexity,
+            "speaking_speed": "fast" if dialogue_speed > FAST_SPEECH_WPM else "medium" if dialogue_speed > MEDIUM_SPEECH_WPM else "slow",
+            "speech_wpm": dialogue_speed,
+            "content_complexity": content_complexity,
+            "scoring_method": "lexicon" if lexicon else "heuristic",
+            "lexical_profile": lexical_profile
         }
 
     except Exception as e:
         logger.error(f"難度評估失敗: {e}")
         return {}
 
-def generate_learning_recommendations(subtitle_entries: List[Dict]) -> Dict[str, Any]:
+def generate_learning_recommendations(ctx: AnalysisContext, vocab_analysis: Optional[Dict[str, Any]] = None,
+                                      difficulty_assessment: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """生成學習建議"""
     try:
-        if not subtitle_entries:
+        if not ctx.entries:
             return {}
 
-        # 取得分析結果
-        vocab_analysis = analyze_vocabulary(subtitle_entries)
-        difficulty_assessment = assess_difficulty(subtitle_entries)
+        # 取得分析結果（可沿用已計算的結果）
+        if vocab_analysis is None:
+            vocab_analysis = analyze_vocabulary(ctx)
+        if difficulty_assessment is None:
+            difficulty_assessment = assess_difficulty(ctx, vocab_analysis)
 
         level = difficulty_assessment.get('overall_level', 'Unknown')
         rare_words = vocab_analysis.get('rare_words', [])
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from utils.tracing import span
+from config.settings import BATCH_MAX_REQUESTS, BATCH_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# 不可放入批次的端點：串流回應無法併入單一 JSON 回應，批次不可巢狀
+BATCH_EXCLUDED_ENDPOINTS = {"/batch", "/logs/stream"}
+
+BATCH_SUCCEEDED = "succeeded"
+BATCH_FAILED = "failed"
+BATCH_SKIPPED = "skipped"
+
+
+def _plan(requests: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """驗證並正規化子請求，回傳 (子請求, 錯誤訊息)；depends_on 只能指向排在前面的子請求，因此不會形成循環"""
+    if not isinstance(requests, list) or not requests:
+        return [], "requests 必須是非空的子請求清單"
+    if len(requests) > BATCH_MAX_REQUESTS:
+        return [], f"單次批次最多 {BATCH_MAX_REQUESTS} 個子請求"
+
+    items = []
+    seen = set()
+    for index, request in enumerate(requests):
+        if not isinstance(request, dict) or not isinstance(request.get('endpoint'), str):
+            return [], f"第 {index + 1} 個子請求缺少 endpoint"
+        data = request.get('data') or {}
+        if not isinstance(data, dict):
+            return [], f"第 {index + 1} 個子請求的 data 必須是物件"
+
+        request_id = str(request.get('id') or index)
+        if request_id in seen:
+            return [], f"子請求 id 重複: {request_id}"
+        depends_on = [str(dependency) for dependency in request.get('depends_on') or []]
+        missing = [dependency for dependency in depends_on if dependency not in seen]
+        if missing:
+            return [], f"子請求 {request_id} 的 depends_on 必須指向排在前面的子請求: {', '.join(missing)}"
+        seen.add(request_id)
+
+        items.append({
+            "id": request_id,
+            "endpoint": "/" + request['endpoint'].lstrip('/'),
+            "method": str(request.get('method') or "GET").upper(),
+            "data": data,
+            "depends_on": depends_on
+        })
+    return items, None
+
+
+async def _close_stream(stream: Any):
+    """關閉未送出的串流產生器"""
+    aclose = getattr(stream, "aclose", None)
+    if aclose:
+        await aclose()
+
+
+def _validation_message(error: ValidationError) -> str:
+    """驗證錯誤轉為單行訊息（欄位: 原因）"""
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc']) or 'data'}: {detail['msg']}"
+                     for detail in error.errors())
+
+
+async def handle_batch(data: Dict[str, Any], api: Any) -> Dict[str, Any]:
+    """在一次請求中執行多個子請求：互不相依的子請求同時執行（同時數受 BATCH_MAX_CONCURRENCY 限制），
+    有 depends_on 的子請求等相依的子請求成功後才執行，結果依提交順序回傳"""
+    try:
+        items, error = _plan(data.get('requests'))
+        if error:
+            return {
+                "success": False,
+                "error": "批次請求格式錯誤",
+                "message": error
+            }
+
+        semaphore = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_item(item: Dict[str, Any]) -> Dict[str, Any]:
+            for dependency in item["depends_on"]:
+                if (await tasks[dependency])["outcome"] != BATCH_SUCCEEDED:
+                    return {"outcome": BATCH_SKIPPED, "result": {
+                        "success": False,
+                        "error": "相依的子請求未成功",
+                        "message": f"子請求 {dependency} 未成功，略過執行"
+                    }}
+
+            resolved = api.resolve(item["endpoint"])
+            if not resolved:
+                result = api.unknown_endpoint(item["endpoint"], item["data"])
+            elif resolved[0] in BATCH_EXCLUDED_ENDPOINTS:
+                result = {
+                    "success": False,
+                    "error": "不支援的批次端點",
+                    "message": f"端點 {item['endpoint']} 不可放入批次"
+                }
+            else:
+                template, params = resolved
+                try:
+                    # 與型別化路由相同的參數驗證
+                    data = api.validate(template, item["data"])
+                except ValidationError as e:
+                    return {"outcome": BATCH_FAILED, "result": {
+                        "success": False,
+                        "error": "子請求參數錯誤",
+                        "message": _validation_message(e)
+                    }}
+                async with semaphore:
+                    with span("batch.request", {"http.route": template}):
+                        result = await api.call(template, params, data, item["method"])
+
+            # 背景工作的結果可能同時回應多個請求，不直接修改
+            result = dict(result)
+            result.pop("cache_key", None)
+            if "stream" in result:
+                await _close_stream(result.pop("stream"))
+                result = {
+                    "success": False,
+                    "error": "不支援的批次端點",
+                    "message": "串流回應不可放入批次，請改用分頁參數"
+                }
+            return {"outcome": BATCH_SUCCEEDED if result.get("success") else BATCH_FAILED, "result": result}
+
+        async def execute(item: Dict[str, Any]) -> Dict[str, Any]:
+            """單一子請求失敗只記錄為 failed，不影響其他子請求"""
+            try:
+                return await run_item(item)
+            except Exception as e:
+                logger.error(f"批次子請求失敗 {item['id']}: {e}")
+                return {"outcome": BATCH_FAILED, "result": {
+                    "success": False,
+                    "error": "子請求執行失敗",
+                    "message": str(e)
+                }}
+
+        # 依提交順序建立工作，相依的子請求一定已先建立；工作會複製目前的追蹤內容
+        for item in items:
+            tasks[item["id"]] = asyncio.ensure_future(execute(item))
+        try:
+            outcomes = await asyncio.gather(*tasks.values())
+        finally:
+            # 批次中止（例如用戶端斷線）時取消尚未完成的子請求，不留下無人等待的工作
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+        results = [
+            {"id": item["id"], "endpoint": item["endpoint"], **outcome}
+            for item, outcome in zip(items, outcomes)
+        ]
+        counts = {name: sum(1 for result in results if result["outcome"] == name)
+                  for name in (BATCH_SUCCEEDED, BATCH_FAILED, BATCH_SKIPPED)}
+
+        return {
+            "success": True,
+            "data": {
+                "results": results,
+                **counts
+            },
+            "message": f"批次處理 {len(results)} 個子請求：成功 {counts[BATCH_SUCCEEDED]}、"
+                       f"失敗 {counts[BATCH_FAILED]}、略過 {counts[BATCH_SKIPPED]}"
+        }
+
+    except Exception as e:
+        logger.error(f"處理批次請求失敗: {e}")
+        return {
+            "success": False,
+            "error": "處理批次請求失敗",
+            "message": str(e)
+        }
@@ -0,0 +1,347 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.executors import process_context
+from utils.turso_client import TursoClient, subtitle_content_hash
+from utils.subtitle_parser import SubtitleParser
+from api_handlers.analysis import (
+    COMPREHENSIVE_ANALYSIS,
+    SECTION_VERSIONS,
+    analyzer_version,
+    run_analysis,
+    section_versions,
+    stale_sections,
+    with_dependents
+)
+from config.settings import (
+    BATCH_ANALYSIS_WORKERS,
+    BATCH_ANALYSIS_PAGE_SIZE,
+    BATCH_ANALYSIS_CHECKPOINT_PATH,
+    BATCH_ANALYSIS_MAX_WORKERS,
+    BATCH_ANALYSIS_MAX_PAGE_SIZE,
+    BATCH_ANALYSIS_MAX_FAILED_IDS
+)
+
+logger = logging.getLogger(__name__)
+
+# 工作程序內共用的解析器
+_worker_parser: Optional[SubtitleParser] = None
+
+
+def _analyze_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """工作程序：對單部影片執行分析器（不存取資料庫）"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = SubtitleParser()
+
+    started = time.perf_counter()
+    try:
+        results = run_analysis(
+            payload['movie_info'], payload['movie_id'], payload['entries'], _worker_parser,
+            sections=payload['sections'], previous=payload['previous'], corpus=payload['corpus']
+        )
+        return {"movie_id": payload['movie_id'], "results": results, "seconds": time.perf_counter() - started}
+    except Exception as e:
+        return {"movie_id": payload['movie_id'], "error": str(e), "seconds": time.perf_counter() - started}
+
+
+class BatchAnalyzer:
+    """整個片庫的批次分析：keyset 逐頁讀取字幕、程序池平行分析、批次交易寫回、可續跑的進度檢查點"""
+
+    def __init__(self, turso_client: TursoClient, workers: int = BATCH_ANALYSIS_WORKERS,
+                 page_size: int = BATCH_ANALYSIS_PAGE_SIZE, checkpoint_path: str = BATCH_ANALYSIS_CHECKPOINT_PATH):
+        self.turso_client = turso_client
+        # 命令列與設定檔的值同樣受上限約束
+        self.workers = max(0, min(workers, BATCH_ANALYSIS_MAX_WORKERS))
+        self.page_size = max(1, min(page_size, BATCH_ANALYSIS_MAX_PAGE_SIZE))
+        self.checkpoint_path = checkpoint_path
+
+        self._stop = threading.Event()
+        self._progress: Dict[str, Any] = {}
+        self._reset_progress(None)
+
+    def _reset_progress(self, cursor: Optional[str]):
+        """初始化進度"""
+        self._progress = {
+            "running": False,
+            "analyzer_version": analyzer_version(),
+            "cursor": cursor,
+            "analyzed": 0,
+            "skipped": 0,
+            "failed": [],
+            "failed_count": 0,
+            "started_at": None,
+            "updated_at": None,
+            "elapsed_seconds": 0.0,
+            "movies_per_minute": 0.0
+        }
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """讀取檢查點；分析器版本不同時視為新的回填"""
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as handle:
+                checkpoint = json.load(handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"無法讀取批次分析檢查點，從頭開始: {e}")
+            return None
+
+        if checkpoint.get('analyzer_version') != analyzer_version():
+            logger.info("分析器版本已變更，忽略舊的批次分析檢查點")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self):
+        """寫入檢查點（先寫暫存檔再取代，避免中斷時損毀）"""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({**self._progress, "running": False}, handle, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _prepare_page(self, movie_ids: List[str], force: bool) -> List[Dict[str, Any]]:
+        """讀取一頁影片的字幕與既有結果，只為需要重算的影片建立工作內容"""
+        movies = self.turso_client.get_movies_by_imdb_ids(movie_ids)
+        existing = self.turso_client.get_analyses(movie_ids, COMPREHENSIVE_ANALYSIS)
+        hashes = self.turso_client.get_subtitle_content_hashes(movie_ids)
+
+        payloads = []
+        for movie_id, entries in self.turso_client.stream_subtitle_entries(movie_ids):
+            movie_info = movies.get(movie_id)
+            if not movie_info or not entries:
+                self._progress["skipped"] += 1
+                continue
+
+            content_hash = hashes.get(movie_id) or subtitle_content_hash(entries)
+            analysis = existing.get(movie_id)
+            sections = list(SECTION_VERSIONS) if force else with_dependents(stale_sections(analysis, content_hash))
+            if not sections:
+                self._progress["skipped"] += 1
+                continue
+
+            previous = None
+            if len(sections) < len(SECTION_VERSIONS):
+                previous = json.loads(analysis.get('data', '{}'))
+
+            corpus = None
+            if "vocabulary_analysis" in sections:
+                corpus = self.turso_client.get_movie_corpus_frequencies(movie_id, entries)
+
+            payloads.append({
+                "movie_id": movie_id,
+                "movie_info": movie_info,
+                "entries": entries,
+                "sections": sections,
+                "previous": previous,
+                "corpus": corpus,
+                "content_hash": content_hash
+            })
+        return payloads
+
+    def _write_results(self, payloads: List[Dict[str, Any]], outcomes: List[Dict[str, Any]]):
+        """以單一交易寫回一頁的分析結果"""
+        by_id = {payload['movie_id']: payload for payload in payloads}
+        versions = analyzer_version(), section_versions()
+        analyses = []
+        phrases = {}
+        for outcome in outcomes:
+            if outcome.get('error'):
+                logger.error(f"批次分析失敗 {outcome['movie_id']}: {outcome['error']}")
+                self._record_failure(outcome['movie_id'])
+                continue
+            analyses.append({
+                "movie_id": outcome['movie_id'],
+                "analysis_type": COMPREHENSIVE_ANALYSIS,
+                "data": outcome['results'],
+                "content_hash": by_id[outcome['movie_id']]['content_hash'],
+                "analyzer_version": versions[0],
+                "section_versions": versions[1]
+            })
+            if "phrase_analysis" in by_id[outcome['movie_id']]['sections']:
+                phrases[outcome['movie_id']] = outcome['results'].get("phrase_analysis", {}).get("phrases", [])
+
+        if not self.turso_client.save_analyses(analyses):
+            raise RuntimeError(f"批次寫入 {len(analyses)} 筆分析結果失敗")
+        self.turso_client.save_movie_phrases(phrases)
+        for analysis in analyses:
+            self.turso_client.ensure_minhash(analysis['movie_id'])
+        self._progress["analyzed"] += len(analyses)
+
+    def _record_failure(self, movie_id: str):
+        """記錄失敗影片，只保留最近的影片 ID（每頁都會寫入檢查點）"""
+        failed = self._progress["failed"]
+        failed.append(movie_id)
+        del failed[:-BATCH_ANALYSIS_MAX_FAILED_IDS]
+        self._progress["failed_count"] += 1
+
+    def _report(self, started: float, progress: Optional[Callable[[Dict[str, Any]], None]]):
+        """更新吞吐量並寫入檢查點"""
+        elapsed = time.perf_counter() - started
+        self._progress["elapsed_seconds"] = round(elapsed, 1)
+        self._progress["movies_per_minute"] = round(self._progress["analyzed"] / elapsed * 60, 1) if elapsed else 0.0
+        self._progress["updated_at"] = datetime.now().isoformat()
+        self._save_checkpoint()
+
+        logger.info(
+            f"批次分析進度: 已分析 {self._progress['analyzed']}，略過 {self._progress['skipped']}，"
+            f"失敗 {self._progress['failed_count']}，{self._progress['movies_per_minute']} 部/分鐘，"
+            f"游標 {self._progress['cursor']}"
+        )
+        if progress:
+            progress(self.status())
+
+    def run(self, force: bool = False, restart: bool = False, limit: Optional[int] = None,
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """執行批次分析；force 重算所有影片，restart 忽略檢查點，limit 限制本次處理的影片數"""
+        checkpoint = None if restart else self._load_checkpoint()
+        self._reset_progress(checkpoint.get('cursor') if checkpoint else None)
+        if checkpoint:
+            for key in ("analyzed", "skipped", "failed"):
+                self._progress[key] = checkpoint.get(key, self._progress[key])
+            self._progress["failed_count"] = checkpoint.get('failed_count', len(self._progress["failed"]))
+            del self._progress["failed"][:-BATCH_ANALYSIS_MAX_FAILED_IDS]
+            logger.info(f"由檢查點續跑批次分析，游標 {self._progress['cursor']}")
+
+        self._stop.clear()
+        self._progress["running"] = True
+        self._progress["started_at"] = datetime.now().isoformat()
+        started = time.perf_counter()
+        baseline = self._progress["analyzed"]
+        remaining = limit
+        # 讀取游標領先檢查點游標一頁：檢查點只在該頁寫回後才推進
+        read_cursor = self._progress["cursor"]
+
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context()) if self.workers > 0 else None
+        # 上一頁的計算與下一頁的讀取重疊進行
+        in_flight = None
+        try:
+            while not self._stop.is_set():
+                page_size = self.page_size if remaining is None else min(self.page_size, remaining)
+                if page_size <= 0:
+                    break
+                movie_ids = self.turso_client.get_movie_ids_with_subtitles(read_cursor, page_size)
+                if not movie_ids:
+                    break
+                read_cursor = movie_ids[-1]
+                if remaining is not None:
+                    remaining -= len(movie_ids)
+
+                payloads = self._prepare_page(movie_ids, force)
+                if executor:
+                    futures = [executor.submit(_analyze_payload, payload) for payload in payloads]
+                else:
+                    futures = [_analyze_payload(payload) for payload in payloads]
+
+                if in_flight:
+                    self._finish_page(*in_flight, started, progress)
+                in_flight = (movie_ids[-1], payloads, futures)
+
+            if in_flight:
+                self._finish_page(*in_flight, started, progress)
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+            self._progress["running"] = False
+
+        logger.info(f"批次分析結束: 本次分析 {self._progress['analyzed'] - baseline} 部影片")
+        return self.status()
+
+    def _finish_page(self, last_movie_id: str, payloads: List[Dict[str, Any]], futures: List[Any],
+                     started: float, progress: Optional[Callable[[Dict[str, Any]], None]]):
+        """等待一頁完成、寫回結果並推進檢查點游標"""
+        outcomes = [future.result() if hasattr(future, 'result') else future for future in futures]
+        self._write_results(payloads, outcomes)
+        self._progress["cursor"] = last_movie_id
+        self._report(started, progress)
+
+    def stop(self):
+        """要求在目前這頁完成後停止"""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """目前進度"""
+        return {**self._progress, "failed": self._progress["failed"][-20:]}
+
+
+# 端點觸發的背景批次分析（同時只執行一個）
+_batch_lock = threading.Lock()
+_batch_analyzer: Optional[BatchAnalyzer] = None
+_batch_thread: Optional[threading.Thread] = None
+
+
+async def handle_batch_analysis(data: Dict[str, Any], turso_client: TursoClient) -> Dict[str, Any]:
+    """在背景啟動片庫批次分析"""
+    global _batch_analyzer, _batch_thread
+    try:
+        if not turso_client:
+            return {
+                "success": False,
+                "error": "Turso 客戶端未初始化",
+                "message": "無法執行批次分析"
+            }
+
+        with _batch_lock:
+            if _batch_thread and _batch_thread.is_alive():
+                return {
+                    "success": False,
+                    "error": "批次分析已在執行中",
+                    "message": "請以 /analysis/batch/status 查詢進度",
+                    "data": _batch_analyzer.status()
+                }
+
+            _batch_analyzer = BatchAnalyzer(
+                turso_client,
+                workers=int(data.get('workers', BATCH_ANALYSIS_WORKERS)),
+                page_size=int(data.get('page_size', BATCH_ANALYSIS_PAGE_SIZE))
+            )
+            options = {
+                "force": bool(data.get('force', False)),
+                "restart": bool(data.get('restart', False)),
+                "limit": int(data['limit']) if data.get('limit') else None
+            }
+            _batch_thread = threading.Thread(
+                target=_batch_analyzer.run, kwargs=options, name="batch-analysis", daemon=True
+            )
+            _batch_thread.start()
+
+        return {
+            "success": True,
+            "data": {"options": options, "status_endpoint": "/analysis/batch/status"},
+            "message": "批次分析已在背景啟動"
+        }
+
+    except Exception as e:
+        logger.error(f"啟動批次分析失敗: {e}")
+        return {
+            "success": False,
+            "error": "啟動批次分析失敗",
+            "message": str(e)
+        }
+
+
+async def handle_batch_status(data: Dict[str, Any]) -> Dict[str, Any]:
+    """查詢批次分析進度；stop=true 時在目前這頁完成後停止"""
+    if not _batch_analyzer:
+        return {
+            "success": False,
+            "error": "尚未執行批次分析",
+            "message": "請先呼叫 /analysis/batch"
+        }
+
+    if data.get('stop'):
+        _batch_analyzer.stop()
+
+    return {
+        "success": True,
+        "data": _batch_analyzer.status(),
+        "message": "批次分析執行中" if _batch_analyzer.status()["running"] else "批次分析未在執行"
+    }
@@ -0,0 +1,126 @@
+import logging
+import json
+from typing import Dict, Any
+from utils.turso_client import TursoClient
+from utils.executors import get_executors, run_io
+from utils.job_queue import AnalysisJobQueue, JobQueueFullError, JOB_SUCCEEDED
+from api_handlers.analysis import COMPREHENSIVE_ANALYSIS, SUPPORTED_ANALYSIS_TYPES
+
+logger = logging.getLogger(__name__)
+
+async def handle_job_submit(data: Dict[str, Any], job_queue: AnalysisJobQueue) -> Dict[str, Any]:
+    """提交背景分析工作"""
+    try:
+        if not job_queue:
+            return {
+                "success": False,
+                "error": "分析佇列未啟用或尚未就緒",
+                "message": "請使用 /movies/{id}/analyze 同步分析"
+            }
+
+        movie_id = data.get('imdb_id') or data.get('movie_id')
+        analysis_type = data.get('analysis_type', COMPREHENSIVE_ANALYSIS)
+
+        if not movie_id:
+            return {
+                "success": False,
+                "error": "影片 ID 不能為空",
+                "message": "請提供有效的 IMDb ID"
+            }
+
+        if analysis_type not in SUPPORTED_ANALYSIS_TYPES:
+            return {
+                "success": False,
+                "error": "不支援的分析類型",
+                "message": f"支援的分析類型: {', '.join(SUPPORTED_ANALYSIS_TYPES)}"
+            }
+
+        job = await run_io(job_queue.submit, movie_id, analysis_type)
+
+        return {
+            "success": True,
+            "data": {
+                "job": job,
+                "status_endpoint": f"/jobs/{job['job_id']}"
+            },
+            "message": "沿用進行中的分析工作" if job.get('deduplicated') else "分析工作已排入佇列"
+        }
+
+    except JobQueueFullError as e:
+        return {
+            "success": False,
+            "error": "分析佇列已滿",
+            "message": str(e)
+        }
+    except Exception as e:
+        logger.error(f"提交分析工作失敗: {e}")
+        return {
+            "success": False,
+            "error": "提交分析工作失敗",
+            "message": str(e)
+        }
+
+async def handle_job_status(job_id: str, job_queue: AnalysisJobQueue, turso_client: TursoClient) -> Dict[str, Any]:
+    """查詢分析工作狀態，完成時附上分析結果"""
+    try:
+        if not job_queue:
+            return {
+                "success": False,
+                "error": "分析佇列未啟用或尚未就緒",
+                "message": "請使用 /movies/{id}/analyze 同步分析"
+            }
+
+        job = await run_io(job_queue.get, job_id)
+        if not job:
+            return {
+                "success": False,
+                "error": "找不到分析工作",
+                "message": f"找不到 ID 為 {job_id} 的分析工作"
+            }
+
+        result = {"job": job}
+        if job.get('status') == JOB_SUCCEEDED and turso_client:
+            analysis = await run_io(turso_client.get_analysis, job['movie_id'], job['analysis_type'])
+            if analysis:
+                result["analysis"] = json.loads(analysis.get('data', '{}'))
+                result["created_at"] = analysis.get('created_at')
+
+        return {
+            "success": True,
+            "data": result,
+            "message": f"分析工作狀態: {job.get('status')}"
+        }
+
+    except Exception as e:
+        logger.error(f"查詢分析工作失敗 {job_id}: {e}")
+        return {
+            "success": False,
+            "error": "查詢分析工作失敗",
+            "message": str(e)
+        }
+
+async def handle_job_stats(job_queue: AnalysisJobQueue) -> Dict[str, Any]:
+    """取得分析佇列深度與延遲指標"""
+    if not job_queue:
+        return {
+            "success": False,
+            "error": "分析佇列未啟用或尚未就緒",
+            "message": "ANALYSIS_WORKERS 設為 0 或佇列仍在初始化"
+        }
+
+    return {
+        "success": True,
+        "data": {
+            **job_queue.stats(),
+            "active_jobs": job_queue.list_active()
+        },
+        "message": "分析佇列指標"
+    }
+
+async def handle_executor_stats() -> Dict[str, Any]:
+    """取得 I/O 與 CPU 執行器的深度、排隊時間與執行時間"""
+    return {
+        "success": True,
+        "data": get_executors().stats(),
+        "message": "執行器指標"
+    }
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from utils.turso_client import TursoClient
+from utils.lexicon import CEFR_LEVELS, LEVEL_CODES, COVERAGE_TARGET, Lexicon, get_lexicon
+from utils.corpus import unpack_flags, unpack_ids
+from utils.coverage import CoverageEngine, bitset_count, bitset_from_bytes, bitset_update, film_coverage
+from utils.pagination import clamp_page_size
+from utils.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+# 覆蓋率回應中列出的生字數
+NEW_WORD_LIMIT = 50
+
+# 每位學習者的已知單字更新鎖（讀取-修改-寫回需循序執行），沒有更新進行中時自動回收
+_known_word_locks: 'weakref.WeakValueDictionary[str, asyncio.Lock]' = weakref.WeakValueDictionary()
+
+
+def _known_words_lock(user_id: str) -> asyncio.Lock:
+    """取得學習者的已知單字更新鎖"""
+    lock = _known_word_locks.get(user_id)
+    if lock is None:
+        lock = _known_word_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+def _load_bitset(turso_client: TursoClient, user_id: str) -> np.ndarray:
+    """取得學習者的已知單字位元組，尚未設定時為空"""
+    record = turso_client.get_known_words(user_id)
+    return bitset_from_bytes(record['bitset'] if record else None)
+
+
+def _normalize_words(words: Any) -> List[str]:
+    """單字清單轉為小寫英文單字"""
+    if isinstance(words, str):
+        words = words.split(',')
+    return sorted({word.strip().lower() for word in words or [] if word and word.strip().isalpha()})
+
+
+async def handle_known_words(data: Dict[str, Any], turso_client: TursoClient,
+                             lexicon: Optional[Lexicon] = None) -> Dict[str, Any]:
+    """更新學習者的已知單字：add / remove 單字清單，assume_level 將該 CEFR 等級以下的單字全部設為已知"""
+    try:
+        user_id = data.get('user_id')
+        if not user_id:
+            return {
+                "success": False,
+                "error": "使用者 ID 不能為空",
+                "message": "請提供 user_id"
+            }
+
+        if not turso_client:
+            return {
+                "success": False,
+                "error": "Turso 客戶端未初始化",
+                "message": "無法更新已知單字"
+            }
+
+        # 同一學習者的並行更新不可互相覆蓋
+        async with _known_words_lock(user_id):
+            bitset = np.zeros(0, dtype=np.uint8) if data.get('replace') else await run_io(_load_bitset, turso_client, user_id)
+
+            add_ids = []
+            level = (data.get('assume_level') or '').upper()
+            if level:
+                if level not in LEVEL_CODES:
+                    return {
+                        "success": False,
+                        "error": "不支援的 CEFR 等級",
+                        "message": f"assume_level 必須是 {', '.join(CEFR_LEVELS)} 之一"
+                    }
+                if lexicon is None:
+                    # 詞表尚未預熱完成時在 I/O 執行緒載入
+                    lexicon = await run_io(get_lexicon)
+                if not lexicon:
+                    return {
+                        "success": False,
+                        "error": "詞表未載入",
+                        "message": "無法依 CEFR 等級設定已知單字"
+                    }
+                terms = await run_io(turso_client.get_all_terms)
+                levels, _ = await run_io(lexicon.lookup_terms, [row['term'] for row in terms])
+                eligible = (levels > 0) & (levels <= LEVEL_CODES[level])
+                add_ids.extend(terms[index]['term_id'] for index in np.flatnonzero(eligible))
+
+            add_words = _normalize_words(data.get('add'))
+            remove_words = _normalize_words(data.get('remove'))
+            if add_words:
+                add_ids.extend((await run_io(turso_client.get_term_ids, add_words, create=True)).values())
+            remove_ids = list((await run_io(turso_client.get_term_ids, remove_words)).values()) if remove_words else []
+
+            bitset = bitset_update(bitset, add=add_ids, remove=remove_ids)
+            word_count = bitset_count(bitset)
+            if not await run_io(turso_client.save_known_words, user_id, bitset.tobytes(), word_count):
+                return {
+                    "success": False,
+                    "error": "儲存已知單字失敗",
+                    "message": f"無法更新使用者 {user_id} 的已知單字"
+                }
+
+        return {
+            "success": True,
+            "data": {
+                "user_id": user_id,
+                "known_word_count": word_count,
+                "added": len(add_ids),
+                "removed": len(remove_ids),
+                "bitset_bytes": len(bitset)
+            },
+            "message": f"已知單字已更新，共 {word_count} 個"
+        }
+
+    except Exception as e:
+        logger.error(f"更新已知單字失敗: {e}")
+        return {
+            "success": False,
+            "error": "更新已知單字失敗",
+            "message": str(e)
+        }
+
+
+async def handle_movie_coverage(movie_id: str, data: Dict[str, Any], turso_client: TursoClient) -> Dict[str, Any]:
+    """計算學習者對影片 token 的已知比例與片中生字"""
+    try:
+        user_id = data.get('user_id')
+        if not movie_id or not user_id:
+            return {
+                "success": False,
+                "error": "參數不足",
+                "message": "請提供影片 ID 與 user_id"
+            }
+
+        row = await run_io(turso_client.get_movie_terms, movie_id) if turso_client else None
+        if not row:
+            return {
+                "success": False,
+                "error": "找不到影片詞彙",
+                "message": f"影片 {movie_id} 尚未建立字幕索引，請先抓取字幕"
+            }
+
+        term_ids = unpack_ids(row['term_ids'])
+        counts = unpack_ids(row['term_counts']).astype(np.int64)
+        bitset = await run_io(_load_bitset, turso_client, user_id)
+        coverage, unknown = film_coverage(bitset, term_ids, counts, unpack_flags(row['lower_flags']))
+
+        # 生字依片中出現次數由高到低
+        unknown = unknown[np.argsort(-counts[unknown], kind='stable')]
+        limit = min(clamp_page_size(data.get('limit'), NEW_WORD_LIMIT), NEW_WORD_LIMIT)
+        top = unknown[:limit]
+        terms = await run_io(turso_client.get_terms_by_ids, [int(term_id) for term_id in term_ids[top]])
+
+        return {
+            "success": True,
+            "data": {
+                "imdb_id": movie_id,
+                "user_id": user_id,
+                "coverage": round(coverage, 4),
+                "meets_target": coverage >= COVERAGE_TARGET,
+                "coverage_target": COVERAGE_TARGET,
+                "total_tokens": int(counts.sum()),
+                "unique_words": len(term_ids),
+                "new_word_count": len(unknown),
+                "new_words": [
+                    {"word": terms.get(int(term_ids[index])), "count": int(counts[index])}
+                    for index in top
+                ]
+            },
+            "message": f"已知單字覆蓋率 {coverage:.1%}"
+        }
+
+    except Exception as e:
+        logger.error(f"計算影片覆蓋率失敗 {movie_id}: {e}")
+        return {
+            "success": False,
+            "error": "計算覆蓋率失敗",
+            "message": str(e)
+        }
+
+
+async def handle_coverage_ranking(data: Dict[str, Any], turso_client: TursoClient,
+                                  coverage_engine: CoverageEngine) -> Dict[str, Any]:
+    """依學習者已知單字覆蓋率排出整個片庫"""
+    try:
+        user_id = data.get('user_id')
+        if not user_id:
+            return {
+                "success": False,
+                "error": "使用者 ID 不能為空",
+                "message": "請提供 user_id"
+            }
+
+        if not turso_client or not coverage_engine:
+            return {
+                "success": False,
+                "error": "Turso 客戶端未初始化",
+                "message": "無法計算覆蓋率排名"
+            }
+
+        bitset = await run_io(_load_bitset, turso_client, user_id)
+        # 片庫詞彙常駐於本程序記憶體，排名在執行緒池計算（numpy 運算期間釋放 GIL）
+        started = time.perf_counter()
+        ranking = await run_io(
+            coverage_engine.rank,
+            bitset,
+            limit=clamp_page_size(data.get('limit')),
+            min_coverage=float(data.get('min_coverage', 0.0)),
+            max_coverage=float(data.get('max_coverage', 1.0))
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        movies = await run_io(turso_client.get_movies_by_imdb_ids, [item['movie_id'] for item in ranking])
+        for item in ranking:
+            movie = movies.get(item['movie_id'], {})
+            item.update({"title": movie.get('title'), "year": movie.get('year')})
+
+        return {
+            "success": True,
+            "data": {
+                "user_id": user_id,
+                "movies": ranking,
+                "catalog": coverage_engine.stats(),
+                "elapsed_ms": round(elapsed_ms, 2)
+            },
+            "message": f"已排序 {len(ranking)} 部影片"
+        }
+
+    except Exception as e:
+        logger.error(f"計算覆蓋率排名失敗: {e}")
+        return {
+            "success": False,
+            "error": "計算覆蓋率排名失敗",
+            "message": str(e)
+        }
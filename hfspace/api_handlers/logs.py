@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Any, AsyncIterator, Optional
+
+from utils.log_buffer import LogRingBuffer, entry_to_dict, level_number
+from config.settings import LOG_STREAM_POLL_INTERVAL, LOG_STREAM_HEARTBEAT
+
+logger = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+# 單次查詢與每次串流送出的記錄上限
+LOG_TAIL_LIMIT = 200
+
+
+def _since(data: Dict[str, Any]) -> Optional[int]:
+    """since 參數（SSE 重新連線時為 Last-Event-ID）"""
+    since = data.get('since')
+    return int(since) if since not in (None, "") else None
+
+
+async def handle_log_tail(data: Dict[str, Any], log_buffer: LogRingBuffer) -> Dict[str, Any]:
+    """讀取日誌緩衝區：帶 since 時只回傳之後的記錄，否則回傳最近的記錄"""
+    try:
+        if not log_buffer:
+            return {
+                "success": False,
+                "error": "日誌緩衝區未啟用",
+                "message": "日誌緩衝區未初始化"
+            }
+
+        min_level = level_number(data.get('level'), logging.NOTSET)
+        limit = min(int(data.get('limit') or LOG_TAIL_LIMIT), log_buffer.capacity)
+        since = _since(data)
+        if since is None:
+            entries, cursor = log_buffer.tail(limit, min_level)
+        else:
+            entries, cursor = log_buffer.since(since, min_level, limit)
+
+        return {
+            "success": True,
+            "data": {
+                "entries": [entry_to_dict(entry) for entry in entries],
+                "next_since": cursor,
+                "buffer": log_buffer.stats()
+            },
+            "message": f"取得 {len(entries)} 筆日誌"
+        }
+
+    except Exception as e:
+        logger.error(f"讀取日誌失敗: {e}")
+        return {
+            "success": False,
+            "error": "讀取日誌失敗",
+            "message": str(e)
+        }
+
+
+async def handle_log_stream(data: Dict[str, Any], log_buffer: LogRingBuffer) -> Dict[str, Any]:
+    """以 Server-Sent Events 即時推送新日誌；事件 id 為序號，斷線重連時由 Last-Event-ID 接續"""
+    if not log_buffer:
+        return {
+            "success": False,
+            "error": "日誌緩衝區未啟用",
+            "message": "日誌緩衝區未初始化"
+        }
+
+    since = _since(data)
+    return {
+        "success": True,
+        "stream": _log_events(log_buffer, log_buffer.last_seq if since is None else since,
+                              level_number(data.get('level'), logging.NOTSET)),
+        "media_type": SSE_MEDIA_TYPE,
+        "headers": {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        "message": "日誌串流"
+    }
+
+
+async def _log_events(log_buffer: LogRingBuffer, since: int, min_level: int) -> AsyncIterator[bytes]:
+    """輪詢緩衝區並送出新記錄；沒有新記錄時定期送出註解行，避免代理伺服器關閉閒置連線"""
+    yield f"retry: {int(LOG_STREAM_POLL_INTERVAL * 1000) * 2}\n\n".encode('utf-8')
+    last_sent = time.monotonic()
+    while True:
+        entries, since = log_buffer.since(since, min_level, LOG_TAIL_LIMIT)
+        if entries:
+            yield "".join(
+                f"id: {entry[0]}\nevent: log\ndata: {json.dumps(entry_to_dict(entry), ensure_ascii=False)}\n\n"
+                for entry in entries
+            ).encode('utf-8')
+            last_sent = time.monotonic()
+            if len(entries) >= LOG_TAIL_LIMIT:
+                continue
+        elif time.monotonic() - last_sent >= LOG_STREAM_HEARTBEAT:
+            yield b": heartbeat\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(LOG_STREAM_POLL_INTERVAL)
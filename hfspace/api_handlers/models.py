@@ -0,0 +1,105 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from config.settings import MAX_PAGE_SIZE, BATCH_MAX_REQUESTS, BATCH_ANALYSIS_MAX_WORKERS, BATCH_ANALYSIS_MAX_PAGE_SIZE
+
+
+class RequestModel(BaseModel):
+    """請求模型基底：轉為處理器使用的參數 dict，未提供的欄位不帶入（處理器以 'limit' in data 判斷是否分頁）"""
+
+    def to_data(self) -> Dict[str, Any]:
+        return self.model_dump(exclude_none=True)
+
+
+class PageQuery(RequestModel):
+    """分頁查詢參數"""
+    page: int = Field(1, ge=1, description="頁數（舊版 offset 分頁）")
+    cursor: Optional[str] = Field(None, description="上一頁回傳的 next_cursor")
+    limit: Optional[int] = Field(None, ge=1, le=MAX_PAGE_SIZE, description="每頁筆數")
+
+
+class SearchQuery(PageQuery):
+    """影片搜尋參數"""
+    query: str = Field(..., min_length=1, description="搜尋關鍵字")
+
+
+class LimitQuery(RequestModel):
+    """只有筆數上限的查詢參數"""
+    limit: Optional[int] = Field(None, ge=1, le=MAX_PAGE_SIZE)
+
+
+class SimilarQuery(LimitQuery):
+    """相似影片查詢參數"""
+    max_difficulty_gap: Optional[float] = Field(None, ge=0, le=100, description="與本片難度分數的最大差距")
+
+
+class CoverageQuery(LimitQuery):
+    """影片覆蓋率查詢參數"""
+    user_id: str = Field(..., min_length=1)
+
+
+class RankingQuery(LimitQuery):
+    """片庫覆蓋率排名查詢參數"""
+    user_id: str = Field(..., min_length=1)
+    min_coverage: float = Field(0.0, ge=0, le=1)
+    max_coverage: float = Field(1.0, ge=0, le=1)
+
+
+class SubtitleQuery(RequestModel):
+    """已儲存字幕的讀取參數（GET，可條件式請求）"""
+    language: str = "en"
+    stream: bool = Field(False, description="以 NDJSON 逐批串流字幕條目")
+    cursor: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1, le=MAX_PAGE_SIZE)
+
+
+class SubtitleFetchRequest(SubtitleQuery):
+    """字幕抓取請求"""
+    imdb_id: str = Field(..., min_length=1)
+    force_refresh: bool = False
+
+
+class JobSubmitRequest(RequestModel):
+    """背景分析工作請求"""
+    imdb_id: str = Field(..., min_length=1)
+    analysis_type: Optional[str] = None
+
+
+class KnownWordsRequest(RequestModel):
+    """學習者已知單字更新請求"""
+    user_id: str = Field(..., min_length=1)
+    add: List[str] = Field(default_factory=list)
+    remove: List[str] = Field(default_factory=list)
+    assume_level: Optional[str] = Field(None, description="將此 CEFR 等級以下的單字全部設為已知")
+    replace: bool = False
+
+
+class BatchAnalysisRequest(RequestModel):
+    """片庫批次分析請求"""
+    workers: Optional[int] = Field(None, ge=0, le=BATCH_ANALYSIS_MAX_WORKERS)
+    page_size: Optional[int] = Field(None, ge=1, le=BATCH_ANALYSIS_MAX_PAGE_SIZE)
+    limit: Optional[int] = Field(None, ge=1)
+    force: bool = False
+    restart: bool = False
+
+
+class LogQuery(RequestModel):
+    """日誌查詢參數"""
+    since: Optional[int] = Field(None, ge=0, description="只回傳此序號之後的記錄")
+    level: Optional[str] = Field(None, description="最低等級，例如 WARNING")
+    limit: Optional[int] = Field(None, ge=1)
+
+
+class BatchItem(RequestModel):
+    """批次中的單一子請求"""
+    endpoint: str = Field(..., min_length=1, description="端點路徑，例如 /movies/tt0111161/details")
+    method: str = "GET"
+    data: Dict[str, Any] = Field(default_factory=dict, description="端點參數，與 webhook 的 JSON 內容相同")
+    id: Optional[str] = Field(None, description="子請求識別碼，預設為在清單中的位置")
+    depends_on: List[str] = Field(default_factory=list, description="須先成功的子請求 id（只能指向排在前面的子請求）")
+
+
+class BatchRequest(RequestModel):
+    """批次請求"""
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_REQUESTS)
@@ -1,25 +1,42 @@
+import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from utils.opensubtitles import OpenSubtitlesClient
 from utils.turso_client import TursoClient
+from utils.pagination import InvalidCursorError, clamp_page_size
+from utils.write_behind import WriteBehindQueue
+from utils.executors import run_io
+from utils.response import entity_tag
+from api_handlers.analysis import COMPREHENSIVE_ANALYSIS
 
 logger = logging.getLogger(__name__)
 
-async def handle_popular_movies(data: Dict[str, Any], os_client: OpenSubtitlesClient, turso_client: TursoClient) -> Dict[str, Any]:
+# 相似影片預設與最多回傳筆數
+SIMILAR_MOVIES_DEFAULT = 10
+SIMILAR_MOVIES_MAX = 50
+
+async def handle_popular_movies(data: Dict[str, Any], os_client: OpenSubtitlesClient, turso_client: TursoClient,
+                                movie_writer: Optional[WriteBehindQueue] = None) -> Dict[str, Any]:
     """處理熱門影片請求"""
     try:
         page = int(data.get('page', 1))
+        cursor = data.get('cursor')
+        limit = clamp_page_size(data.get('limit'))
+        # 指定 cursor 或 limit 時改用資料庫 keyset 分頁
+        keyset = bool(cursor) or 'limit' in data
+        next_cursor = None
         logger.info(f"取得熱門影片，頁面: {page}")
 
-        # 從 OpenSubtitles API 取得熱門影片
-        if os_client:
-            movies = os_client.get_popular_movies(page)
+        from_upstream = bool(os_client) and not keyset
+        if from_upstream:
+            movies = await run_io(os_client.get_popular_movies, page)
         else:
             # 如果 OpenSubtitles 不可用，從資料庫取得
             movies = []
             if turso_client:
-                db_movies = turso_client.get_popular_movies(20)
-                for movie in db_movies:
+                db_page = await run_io(turso_client.get_popular_movies_page, limit, cursor)
+                next_cursor = db_page['next_cursor']
+                for movie in db_page['items']:
                     movies.append({
                         'imdb_id': movie['imdb_id'],
                         'title': movie['title'],
@@ -28,19 +45,25 @@ async def handle_popular_movies(data: Dict[str, Any], os_client: OpenSubtitlesCl
                         'download_count': movie['download_count']
                     })
 
-        # 儲存到資料庫
-        if movies and turso_client:
-            for movie in movies:
-                turso_client.save_movie(movie)
+        # 儲存到資料庫（資料庫分頁結果不需回寫）
+        if from_upstream and movies:
+            await run_io(_save_movies, movies, turso_client, movie_writer)
 
         return {
             "success": True,
             "data": movies,
             "page": page,
+            "next_cursor": next_cursor,
             "total_count": len(movies),
             "message": f"取得第 {page} 頁熱門影片成功"
         }
 
+    except InvalidCursorError as e:
+        return {
+            "success": False,
+            "error": "無效的分頁游標",
+            "message": str(e)
+        }
     except Exception as e:
         logger.error(f"處理熱門影片請求失敗: {e}")
         return {
@@ -49,11 +72,14 @@ async def handle_popular_movies(data: Dict[str, Any], os_client: OpenSubtitlesCl
             "message": str(e)
         }
 
-async def handle_search_movies(data: Dict[str, Any], os_client: OpenSubtitlesClient, turso_client: TursoClient) -> Dict[str, Any]:
+async def handle_search_movies(data: Dict[str, Any], os_client: OpenSubtitlesClient, turso_client: TursoClient,
+                               movie_writer: Optional[WriteBehindQueue] = None) -> Dict[str, Any]:
     """處理影片搜尋請求"""
     try:
         query = data.get('query', '').strip()
         page = int(data.get('page', 1))
+        cursor = data.get('cursor')
+        limit = clamp_page_size(data.get('limit'))
 
         if not query:
             return {
@@ -66,35 +92,46 @@ async def handle_search_movies(data: Dict[str, Any], os_client: OpenSubtitlesCli
 
         # 優先從資料庫搜尋
         db_movies = []
+        next_cursor = None
         if turso_client:
-            db_movies = turso_client.search_movies(query, 20)
+            db_page = await run_io(turso_client.search_movies_page, query, limit, cursor)
+            db_movies = db_page['items']
+            next_cursor = db_page['next_cursor']
 
-        # 從 OpenSubtitles API 搜尋
-        if os_client:
-            api_movies = os_client.search_movies(query, page)
+        # 從 OpenSubtitles API 搜尋（後續游標頁只取資料庫結果）
+        if os_client and not cursor:
+            api_movies = await run_io(os_client.search_movies, query, page)
 
             # 合併結果（去重）
             seen_ids = set(movie.get('imdb_id') for movie in db_movies)
+            new_movies = []
             for api_movie in api_movies:
-                if api_movie.get('imdb_id') not in seen_ids:
+                api_movie_id = _movie_id(api_movie)
+                if api_movie_id not in seen_ids:
                     db_movies.append(api_movie)
-                    seen_ids.add(api_movie.get('imdb_id'))
+                    new_movies.append(api_movie)
+                    seen_ids.add(api_movie_id)
 
             # 儲存新找到的影片
-            if api_movies and turso_client:
-                for movie in api_movies:
-                    if movie.get('imdb_id') not in seen_ids:
-                        turso_client.save_movie(movie)
+            if new_movies:
+                await run_io(_save_movies, new_movies, turso_client, movie_writer)
 
         return {
             "success": True,
             "data": db_movies,
             "query": query,
             "page": page,
+            "next_cursor": next_cursor,
             "total_count": len(db_movies),
             "message": f"搜尋 '{query}' 找到 {len(db_movies)} 部影片"
         }
 
+    except InvalidCursorError as e:
+        return {
+            "success": False,
+            "error": "無效的分頁游標",
+            "message": str(e)
+        }
     except Exception as e:
         logger.error(f"處理影片搜尋請求失敗: {e}")
         return {
@@ -103,6 +140,18 @@ async def handle_search_movies(data: Dict[str, Any], os_client: OpenSubtitlesCli
             "message": str(e)
         }
 
+def _movie_id(movie: Any) -> Optional[str]:
+    """取得 MovieInfo 或 dict 的 IMDb ID"""
+    return movie.get('imdb_id') if isinstance(movie, dict) else getattr(movie, 'imdb_id', None)
+
+def _save_movies(movies: List[Any], turso_client: TursoClient, movie_writer: Optional[WriteBehindQueue]):
+    """儲存影片：有延遲寫入佇列時排入佇列後立即返回，否則同步寫入"""
+    if movie_writer:
+        movie_writer.enqueue_movies(movies)
+    elif turso_client:
+        for movie in movies:
+            turso_client.save_movie(movie)
+
 async def handle_movie_details(movie_id: str, turso_client: TursoClient) -> Dict[str, Any]:
     """處理影片詳情請求"""
     try:
@@ -116,7 +165,7 @@ async def handle_movie_details(movie_id: str, turso_client: TursoClient) -> Dict
         logger.info(f"取得影片詳情: {movie_id}")
 
         # 從資料庫取得影片詳情
-        movie = turso_client.get_movie_by_imdb_id(movie_id) if turso_client else None
+        movie = await run_io(turso_client.get_movie_by_imdb_id, movie_id) if turso_client else None
 
         if movie:
             return {
@@ -138,4 +187,88 @@ async def handle_movie_details(movie_id: str, turso_client: TursoClient) -> Dict
             "success": False,
             "error": "取得影片詳情失敗",
             "message": str(e)
-        }
\ No newline at end of file
+        }
+
+def movie_etag(movie_id: str, turso_client: TursoClient) -> Optional[str]:
+    """影片詳情的 ETag：以影片資料的更新時間產生（單列且由讀穿快取提供）"""
+    movie = turso_client.get_movie_by_imdb_id(movie_id) if movie_id and turso_client else None
+    version = movie and (movie.get('updated_at') or movie.get('created_at'))
+    return entity_tag("movie", movie_id, version) if version else None
+
+async def handle_similar_movies(movie_id: str, data: Dict[str, Any], turso_client: TursoClient) -> Dict[str, Any]:
+    """處理相似影片請求：詞彙相近（MinHash/LSH）且難度接近的影片"""
+    try:
+        if not movie_id:
+            return {
+                "success": False,
+                "error": "影片 ID 不能為空",
+                "message": "請提供有效的 IMDb ID"
+            }
+
+        if not turso_client:
+            return {
+                "success": False,
+                "error": "Turso 客戶端未初始化",
+                "message": "無法查詢相似影片"
+            }
+
+        limit = min(clamp_page_size(data.get('limit'), SIMILAR_MOVIES_DEFAULT), SIMILAR_MOVIES_MAX)
+        max_gap = data.get('max_difficulty_gap')
+
+        # 多取一些候選，依難度差距重新排序後再截斷
+        similar = await run_io(turso_client.find_similar_movies, movie_id, limit=limit * 3)
+        if not similar:
+            return {
+                "success": True,
+                "data": {"imdb_id": movie_id, "similar": []},
+                "message": "沒有找到相似影片（影片尚未建立字幕索引或片庫中沒有相近的影片）"
+            }
+
+        ids = [item['movie_id'] for item in similar]
+        movies = await run_io(turso_client.get_movies_by_imdb_ids, ids)
+        difficulty = await run_io(_difficulty_scores, turso_client, [movie_id, *ids])
+        source_score = difficulty.get(movie_id)
+
+        results = []
+        for item in similar:
+            score = difficulty.get(item['movie_id'])
+            gap = abs(score - source_score) if score is not None and source_score is not None else None
+            if max_gap is not None and (gap is None or gap > float(max_gap)):
+                continue
+            movie = movies.get(item['movie_id'], {})
+            results.append({
+                **item,
+                "title": movie.get('title'),
+                "year": movie.get('year'),
+                "difficulty_score": score,
+                "difficulty_gap": gap,
+                # 詞彙相似度依難度差距折減
+                "score": round(item['similarity'] * (1 - gap / 100), 4) if gap is not None else item['similarity']
+            })
+
+        results.sort(key=lambda item: -item['score'])
+        return {
+            "success": True,
+            "data": {"imdb_id": movie_id, "difficulty_score": source_score, "similar": results[:limit]},
+            "message": f"找到 {len(results[:limit])} 部相似影片"
+        }
+
+    except Exception as e:
+        logger.error(f"處理相似影片請求失敗: {e}")
+        return {
+            "success": False,
+            "error": "查詢相似影片失敗",
+            "message": str(e)
+        }
+
+def _difficulty_scores(turso_client: TursoClient, movie_ids: List[str]) -> Dict[str, float]:
+    """由已儲存的綜合分析取出難度分數"""
+    scores = {}
+    for movie_id, analysis in turso_client.get_analyses(movie_ids, COMPREHENSIVE_ANALYSIS).items():
+        try:
+            score = json.loads(analysis.get('data') or '{}').get('difficulty_assessment', {}).get('overall_score')
+        except ValueError:
+            continue
+        if score is not None:
+            scores[movie_id] = score
+    return scores
@@ -1,18 +1,33 @@
+import json
 import logging
-from typing import Dict, Any
+from bisect import bisect_right
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from utils.opensubtitles import OpenSubtitlesClient
 from utils.subtitle_parser import SubtitleParser
 from utils.turso_client import TursoClient
+from utils.pagination import InvalidCursorError, build_page, clamp_page_size, decode_cursor, encode_cursor
+from utils.executors import run_cpu, run_io
+from utils.response import entity_tag
 
 logger = logging.getLogger(__name__)
 
+# 串流模式：每批自資料庫讀取並送出的條目數，單一請求的記憶體用量以此為上限
+STREAM_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesClient,
-                              subtitle_parser: SubtitleParser, turso_client: TursoClient) -> Dict[str, Any]:
-    """處理字幕抓取請求"""
+                              subtitle_parser: SubtitleParser, turso_client: TursoClient,
+                              download: bool = True) -> Dict[str, Any]:
+    """處理字幕抓取請求；download 為 False 時只讀取已儲存的字幕，不下載也不寫入"""
     try:
         imdb_id = data.get('imdb_id')
         language = data.get('language', 'en')
-        force_refresh = data.get('force_refresh', False)
+        force_refresh = download and data.get('force_refresh', False)
+        # 指定 cursor 或 limit 時分頁回傳字幕條目，否則維持回傳全部條目；stream 時以 NDJSON 逐批送出（cursor 可接續中斷的串流）
+        cursor = data.get('cursor')
+        stream = bool(data.get('stream'))
+        paginate = not stream and (bool(cursor) or 'limit' in data)
+        limit = clamp_page_size(data.get('limit'))
 
         if not imdb_id:
             return {
@@ -26,11 +41,30 @@ async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesCl
         # 檢查是否已存在字幕
         existing_subtitle = None
         if not force_refresh and turso_client:
-            existing_subtitle = turso_client.get_subtitle_by_imdb_id(imdb_id)
+            existing_subtitle = await run_io(turso_client.get_subtitle_by_imdb_id, imdb_id)
 
         if existing_subtitle and not force_refresh:
+            if stream:
+                after = decode_cursor(cursor, ['sequence_number'])
+                header = {
+                    "imdb_id": imdb_id,
+                    "language": language,
+                    "file_name": existing_subtitle.get('file_name'),
+                    "download_count": existing_subtitle.get('download_count', 0),
+                    "rating": existing_subtitle.get('rating', 0),
+                    "cached": True
+                }
+                return _stream_response(_stream_db_entries(turso_client, imdb_id, header, after), "使用快取字幕（串流）")
+
             # 取得字幕條目
-            entries = turso_client.get_subtitle_entries(imdb_id)
+            content_hash = existing_subtitle.get('content_hash')
+            next_cursor = None
+            if paginate:
+                entries_page = await run_io(turso_client.get_subtitle_entries_page, imdb_id, limit, cursor)
+                entries = entries_page['items']
+                next_cursor = entries_page['next_cursor']
+            else:
+                entries = await run_io(turso_client.get_subtitle_entries, imdb_id)
             return {
                 "success": True,
                 "cached": True,
@@ -41,20 +75,31 @@ async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesCl
                     "download_count": existing_subtitle.get('download_count', 0),
                     "rating": existing_subtitle.get('rating', 0),
                     "entries_count": len(entries),
-                    "entries": entries
+                    "entries": entries,
+                    "next_cursor": next_cursor
                 },
+                # 同一份字幕內容與分頁參數的回應體可重複使用（序列化與壓縮結果由回應層快取）
+                "cache_key": ("subtitles", imdb_id, content_hash, language, cursor, limit if paginate else None)
+                             if content_hash else None,
                 "message": "使用快取字幕"
             }
 
+        if not download:
+            return {
+                "success": False,
+                "error": "尚未抓取字幕",
+                "message": f"影片 {imdb_id} 尚無字幕，請以 POST /subtitles/fetch 抓取"
+            }
+
         # 抓取字幕
         if os_client:
             logger.info(f"從 OpenSubtitles 下載字幕...")
-            subtitle_content = os_client.download_best_subtitle(imdb_id, language)
+            subtitle_content = await run_io(os_client.download_best_subtitle, imdb_id, language)
 
             if subtitle_content:
                 logger.info(f"字幕下載成功，開始解析...")
-                # 解析字幕
-                parsed_entries = subtitle_parser.parse(subtitle_content)
+                # 解析字幕並計算統計資訊（程序池）
+                parsed_entries, stats = await run_cpu(parse_subtitle_content, subtitle_parser, subtitle_content)
 
                 # 儲存字幕資料
                 subtitle_data = {
@@ -65,17 +110,34 @@ async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesCl
                     'download_count': 0,  # 無法取得
                     'rating': 0,
                     'content': subtitle_content,
-                    'parsed_entries': [entry.__dict__ for entry in parsed_entries]
+                    'parsed_entries': parsed_entries
                 }
 
                 if turso_client:
-                    turso_client.save_subtitle(subtitle_data)
-
-                # 計算統計資訊
-                stats = subtitle_parser.get_statistics(parsed_entries)
+                    await run_io(turso_client.save_subtitle, subtitle_data)
 
                 logger.info(f"字幕解析完成: {stats.get('total_entries', 0)} 個條目")
 
+                # 新抓取的字幕以相同游標格式在記憶體中分頁
+                entries = subtitle_data['parsed_entries']
+                if stream:
+                    header = {
+                        "imdb_id": imdb_id,
+                        "language": language,
+                        "file_name": subtitle_data['file_name'],
+                        "statistics": stats,
+                        "cached": False
+                    }
+                    after = decode_cursor(cursor, ['sequence_number'])
+                    return _stream_response(_stream_parsed_entries(entries, header, after),
+                                            f"字幕抓取和解析成功，共 {len(parsed_entries)} 個條目（串流）")
+
+                next_cursor = None
+                if paginate:
+                    entries_page = _paginate_parsed_entries(entries, limit, cursor)
+                    entries = entries_page['items']
+                    next_cursor = entries_page['next_cursor']
+
                 return {
                     "success": True,
                     "cached": False,
@@ -84,7 +146,8 @@ async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesCl
                         "language": language,
                         "file_name": subtitle_data['file_name'],
                         "entries_count": len(parsed_entries),
-                        "entries": subtitle_data['parsed_entries'],
+                        "entries": entries,
+                        "next_cursor": next_cursor,
                         "statistics": stats
                     },
                     "message": f"字幕抓取和解析成功，共 {len(parsed_entries)} 個條目"
@@ -102,6 +165,12 @@ async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesCl
                 "message": "無法連接到 OpenSubtitles API"
             }
 
+    except InvalidCursorError as e:
+        return {
+            "success": False,
+            "error": "無效的分頁游標",
+            "message": str(e)
+        }
     except Exception as e:
         logger.error(f"處理字幕抓取請求失敗: {e}")
         return {
@@ -110,6 +179,86 @@ async def handle_subtitle_fetch(data: Dict[str, Any], os_client: OpenSubtitlesCl
             "message": str(e)
         }
 
+def subtitle_etag(data: Dict[str, Any], turso_client: TursoClient) -> Optional[str]:
+    """快取字幕回應的 ETag：只讀取字幕內容雜湊，不載入條目；重新抓取與串流時不提供"""
+    imdb_id = data.get('imdb_id')
+    if not imdb_id or not turso_client or data.get('force_refresh') or data.get('stream'):
+        return None
+
+    content_hash = turso_client.get_subtitle_content_hash(imdb_id)
+    if not content_hash:
+        return None
+
+    cursor = data.get('cursor')
+    paginate = bool(cursor) or 'limit' in data
+    return entity_tag("subtitles", imdb_id, content_hash, data.get('language', 'en'), cursor,
+                      clamp_page_size(data.get('limit')) if paginate else None)
+
+def parse_subtitle_content(subtitle_parser: SubtitleParser, content: str) -> Tuple[List[Dict], Dict[str, Any]]:
+    """解析字幕內容並計算統計資訊（在程序池執行，條目以 dict 回傳）"""
+    entries = subtitle_parser.parse(content)
+    return [entry.__dict__ for entry in entries], subtitle_parser.get_statistics(entries)
+
+def _ndjson(records: List[Dict[str, Any]]) -> bytes:
+    """多筆紀錄編碼為 NDJSON（每行一筆）"""
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+
+def _stream_response(stream: AsyncIterator[bytes], message: str) -> Dict[str, Any]:
+    """串流模式的處理器回應，由路由層轉為分塊傳輸的 HTTP 回應"""
+    return {
+        "success": True,
+        "stream": stream,
+        "media_type": NDJSON_MEDIA_TYPE,
+        "message": message
+    }
+
+async def _stream_db_entries(turso_client: TursoClient, imdb_id: str, header: Dict[str, Any],
+                             after: Optional[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """先送出字幕資訊，再以 keyset 分批自資料庫讀出條目；最後一行為 end（缺少時表示串流中斷）"""
+    yield _ndjson([{"type": "subtitle", **header}])
+
+    count = 0
+    sequence = after['sequence_number'] if after else None
+    while True:
+        page = await run_io(_entries_after, turso_client, imdb_id, sequence)
+        if not page:
+            break
+        count += len(page)
+        sequence = page[-1]['sequence_number']
+        yield _ndjson([{"type": "entry", **entry} for entry in page])
+        if len(page) < STREAM_BATCH_SIZE:
+            break
+
+    yield _ndjson([{"type": "end", "entries_count": count}])
+
+def _entries_after(turso_client: TursoClient, imdb_id: str, sequence: Optional[int]) -> List[Dict]:
+    """讀取序號之後的一批條目"""
+    cursor = encode_cursor({'sequence_number': sequence}) if sequence is not None else None
+    return turso_client.get_subtitle_entries_page(imdb_id, STREAM_BATCH_SIZE, cursor)['items']
+
+async def _stream_parsed_entries(entries: List[Dict], header: Dict[str, Any],
+                                 after: Optional[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """剛解析的字幕軌以相同格式分批送出"""
+    yield _ndjson([{"type": "subtitle", **header}])
+
+    start = 0
+    if after:
+        start = bisect_right([entry.get('index', 0) for entry in entries], after['sequence_number'])
+    for offset in range(start, len(entries), STREAM_BATCH_SIZE):
+        yield _ndjson([{"type": "entry", **entry} for entry in entries[offset:offset + STREAM_BATCH_SIZE]])
+
+    yield _ndjson([{"type": "end", "entries_count": len(entries) - start}])
+
+def _paginate_parsed_entries(entries: List[Dict], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """對已解析的字幕條目套用與資料庫相同的 keyset 分頁"""
+    after = decode_cursor(cursor, ['sequence_number'])
+    start = 0
+    if after:
+        # 條目依序號排序，二分搜尋起點
+        start = bisect_right([entry.get('index', 0) for entry in entries], after['sequence_number'])
+    return build_page(entries[start:start + limit + 1], limit,
+                      lambda entry: {'sequence_number': entry.get('index', 0)})
+
 async def get_subtitle_statistics(imdb_id: str, turso_client: TursoClient) -> Dict[str, Any]:
     """取得字幕統計資訊"""
     try:
@@ -121,7 +270,7 @@ async def get_subtitle_statistics(imdb_id: str, turso_client: TursoClient) -> Di
             }
 
         # 取得字幕元資料
-        metadata = turso_client.get_subtitle_by_imdb_id(imdb_id)
+        metadata = await run_io(turso_client.get_subtitle_by_imdb_id, imdb_id)
         if not metadata:
             return {
                 "success": False,
@@ -130,7 +279,7 @@ async def get_subtitle_statistics(imdb_id: str, turso_client: TursoClient) -> Di
             }
 
         # 取得字幕條目
-        entries = turso_client.get_subtitle_entries(imdb_id)
+        entries = await run_io(turso_client.get_subtitle_entries, imdb_id)
 
         if not entries:
             return {
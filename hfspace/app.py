@@ -1,13 +1,14 @@
-import gradio as gr
 import json
 import os
 import logging
 import asyncio
+import atexit
+import re
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-import uvicorn
+from typing import Awaitable, Callable, Dict, Any, Optional, Tuple, Type
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 # 設定日誌
 logging.basicConfig(
@@ -16,108 +17,304 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 日誌同時寫入記憶體環形緩衝區，供日誌面板與 /logs 端點讀取（先於客戶端初始化掛上，啟動日誌也會保留）
+from utils.log_buffer import install_log_buffer, format_entry, level_number
+log_buffer = install_log_buffer()
+# 日誌面板顯示的行數
+LOG_PANEL_LINES = 200
+
 # 匯入工具模組
 from utils.opensubtitles import OpenSubtitlesClient
 from utils.subtitle_parser import SubtitleParser
 from utils.turso_client import TursoClient
-from api_handlers.movies import handle_popular_movies, handle_search_movies, handle_movie_details
-from api_handlers.subtitles import handle_subtitle_fetch
-from api_handlers.analysis import handle_movie_analysis
+from utils.write_behind import WriteBehindQueue
+from utils.job_queue import AnalysisJobQueue
+from utils.lexicon import get_lexicon
+from utils.coverage import CoverageEngine
+from utils.executors import get_executors, run_io
+from utils.lazy import LazyDependency, STATUS_DISABLED, STATUS_FAILED, STATUS_READY, warm_up_in_background
+from utils.tracing import Span, export_trace, should_export, span, start_trace
+from utils.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUEST_DURATION, cache_families, executor_families
+from utils.response import (
+    JSON_MEDIA_TYPE,
+    IDENTITY,
+    ResponseBodyCache,
+    cache_headers,
+    dumps,
+    encode_body,
+    negotiate_encoding,
+    not_modified_encoding
+)
+from config.settings import (
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_JOURNAL_PATH,
+    WRITE_BEHIND_MAX_BATCH,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    ANALYSIS_WORKERS,
+    ANALYSIS_QUEUE_MAX,
+    DEPENDENCY_WARM_UP,
+    OPENSUBTITLES_API_KEY,
+    TURSO_URL,
+    TURSO_AUTH_TOKEN
+)
+from api_handlers.movies import handle_popular_movies, handle_search_movies, handle_movie_details, handle_similar_movies, movie_etag
+from api_handlers.subtitles import handle_subtitle_fetch, subtitle_etag
+from api_handlers.analysis import handle_analysis_read, handle_movie_analysis, handle_movie_phrases, analyze_movie, analysis_etag, analyzer_version
+from api_handlers.jobs import handle_job_submit, handle_job_status, handle_job_stats, handle_executor_stats
+from api_handlers.batch_analysis import handle_batch_analysis, handle_batch_status
+from api_handlers.logs import handle_log_tail, handle_log_stream
+from api_handlers.batch import handle_batch
+from api_handlers.learners import handle_known_words, handle_movie_coverage, handle_coverage_ranking
+from api_handlers.models import (
+    BatchAnalysisRequest,
+    BatchRequest,
+    CoverageQuery,
+    LogQuery,
+    JobSubmitRequest,
+    KnownWordsRequest,
+    LimitQuery,
+    PageQuery,
+    RankingQuery,
+    RequestModel,
+    SearchQuery,
+    SimilarQuery,
+    SubtitleFetchRequest,
+    SubtitleQuery
+)
 
 # 設定 FastAPI 應用
 app = FastAPI(title="SubtitleLingo API Server")
 
-# 初始化客戶端
-try:
-    os_client = OpenSubtitlesClient()
-    turso_client = TursoClient()
-    subtitle_parser = SubtitleParser()
-    logger.info("所有客戶端初始化成功")
-except Exception as e:
-    logger.error(f"客戶端初始化失敗: {e}")
-    os_client = None
-    turso_client = None
-    subtitle_parser = None
+# 客戶端於第一次使用時建立，各自獨立失敗；啟動後由背景執行緒預熱（資料庫連線、結構檢查）。
+# 未設定或初始化失敗的客戶端真值為 False，處理器沿用 `if client:` 改走替代做法（例如改由資料庫取得影片）
+os_client = LazyDependency("opensubtitles", OpenSubtitlesClient, spec=OpenSubtitlesClient,
+                           configured=lambda: bool(OPENSUBTITLES_API_KEY))
+turso_client = LazyDependency("turso", TursoClient, spec=TursoClient,
+                              configured=lambda: bool(TURSO_URL and TURSO_AUTH_TOKEN))
+# 解析器沒有外部依賴且會傳入程序池（需可 pickle），直接建立
+subtitle_parser = SubtitleParser()
+
+# 詞表（記憶體映射）於預熱時載入，載入耗時記錄於日誌與系統狀態
+lexicon = LazyDependency("lexicon", get_lexicon)
+
+# 影片延遲寫入佇列，讓熱門/搜尋請求不必等待逐筆寫入；資料庫未設定時不建立，資料庫暫時失敗時佇列暫停寫入
+movie_writer = None
+if turso_client.is_configured and WRITE_BEHIND_ENABLED:
+    try:
+        movie_writer = WriteBehindQueue(
+            turso_client,
+            WRITE_BEHIND_JOURNAL_PATH,
+            max_batch=WRITE_BEHIND_MAX_BATCH,
+            flush_interval=WRITE_BEHIND_FLUSH_INTERVAL
+        )
+        atexit.register(movie_writer.close)
+    except Exception as e:
+        logger.error(f"延遲寫入佇列初始化失敗，改為同步寫入: {e}")
+        movie_writer = None
+
+# 背景分析工作佇列，長時間分析不再佔用請求；建立時會自資料庫重新排入未完成的工作，因此在資料庫之後預熱
+analysis_jobs = LazyDependency("analysis_jobs", lambda: AnalysisJobQueue(
+    turso_client.instance(),
+    lambda movie_id, analysis_type: analyze_movie(movie_id, turso_client, subtitle_parser),
+    version=analyzer_version(),
+    max_workers=ANALYSIS_WORKERS,
+    max_pending=ANALYSIS_QUEUE_MAX
+), spec=AnalysisJobQueue, configured=lambda: turso_client.is_configured) if ANALYSIS_WORKERS > 0 else None
+
+def job_queue() -> Optional[AnalysisJobQueue]:
+    """分析工作佇列；停用、尚未預熱完成或初始化失敗時為 None，分析改為同步執行（未建立時在背景建立）"""
+    return analysis_jobs.get_nowait() if analysis_jobs is not None else None
+
+def close_analysis_jobs():
+    """停止分析工作佇列（未建立時不建立）"""
+    if analysis_jobs is not None and analysis_jobs.peek():
+        analysis_jobs.peek().close()
+
+atexit.register(close_analysis_jobs)
+
+# 學習者覆蓋率排名：片庫詞彙於第一次排名時載入記憶體
+coverage_engine = CoverageEngine(turso_client)
+
+# 預熱順序：本地詞表、資料庫、依賴資料庫的分析佇列、OpenSubtitles
+DEPENDENCIES = [lexicon, turso_client] + ([analysis_jobs] if analysis_jobs is not None else []) + [os_client]
+
+@app.on_event("startup")
+async def warm_up_dependencies():
+    """啟動後在背景建立依賴，不延遲伺服器開始接受請求"""
+    if DEPENDENCY_WARM_UP:
+        warm_up_in_background(DEPENDENCIES)
+
+@app.on_event("shutdown")
+async def drain_background_queues():
+    """關閉前寫完延遲寫入佇列、停止分析工作佇列與執行器"""
+    if movie_writer:
+        movie_writer.close()
+    close_analysis_jobs()
+    get_executors().close()
+
+# 健康檢查（模組載入時註冊一次）
+@app.get("/health")
+async def health_check(ready: bool = False):
+    """各依賴的就緒狀態：全部就緒（未設定的依賴除外）為 healthy，仍在預熱為 starting，有依賴失敗為 degraded。
+    程序存活即回傳 200；ready=true 時未全部就緒回傳 503，供就緒探測使用"""
+    try:
+        dependencies = {dependency.dependency_name: dependency.dependency_status() for dependency in DEPENDENCIES}
+        statuses = {dependency["status"] for dependency in dependencies.values()} - {STATUS_DISABLED}
+        if statuses <= {STATUS_READY}:
+            overall = "healthy"
+        elif STATUS_FAILED in statuses:
+            overall = "degraded"
+        else:
+            overall = "starting"
+
+        status = {
+            "status": overall,
+            "timestamp": datetime.now().isoformat(),
+            "dependencies": dependencies
+        }
+        return JSONResponse(status, status_code=503 if ready and overall != "healthy" else 200)
+    except Exception as e:
+        logger.error(f"健康檢查失敗: {e}")
+        return JSONResponse({"status": "unhealthy", "error": str(e)}, status_code=500)
+
+Handler = Callable[[Dict[str, str], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+# 由版本資訊計算 ETag（同步，在 I/O 執行緒池執行），回傳 None 表示不提供條件式請求
+EntityTag = Callable[[Dict[str, str], Dict[str, Any]], Optional[str]]
 
 class SubtitleLingoAPI:
-    """SubtitleLingo API 伺服器"""
+    """SubtitleLingo API 伺服器：端點路由表與請求記錄，型別化路由與 webhook 共用"""
 
     def __init__(self):
-        self.setup_health_check()
-
-    def setup_health_check(self):
-        """設定健康檢查"""
-        @app.get("/health")
-        async def health_check():
-            try:
-                # 檢查所有客戶端狀態
-                status = {
-                    "status": "healthy",
-                    "timestamp": datetime.now().isoformat(),
-                    "clients": {}
-                }
-
-                if os_client:
-                    status["clients"]["opensubtitles"] = "connected"
-                if turso_client:
-                    status["clients"]["turso"] = "connected"
-                if subtitle_parser:
-                    status["clients"]["subtitle_parser"] = "ready"
-
-                return JSONResponse(status)
-            except Exception as e:
-                logger.error(f"健康檢查失敗: {e}")
-                return JSONResponse({"status": "unhealthy", "error": str(e)}, status_code=500)
-
-    def log_api_request(self, endpoint: str, params: Dict, response_time: float, status: str):
-        """記錄 API 請求日誌"""
-        logger.info(f"API: {endpoint} | 參數: {params} | 時間: {response_time:.2f}s | 狀態: {status}")
+        # 端點樣板 -> (比對用正規表示式, 處理器, ETag)；樣板中的 {name} 為路徑參數，依註冊順序比對
+        self.routes: Dict[str, Tuple[re.Pattern, Handler, Optional[EntityTag]]] = {}
+        # 端點樣板 -> 請求模型（沒有參數的端點為 None）
+        self.models: Dict[str, Optional[Type[RequestModel]]] = {}
+        self.register_routes()
+
+    def add_route(self, template: str, handler: Handler, etag: Optional[EntityTag] = None,
+                  model: Optional[Type[RequestModel]] = None):
+        """註冊端點；model 為型別化路由使用的請求模型，批次子請求以此驗證參數"""
+        pattern = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", template) + "$")
+        self.routes[template] = (pattern, handler, etag)
+        self.models[template] = model
+
+    def register_routes(self):
+        """註冊所有端點與對應的處理器"""
+        self.add_route("/movies/popular", lambda params, data: handle_popular_movies(data, os_client, turso_client, movie_writer),
+                       model=PageQuery)
+        self.add_route("/movies/search", lambda params, data: handle_search_movies(data, os_client, turso_client, movie_writer),
+                       model=SearchQuery)
+        self.add_route("/movies/{movie_id}/details", lambda params, data: handle_movie_details(params["movie_id"], turso_client),
+                       etag=lambda params, data: movie_etag(params["movie_id"], turso_client))
+        self.add_route("/movies/{movie_id}/analyze", lambda params, data: handle_movie_analysis(
+            params["movie_id"], turso_client, subtitle_parser, job_queue()))
+        self.add_route("/movies/{movie_id}/analysis", lambda params, data: handle_analysis_read(params["movie_id"], turso_client),
+                       etag=lambda params, data: analysis_etag(params["movie_id"], turso_client))
+        self.add_route("/movies/{movie_id}/phrases", lambda params, data: handle_movie_phrases(params["movie_id"], data, turso_client),
+                       model=LimitQuery)
+        self.add_route("/movies/{movie_id}/similar", lambda params, data: handle_similar_movies(params["movie_id"], data, turso_client),
+                       model=SimilarQuery)
+        self.add_route("/movies/{movie_id}/coverage", lambda params, data: handle_movie_coverage(params["movie_id"], data, turso_client),
+                       model=CoverageQuery)
+        self.add_route("/subtitles/fetch", lambda params, data: handle_subtitle_fetch(data, os_client, subtitle_parser, turso_client),
+                       model=SubtitleFetchRequest)
+        # 已儲存字幕的唯讀端點（/subtitles/fetch 先註冊，比對時優先）
+        self.add_route("/subtitles/{imdb_id}", lambda params, data: handle_subtitle_fetch(
+            {**data, "imdb_id": params["imdb_id"]}, os_client, subtitle_parser, turso_client, download=False),
+                       etag=lambda params, data: subtitle_etag({**data, "imdb_id": params["imdb_id"]}, turso_client),
+                       model=SubtitleQuery)
+        self.add_route("/jobs/analyze", lambda params, data: handle_job_submit(data, job_queue()), model=JobSubmitRequest)
+        self.add_route("/jobs/stats", lambda params, data: handle_job_stats(job_queue()))
+        self.add_route("/system/executors", lambda params, data: handle_executor_stats())
+        self.add_route("/jobs/{job_id}", lambda params, data: handle_job_status(params["job_id"], job_queue(), turso_client))
+        self.add_route("/learners/known-words", lambda params, data: handle_known_words(data, turso_client, lexicon.peek()),
+                       model=KnownWordsRequest)
+        self.add_route("/learners/ranking", lambda params, data: handle_coverage_ranking(data, turso_client, coverage_engine),
+                       model=RankingQuery)
+        self.add_route("/analysis/batch", lambda params, data: handle_batch_analysis(data, turso_client),
+                       model=BatchAnalysisRequest)
+        self.add_route("/analysis/batch/status", lambda params, data: handle_batch_status(data))
+        self.add_route("/analysis/batch/stop", lambda params, data: handle_batch_status({**data, "stop": True}))
+        self.add_route("/logs", lambda params, data: handle_log_tail(data, log_buffer), model=LogQuery)
+        self.add_route("/logs/stream", lambda params, data: handle_log_stream(data, log_buffer), model=LogQuery)
+        self.add_route("/batch", lambda params, data: handle_batch(data, self), model=BatchRequest)
+
+    def log_api_request(self, template: str, params: Dict, response_time: float, status: str):
+        """記錄 API 請求日誌：只記錄端點樣板與參數大小，參數值可能含使用者資料且會進入日誌緩衝區"""
+        size = len(dumps(params)) if params else 0
+        logger.info(f"API: {template} | 參數: {len(params or {})} 個 / {size} bytes | 時間: {response_time:.2f}s | 狀態: {status}")
+
+    def validate(self, template: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """以端點的請求模型驗證並正規化參數（與型別化路由相同）；不符時拋出 ValidationError"""
+        model = self.models.get(template)
+        return model.model_validate(data).to_data() if model else data
+
+    async def call(self, template: str, path_params: Dict[str, str], data: Dict[str, Any],
+                   method: str = "GET") -> Dict[str, Any]:
+        """以端點樣板直接呼叫處理器（型別化路由使用，不需比對路徑）"""
+        _, handler, _ = self.routes[template]
+        return await self.run(template, data, method, lambda: handler(path_params, data))
+
+    def resolve(self, endpoint: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """比對路由表，回傳 (端點樣板, 路徑參數)"""
+        for template, (pattern, _, _) in self.routes.items():
+            match = pattern.match(endpoint)
+            if match:
+                return template, match.groupdict()
+        return None
+
+    async def entity_tag(self, template: str, path_params: Dict[str, str], data: Dict[str, Any]) -> Optional[str]:
+        """計算端點回應的 ETag；端點不支援或計算失敗時為 None"""
+        etag = self.routes[template][2]
+        if not etag:
+            return None
+        try:
+            with span("etag"):
+                return await run_io(etag, path_params, data)
+        except Exception as e:
+            logger.warning(f"計算 ETag 失敗 {template}: {e}")
+            return None
 
     async def process_request(self, endpoint: str, data: Dict[str, Any], method: str = "GET") -> Dict[str, Any]:
-        """統一處理 API 請求"""
+        """依路由表處理 webhook 請求"""
+        resolved = self.resolve(endpoint)
+        if resolved:
+            template, params = resolved
+            return await self.call(template, params, data, method)
+        return self.unknown_endpoint(endpoint, data)
+
+    def unknown_endpoint(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """不支援的端點"""
+        result = {
+            "success": False,
+            "error": "不支援的端點",
+            "message": f"端點 {endpoint} 不存在",
+            "available_endpoints": list(self.routes)
+        }
+        # 未比對到的路徑由用戶端提供，不寫入日誌
+        self.log_api_request("<unknown>", data, 0.0, "failed")
+        return result
+
+    async def run(self, template: str, data: Dict[str, Any], method: str,
+                  invoke: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """執行處理器並記錄回應時間與狀態（以端點樣板記錄，不含路徑參數）"""
         start_time = datetime.now()
 
         try:
-            logger.info(f"處理 {method} 請求: {endpoint}")
-
-            # 路由到對應的處理器
-            if endpoint == "/movies/popular":
-                result = await handle_popular_movies(data, os_client, turso_client)
-            elif endpoint == "/movies/search":
-                result = await handle_search_movies(data, os_client, turso_client)
-            elif endpoint.startswith("/movies/") and endpoint.endswith("/details"):
-                movie_id = endpoint.split("/")[-2]
-                result = await handle_movie_details(movie_id, turso_client)
-            elif endpoint == "/subtitles/fetch":
-                result = await handle_subtitle_fetch(data, os_client, subtitle_parser, turso_client)
-            elif endpoint.startswith("/movies/") and endpoint.endswith("/analyze"):
-                movie_id = endpoint.split("/")[-2]
-                result = await handle_movie_analysis(movie_id, turso_client, subtitle_parser)
-            else:
-                result = {
-                    "success": False,
-                    "error": "不支援的端點",
-                    "message": f"端點 {endpoint} 不存在",
-                    "available_endpoints": [
-                        "/movies/popular",
-                        "/movies/search",
-                        "/movies/{id}/details",
-                        "/movies/{id}/analyze",
-                        "/subtitles/fetch"
-                    ]
-                }
+            logger.info(f"處理 {method} 請求: {template}")
+            result = await invoke()
 
             # 計定回應時間
             response_time = (datetime.now() - start_time).total_seconds()
             status = "success" if result.get("success", False) else "failed"
-            self.log_api_request(endpoint, data, response_time, status)
+            self.log_api_request(template, data, response_time, status)
 
             return result
 
         except Exception as e:
             response_time = (datetime.now() - start_time).total_seconds()
-            self.log_api_request(endpoint, data, response_time, "error")
-            logger.error(f"處理請求失敗 {endpoint}: {e}")
+            self.log_api_request(template, data, response_time, "error")
+            logger.error(f"處理請求失敗 {template}: {e}")
 
             return {
                 "success": False,
@@ -126,16 +323,235 @@ class SubtitleLingoAPI:
                 "response_time": response_time
             }
 
-# 設定 FastAPI webhook 路由
+api = SubtitleLingoAPI()
+
+# 已序列化與壓縮的回應體（處理器以 cache_key 標記可重複使用的回應，如快取的字幕與分析結果）
+response_cache = ResponseBodyCache()
+
+async def respond(request: Request, result: Dict[str, Any], etag: Optional[str] = None) -> Response:
+    """處理器結果轉為 HTTP 回應：串流結果以分塊傳輸逐批送出，其餘以快速序列化器編碼並依 Accept-Encoding 壓縮"""
+    # 背景工作的結果可能同時回應多個請求，不直接修改
+    result = dict(result)
+    stream = result.pop("stream", None)
+    if stream is not None:
+        return StreamingResponse(stream, media_type=result.get("media_type"), headers=result.get("headers"))
+
+    cache_key = result.pop("cache_key", None)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    with span("response.encode", {"http.response.encoding": encoding}):
+        body, encoding = await run_io(encode_body, result, encoding, response_cache, cache_key)
+
+    headers = cache_headers(etag, encoding) if etag and result.get("success") else {"Vary": "Accept-Encoding"}
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+async def dispatch(request: Request, template: str, path_params: Dict[str, str], data: Dict[str, Any],
+                   method: str = "GET") -> Response:
+    """執行端點；支援 ETag 的端點以 GET 讀取時，If-None-Match 相符直接回傳 304，不載入回應內容也不執行處理器。
+    POST 不做條件式處理也不帶快取標頭（CDN 不快取 POST，條件式 POST 的語意是 412 而非 304）"""
+    etag = await api.entity_tag(template, path_params, data) if method == "GET" else None
+    if etag:
+        encoding = not_modified_encoding(request.headers.get("if-none-match"), etag,
+                                         negotiate_encoding(request.headers.get("accept-encoding")))
+        if encoding:
+            api.log_api_request(template, data, 0.0, "not_modified")
+            return Response(status_code=304, headers=cache_headers(etag, encoding))
+
+    with span("handler", {"http.route": template}):
+        result = await api.call(template, path_params, data, method)
+    return await respond(request, result, etag)
+
+# === 型別化路由：讀取使用 GET（可由 HTTP 中介快取並以 If-None-Match 重新驗證），抓取與分析使用 POST ===
+@app.get("/movies/popular")
+async def popular_movies(request: Request, params: PageQuery = Depends()):
+    """熱門影片"""
+    return await dispatch(request, "/movies/popular", {}, params.to_data())
+
+@app.get("/movies/search")
+async def search_movies(request: Request, params: SearchQuery = Depends()):
+    """搜尋影片"""
+    return await dispatch(request, "/movies/search", {}, params.to_data())
+
+@app.get("/movies/{movie_id}/details")
+async def movie_details(request: Request, movie_id: str):
+    """影片詳情"""
+    return await dispatch(request, "/movies/{movie_id}/details", {"movie_id": movie_id}, {})
+
+@app.post("/movies/{movie_id}/analyze")
+async def movie_analysis(request: Request, movie_id: str):
+    """分析影片"""
+    return await dispatch(request, "/movies/{movie_id}/analyze", {"movie_id": movie_id}, {}, "POST")
+
+@app.get("/movies/{movie_id}/analysis")
+async def movie_analysis_read(request: Request, movie_id: str):
+    """讀取已儲存的影片分析（唯讀，支援 ETag）"""
+    return await dispatch(request, "/movies/{movie_id}/analysis", {"movie_id": movie_id}, {})
+
+@app.get("/movies/{movie_id}/phrases")
+async def movie_phrases(request: Request, movie_id: str, params: LimitQuery = Depends()):
+    """影片片語"""
+    return await dispatch(request, "/movies/{movie_id}/phrases", {"movie_id": movie_id}, params.to_data())
+
+@app.get("/movies/{movie_id}/similar")
+async def similar_movies(request: Request, movie_id: str, params: SimilarQuery = Depends()):
+    """相似影片"""
+    return await dispatch(request, "/movies/{movie_id}/similar", {"movie_id": movie_id}, params.to_data())
+
+@app.get("/movies/{movie_id}/coverage")
+async def movie_coverage(request: Request, movie_id: str, params: CoverageQuery = Depends()):
+    """學習者對影片的已知單字覆蓋率"""
+    return await dispatch(request, "/movies/{movie_id}/coverage", {"movie_id": movie_id}, params.to_data())
+
+@app.post("/subtitles/fetch")
+async def subtitle_fetch(request: Request, body: SubtitleFetchRequest):
+    """抓取字幕"""
+    return await dispatch(request, "/subtitles/fetch", {}, body.to_data(), "POST")
+
+@app.get("/subtitles/{imdb_id}")
+async def subtitle_read(request: Request, imdb_id: str, params: SubtitleQuery = Depends()):
+    """讀取已儲存的字幕（唯讀，支援 ETag）"""
+    return await dispatch(request, "/subtitles/{imdb_id}", {"imdb_id": imdb_id}, params.to_data())
+
+@app.post("/jobs/analyze")
+async def job_submit(request: Request, body: JobSubmitRequest):
+    """提交背景分析工作"""
+    return await dispatch(request, "/jobs/analyze", {}, body.to_data(), "POST")
+
+@app.get("/jobs/stats")
+async def job_stats(request: Request):
+    """分析佇列統計"""
+    return await dispatch(request, "/jobs/stats", {}, {})
+
+@app.get("/system/executors")
+async def executor_stats(request: Request):
+    """I/O 與 CPU 執行器指標"""
+    return await dispatch(request, "/system/executors", {}, {})
+
+@app.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    """分析工作狀態"""
+    return await dispatch(request, "/jobs/{job_id}", {"job_id": job_id}, {})
+
+@app.post("/learners/known-words")
+async def known_words(request: Request, body: KnownWordsRequest):
+    """更新學習者已知單字"""
+    return await dispatch(request, "/learners/known-words", {}, body.to_data(), "POST")
+
+@app.get("/learners/ranking")
+async def coverage_ranking(request: Request, params: RankingQuery = Depends()):
+    """依已知單字覆蓋率排序片庫"""
+    return await dispatch(request, "/learners/ranking", {}, params.to_data())
+
+@app.post("/analysis/batch")
+async def batch_analysis(request: Request, body: BatchAnalysisRequest):
+    """啟動片庫批次分析"""
+    return await dispatch(request, "/analysis/batch", {}, body.to_data(), "POST")
+
+@app.get("/analysis/batch/status")
+async def batch_status(request: Request):
+    """批次分析進度"""
+    return await dispatch(request, "/analysis/batch/status", {}, {})
+
+@app.post("/analysis/batch/stop")
+async def batch_stop(request: Request):
+    """停止批次分析"""
+    return await dispatch(request, "/analysis/batch/stop", {}, {}, "POST")
+
+@app.get("/logs")
+async def logs(request: Request, params: LogQuery = Depends()):
+    """讀取記憶體日誌緩衝區"""
+    return await dispatch(request, "/logs", {}, params.to_data())
+
+@app.get("/logs/stream")
+async def logs_stream(request: Request, params: LogQuery = Depends()):
+    """以 Server-Sent Events 即時推送日誌"""
+    data = params.to_data()
+    last_event_id = request.headers.get("last-event-id")
+    if "since" not in data and last_event_id and last_event_id.isdigit():
+        data["since"] = int(last_event_id)
+    return await dispatch(request, "/logs/stream", {}, data)
+
+@app.post("/batch")
+async def batch_requests(request: Request, body: BatchRequest):
+    """一次執行多個子請求（例如搜尋、詳情、抓取、分析），減少呼叫端往返次數"""
+    return await dispatch(request, "/batch", {}, body.to_data(), "POST")
+
+# webhook 相容路由：舊的呼叫端仍以 POST /webhook/{端點} 傳入 JSON 參數
 @app.post("/webhook/{path:path}")
-async def webhook_handler(path: str, request: Dict[str, Any]):
+async def webhook_handler(request: Request, path: str, body: Dict[str, Any]):
     """處理所有 webhook 請求"""
-    api = SubtitleLingoAPI()
-
     # 移除路徑中的開頭斜線
     clean_path = path.lstrip('/')
 
-    return await api.process_request(f"/{clean_path}", request, "POST")
+    endpoint = f"/{clean_path}"
+    resolved = api.resolve(endpoint)
+    if not resolved:
+        return await respond(request, api.unknown_endpoint(endpoint, body))
+    template, params = resolved
+    return await dispatch(request, template, params, body, "POST")
+
+def collect_runtime_metrics():
+    """匯出時讀取快取命中率、執行器與分析佇列深度"""
+    caches = [response_cache.cache] + ([turso_client.cache] if turso_client.is_ready else [])
+    families = cache_families(caches) + executor_families(get_executors().stats())
+    if job_queue():
+        jobs = job_queue().stats()
+        families.append(("subtitlelingo_analysis_jobs_queued", "gauge", "分析佇列等待中的工作數", [({}, jobs["depth"])]))
+        families.append(("subtitlelingo_analysis_jobs_running", "gauge", "分析佇列執行中的工作數", [({}, jobs["running"])]))
+    if movie_writer:
+        families.append(("subtitlelingo_write_behind_pending", "gauge", "延遲寫入佇列待寫入筆數",
+                         [({}, movie_writer.pending_count())]))
+    return families
+
+REGISTRY.register_collector(collect_runtime_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指標"""
+    return PlainTextResponse(await run_io(REGISTRY.render), media_type=METRICS_CONTENT_TYPE)
+
+# 端點函式 -> 路由樣板（舊版 Starlette 的 scope 只有 endpoint，沒有 route）
+_route_templates: Dict[Any, str] = {}
+
+def route_template(request: Request) -> str:
+    """請求對應的路由樣板，作為指標標籤（不使用實際路徑，避免影片 ID 造成標籤爆量）"""
+    route = request.scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    if not _route_templates:
+        _route_templates.update({route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")})
+    return _route_templates.get(request.scope.get("endpoint"), "unmatched")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """記錄各路由與狀態碼的處理時間"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.labels(route_template(request), request.method, str(status)).observe(
+            time.perf_counter() - started)
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """為每個請求建立追蹤，處理器、上游、解析、資料庫與分析器的區段彙總於 Server-Timing 標頭"""
+    trace = start_trace()
+    if trace is None:
+        return await call_next(request)
+
+    with Span(trace, "http.request", {"http.method": request.method, "http.target": request.url.path}) as root:
+        response = await call_next(request)
+        root.set_attribute("http.route", route_template(request))
+        root.set_attribute("http.status_code", response.status_code)
+    response.headers["Server-Timing"] = trace.server_timing(root)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    if should_export(root):
+        await run_io(export_trace, trace)
+    return response
 
 # 設置 CORS 支援
 @app.middleware("http")
@@ -148,6 +564,8 @@ async def add_cors_headers(request, call_next):
 
 def create_gradio_interface():
     """建立 Gradio 介面"""
+    # gradio 匯入耗時數秒，只在啟動介面時匯入，API 伺服器不需要
+    import gradio as gr
 
     # API 測試區塊
     with gr.Blocks(theme=gr.themes.Soft()) as demo:
@@ -164,8 +582,10 @@ def create_gradio_interface():
                         choices=[
                             "/movies/popular",
                             "/movies/search",
-                            "/movies/{id}/details",
-                            "/movies/{id}/analyze",
+                            "/movies/{movie_id}/details",
+                            "/movies/{movie_id}/analyze",
+                            "/movies/{movie_id}/phrases",
+                            "/movies/{movie_id}/similar",
                             "/subtitles/fetch"
                         ],
                         label="選擇 API 端點",
@@ -197,9 +617,9 @@ def create_gradio_interface():
                     data["imdb_id"] = imdb_id
 
                 # 處理端點
-                if endpoint == "/movies/{id}/details" or endpoint == "/movies/{id}/analyze":
+                if "{movie_id}" in endpoint:
                     if imdb_id:
-                        endpoint = endpoint.replace("{id}", imdb_id)
+                        endpoint = endpoint.replace("{movie_id}", imdb_id)
                         if not data.get("imdb_id"):
                             data["imdb_id"] = imdb_id
 
@@ -229,19 +649,25 @@ def create_gradio_interface():
             def get_system_status():
                 """取得系統狀態"""
                 try:
-                    if turso_client:
-                        stats = turso_client.get_statistics()
+                    # 狀態頁不觸發連線，資料庫尚未就緒時只顯示依賴狀態
+                    database = turso_client.peek()
+                    if database:
+                        stats = database.get_statistics()
                     else:
                         stats = {"error": "Turso 客戶端未連線"}
 
                     return {
                         "timestamp": datetime.now().isoformat(),
-                        "clients": {
-                            "opensubtitles": os_client is not None,
-                            "turso": turso_client is not None,
-                            "subtitle_parser": subtitle_parser is not None
-                        },
-                        "database_stats": stats
+                        "clients": {dependency.dependency_name: dependency.dependency_status() for dependency in DEPENDENCIES},
+                        "database_stats": stats,
+                        "replica": database.replica.status() if database and database.replica else None,
+                        "cache": database.cache.stats() if database else None,
+                        "write_behind": movie_writer.stats() if movie_writer else None,
+                        "analysis_jobs": job_queue().stats() if job_queue() else None,
+                        "executors": get_executors().stats(),
+                        "response_cache": response_cache.stats(),
+                        "lexicon": lexicon.peek().info() if lexicon.peek() else None,
+                        "log_buffer": log_buffer.stats()
                     }
                 except Exception as e:
                     return {
@@ -261,9 +687,12 @@ def create_gradio_interface():
                 with gr.Column():
                     # 操作選擇
                     db_operation = gr.Radio(
+                        # Gradio 的 choices 格式為 (顯示名稱, 值)
                         choices=[
-                            ("statistics", "📊 統計資訊"),
-                            ("test_connection", "🔗 測試連線")
+                            ("📊 統計資訊", "statistics"),
+                            ("🧮 精確統計（稽核）", "statistics_exact"),
+                            ("🔁 校正統計計數器", "reconcile_counters"),
+                            ("🔗 測試連線", "test_connection")
                         ],
                         label="選擇操作",
                         value="statistics"
@@ -283,6 +712,10 @@ def create_gradio_interface():
 
                     if operation == "statistics":
                         return turso_client.get_statistics()
+                    elif operation == "statistics_exact":
+                        return turso_client.get_statistics(exact=True)
+                    elif operation == "reconcile_counters":
+                        return {"reconciled": turso_client.reconcile_counters()}
                     elif operation == "test_connection":
                         # 測試基本連線
                         test_query = "SELECT 1 as test"
@@ -303,37 +736,41 @@ def create_gradio_interface():
         # 日誌輸出
         with gr.Accordion("📋 系統日誌", open=False):
             gr.Markdown("### 即時日誌輸出")
+            log_level = gr.Dropdown(
+                choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                value="INFO",
+                label="最低等級"
+            )
             log_output = gr.TextArea(
                 label="系統日誌",
                 lines=20,
                 max_lines=50,
                 placeholder="日誌輸出將顯示在這裡..."
             )
-
-            def update_logs():
-                """更新日誌顯示"""
-                # 這裡可以實作日誌讀取功能
-                # 目前顯示最近的日誌訊息
-                import sys
-                import io
-                from contextlib import redirect
-
-                # 創獲日誌緩衝區
-                log_capture = io.StringIO()
-
-                with redirect(log_capture, sys.stderr):
-                    # 模擬一些日誌輸出
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] 系統狀態正常")
-
-                return log_capture.getvalue()
+            # 面板狀態：(已讀取的序號, 目前的等級, 顯示中的行)
+            log_state = gr.State((0, "INFO", []))
+
+            def update_logs(level, state):
+                """依序號只讀取上次之後的新記錄並附加到面板；沒有新記錄時不更新，切換等級時重新載入"""
+                cursor, shown_level, lines = state
+                if level != shown_level:
+                    cursor, lines = 0, []
+                entries, cursor = log_buffer.since(cursor, level_number(level))
+                if not entries and level == shown_level:
+                    return gr.update(), (cursor, level, lines)
+                lines = (lines + [format_entry(entry) for entry in entries])[-LOG_PANEL_LINES:]
+                return "\n".join(lines), (cursor, level, lines)
 
             # 定期更新日誌（每5秒）
-            demo.load(lambda: update_logs(), every=5)
+            demo.load(update_logs, inputs=[log_level, log_state], outputs=[log_output, log_state], every=5)
+            log_level.change(update_logs, inputs=[log_level, log_state], outputs=[log_output, log_state])
 
     return demo
 
 def main():
     """主函數"""
+    if DEPENDENCY_WARM_UP:
+        warm_up_in_background(DEPENDENCIES)
     interface = create_gradio_interface()
 
     # 啟動 Gradio 介面
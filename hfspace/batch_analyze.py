@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+片庫批次分析
+
+使用方式:
+python batch_analyze.py [--workers 4] [--page-size 50] [--limit 1000] [--force] [--restart]
+
+依 movie_id 順序逐頁讀取有字幕的影片，以程序池平行分析，每頁以單一交易寫回並更新檢查點。
+中斷後再次執行會由檢查點續跑；分析器版本變更後自動從頭開始，且只重算過期的區段。
+"""
+
+import argparse
+import logging
+import sys
+
+from config.settings import BATCH_ANALYSIS_WORKERS, BATCH_ANALYSIS_PAGE_SIZE, BATCH_ANALYSIS_CHECKPOINT_PATH
+from utils.turso_client import TursoClient
+from api_handlers.batch_analysis import BatchAnalyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="片庫批次分析")
+    parser.add_argument("--workers", type=int, default=BATCH_ANALYSIS_WORKERS, help="分析程序數，0 表示不使用程序池")
+    parser.add_argument("--page-size", type=int, default=BATCH_ANALYSIS_PAGE_SIZE, help="每頁影片數")
+    parser.add_argument("--checkpoint", default=BATCH_ANALYSIS_CHECKPOINT_PATH, help="檢查點檔案")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多處理的影片數")
+    parser.add_argument("--force", action="store_true", help="忽略既有結果，全部重算")
+    parser.add_argument("--restart", action="store_true", help="忽略檢查點，從頭開始")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    try:
+        turso_client = TursoClient()
+    except Exception as e:
+        print(f"無法連線資料庫: {e}")
+        sys.exit(1)
+
+    analyzer = BatchAnalyzer(turso_client, workers=args.workers, page_size=args.page_size,
+                             checkpoint_path=args.checkpoint)
+    try:
+        status = analyzer.run(force=args.force, restart=args.restart, limit=args.limit)
+    except KeyboardInterrupt:
+        print("\n已中斷，下次執行會由檢查點續跑")
+        sys.exit(130)
+    finally:
+        turso_client.close()
+
+    print(f"已分析: {status['analyzed']}，略過: {status['skipped']}，失敗: {status['failed_count']}")
+    print(f"吞吐量: {status['movies_per_minute']} 部/分鐘（{status['elapsed_seconds']} 秒）")
+    if status['failed']:
+        print(f"失敗影片: {', '.join(status['failed'])}")
+
+
+if __name__ == "__main__":
+    main()
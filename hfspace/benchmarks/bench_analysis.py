@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+影片分析效能基準測試
+
+使用方式:
+python benchmarks/bench_analysis.py [--cues 1600] [--repeat 20]
+
+以合成的長片字幕比較:
+1. legacy: 舊流程，每個分析器各自轉換條目、合併全文並重新切詞
+2. shared: 共用 AnalysisContext，全文只切詞一次
+3. 完整分析: run_analysis 執行所有分析器的總耗時
+4. 片語擷取: 整數鍵 n-gram 計數與以字串 tuple 為鍵的 Counter 比較
+"""
+
+import argparse
+import os
+from collections import Counter
+import random
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.subtitle_parser import SubtitleEntry, SubtitleParser
+from utils.analysis_context import AnalysisContext
+from api_handlers.analysis import run_analysis
+from utils.phrases import MAX_PHRASE_LENGTH, MIN_PHRASE_LENGTH, extract_collocations
+
+WORDS = (
+    "the you i to a and it of that is in what we me this he for my on have your do was no "
+    "not be get are just know with all but can so there like they here him go right up out "
+    "about come now well she yeah think how want one why her gonna did see look if back good "
+    "okay could time let would where got tell them when man sorry take something really "
+    "nothing listen remember promise whatever dangerous beautiful suddenly obviously "
+    "negotiate extraordinary reluctant inevitable compromise catastrophe"
+).split()
+
+
+def format_ms(ms: int) -> str:
+    """毫秒轉 SRT 時間字串"""
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def synthesize_rows(cue_count: int, seed: int = 42):
+    """產生類似資料庫字幕條目的合成資料"""
+    rng = random.Random(seed)
+    rows = []
+    position = 0
+    for index in range(1, cue_count + 1):
+        position += rng.randint(300, 4000)
+        duration = rng.randint(800, 4500)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 14)))
+        rows.append({
+            "sequence_number": index,
+            "start_time": format_ms(position),
+            "end_time": format_ms(position + duration),
+            "text": text.capitalize() + "."
+        })
+        position += duration
+    return rows
+
+
+def legacy_analysis(rows, parser):
+    """重現舊流程的重複工作量：條目轉換兩次、對話提取兩次、全文切詞四次"""
+    def to_entries():
+        return [SubtitleEntry(r.get('sequence_number', 0), r['start_time'], r['end_time'], r['text'], 0, 0) for r in rows]
+
+    def vocabulary():
+        all_text = " ".join(r.get('text', '') for r in rows)
+        words = re.findall(r'\b[a-zA-Z]+\b', all_text.lower())
+        freq = {}
+        for word in words:
+            freq[word] = freq.get(word, 0) + 1
+        return sorted(freq.items(), key=lambda x: x[1], reverse=True), words
+
+    for _ in range(2):
+        entries = to_entries()
+        parser.get_statistics(entries)
+        parser.extract_dialogues(entries)
+    for _ in range(4):
+        vocabulary()
+
+
+def shared_preprocessing(rows, parser):
+    """新流程的相同工作量：條目轉換、切詞、詞頻與對話提取各一次"""
+    ctx = AnalysisContext.from_rows(rows)
+    parser.get_statistics(ctx.entries)
+    ctx.dialogues(parser)
+    ctx.sorted_terms()
+
+
+def tuple_ngrams(ctx: AnalysisContext) -> Counter:
+    """以字串 tuple 為鍵逐條目計數 n-gram，相當於不使用整數鍵的做法"""
+    counts = Counter()
+    offsets = ctx.cue_offsets
+    for cue in range(len(offsets) - 1):
+        words = [ctx.vocabulary[term_id] for term_id in ctx.tokens[offsets[cue]:offsets[cue + 1]]]
+        for n in range(MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH + 1):
+            counts.update(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+    return counts
+
+
+def measure(fn, repeat: int) -> float:
+    """回傳中位數耗時（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="影片分析效能基準測試")
+    parser.add_argument("--cues", type=int, default=1600, help="字幕條目數（長片約 1500-2000）")
+    parser.add_argument("--repeat", type=int, default=20, help="重複次數")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    rows = synthesize_rows(args.cues)
+    subtitle_parser = SubtitleParser()
+    movie_info = {"title": "Benchmark", "year": 2024}
+
+    legacy_ms = measure(lambda: legacy_analysis(rows, subtitle_parser), args.repeat)
+    shared_ms = measure(lambda: shared_preprocessing(rows, subtitle_parser), args.repeat)
+    full_ms = measure(lambda: run_analysis(movie_info, "tt0000000", rows, subtitle_parser), args.repeat)
+
+    ctx = AnalysisContext.from_rows(rows)
+    arrays = (np.frombuffer(ctx.tokens, dtype=np.uint32), np.frombuffer(ctx.cue_offsets, dtype=np.uint32),
+              np.frombuffer(ctx.term_counts, dtype=np.uint32))
+    phrase_ms = measure(lambda: extract_collocations(*arrays), args.repeat)
+    tuple_ms = measure(lambda: tuple_ngrams(ctx), args.repeat)
+
+    print(f"條目數: {args.cues}, 重複: {args.repeat}")
+    print(f"legacy 前處理: {legacy_ms:8.2f} ms")
+    print(f"shared 前處理: {shared_ms:8.2f} ms  ({legacy_ms / shared_ms:.1f}x)")
+    print(f"shared 完整分析: {full_ms:8.2f} ms")
+    print(f"片語擷取（整數鍵）: {phrase_ms:8.2f} ms")
+    print(f"n-gram 計數（字串 tuple）: {tuple_ms:8.2f} ms  ({tuple_ms / phrase_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+事件迴圈回應性基準測試
+
+使用方式:
+python benchmarks/bench_event_loop.py [--cues 1600] [--analyses 12] [--probes 400]
+
+在執行影片分析的同時，以固定間隔發出輕量請求（一次 I/O 執行緒池的模擬資料庫查詢），比較輕量請求的延遲:
+1. idle: 沒有分析在執行
+2. inline: 分析直接在事件迴圈中執行（舊做法）
+3. executors: 分析交由程序池執行
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_analysis import synthesize_rows
+from utils.subtitle_parser import SubtitleParser
+from utils.executors import get_executors, run_cpu, run_io
+from api_handlers.analysis import run_analysis
+
+MOVIE_INFO = {"title": "Benchmark", "year": 2024}
+
+
+def cheap_lookup() -> int:
+    """模擬命中快取的資料庫查詢"""
+    time.sleep(0.0005)
+    return 1
+
+
+async def probe(count: int, interval: float):
+    """以固定間隔發出輕量請求，回傳每個請求的延遲（毫秒）"""
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await run_io(cheap_lookup)
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def heavy_inline(rows, parser, analyses: int):
+    """在事件迴圈中直接分析（每部之間讓出一次事件迴圈）"""
+    for _ in range(analyses):
+        run_analysis(MOVIE_INFO, "tt0000000", rows, parser)
+        await asyncio.sleep(0)
+
+
+async def heavy_offloaded(rows, parser, analyses: int):
+    """分析交由程序池"""
+    for _ in range(analyses):
+        await run_cpu(run_analysis, MOVIE_INFO, "tt0000000", rows, parser)
+
+
+async def scenario(heavy, probes: int, interval: float):
+    """同時執行分析與輕量請求"""
+    probe_task = asyncio.create_task(probe(probes, interval))
+    if heavy:
+        await heavy()
+    return await probe_task
+
+
+def percentile(samples, fraction: float) -> float:
+    """取百分位數"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件迴圈回應性基準測試")
+    parser.add_argument("--cues", type=int, default=1600, help="每部影片的字幕條目數")
+    parser.add_argument("--analyses", type=int, default=12, help="執行的分析次數")
+    parser.add_argument("--probes", type=int, default=400, help="輕量請求數")
+    parser.add_argument("--interval", type=float, default=0.002, help="輕量請求間隔（秒）")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    rows = synthesize_rows(args.cues)
+    subtitle_parser = SubtitleParser()
+
+    async def run_all():
+        # 先暖機，程序池啟動時間不計入
+        await run_cpu(run_analysis, MOVIE_INFO, "tt0000000", rows[:10], subtitle_parser)
+        return {
+            "idle": await scenario(None, args.probes, args.interval),
+            "inline": await scenario(lambda: heavy_inline(rows, subtitle_parser, args.analyses), args.probes, args.interval),
+            "executors": await scenario(lambda: heavy_offloaded(rows, subtitle_parser, args.analyses), args.probes, args.interval)
+        }
+
+    results = asyncio.run(run_all())
+    print(f"條目數: {args.cues}, 分析次數: {args.analyses}, 輕量請求: {args.probes}")
+    for name, samples in results.items():
+        print(f"{name:>10}: p50 {statistics.median(samples):7.2f} ms  p99 {percentile(samples, 0.99):7.2f} ms  "
+              f"max {max(samples):7.2f} ms")
+    print(f"執行器: {get_executors().stats()}")
+    get_executors().close()
+
+
+if __name__ == "__main__":
+    main()
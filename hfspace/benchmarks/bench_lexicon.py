@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+詞表效能基準測試
+
+使用方式:
+python benchmarks/bench_lexicon.py [--entries 50000] [--cues 1600] [--repeat 20]
+
+以合成詞表與長片字幕測量:
+1. 編譯: TSV 詞條編譯為雜湊表檔案
+2. 載入: 啟動時記憶體映射載入的耗時
+3. 查詢: 整部影片的 token 等級查詢（向量化）與逐字 dict 查詢比較
+"""
+
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lexicon import CEFR_LEVELS, Lexicon, lemma_candidates
+from utils.analysis_context import AnalysisContext
+from bench_analysis import WORDS, synthesize_rows
+
+
+def synthesize_entries(count: int, seed: int = 7):
+    """產生合成詞表，包含影片用字"""
+    rng = random.Random(seed)
+    words = set(WORDS)
+    while len(words) < count:
+        words.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12))))
+    return [(word, rng.choice(CEFR_LEVELS), rank) for rank, word in enumerate(sorted(words), start=1)]
+
+
+def measure(fn, repeat: int) -> float:
+    """回傳中位數耗時（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="詞表效能基準測試")
+    parser.add_argument("--entries", type=int, default=50000, help="詞條數")
+    parser.add_argument("--cues", type=int, default=1600, help="字幕條目數")
+    parser.add_argument("--repeat", type=int, default=20, help="重複次數")
+    args = parser.parse_args()
+
+    entries = synthesize_entries(args.entries)
+    path = os.path.join(tempfile.mkdtemp(), "lexicon.bin")
+
+    started = time.perf_counter()
+    Lexicon.build(entries, path)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    load_ms = measure(lambda: Lexicon.load(path), args.repeat)
+    lexicon = Lexicon.load(path)
+
+    ctx = AnalysisContext.from_rows(synthesize_rows(args.cues))
+    table = {word: (level, rank) for word, level, rank in entries}
+    words = [ctx.vocabulary[term_id] for term_id in ctx.tokens]
+
+    def dict_lookup():
+        # 逐 token 查詢並嘗試詞形還原，相當於不使用詞表檔的做法
+        for word in words:
+            if word not in table:
+                for candidate in lemma_candidates(word):
+                    if candidate in table:
+                        break
+
+    vector_ms = measure(lambda: ctx.token_levels(lexicon), args.repeat)
+    dict_ms = measure(dict_lookup, args.repeat)
+
+    print(f"詞條數: {args.entries}, 檔案大小: {os.path.getsize(path) / 1024:.0f} KB")
+    print(f"編譯: {build_ms:8.2f} ms")
+    print(f"載入: {load_ms:8.3f} ms")
+    print(f"token 數: {ctx.total_tokens}, 不重複單字: {ctx.unique_terms}")
+    print(f"向量化查詢: {vector_ms:8.3f} ms")
+    print(f"逐字查詢:   {dict_ms:8.3f} ms  ({dict_ms / vector_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
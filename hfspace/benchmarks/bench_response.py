@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+回應序列化與壓縮基準測試
+
+使用方式:
+python benchmarks/bench_response.py [--cues 1600] [--repeat 20]
+
+以合成的長片字幕回應（/subtitles/fetch 全部條目）比較:
+1. 序列化: 標準函式庫 json 與 orjson
+2. 壓縮: 各可用編碼的大小、壓縮率與耗時
+3. 快取命中: 已壓縮回應體直接取用的耗時
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_analysis import synthesize_rows
+from utils.response import IDENTITY, ResponseBodyCache, compress, dumps, encode_body, supported_encodings
+
+
+def measure(fn, repeat: int) -> float:
+    """回傳中位數耗時（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回應序列化與壓縮基準測試")
+    parser.add_argument("--cues", type=int, default=1600, help="字幕條目數")
+    parser.add_argument("--repeat", type=int, default=20, help="重複次數")
+    args = parser.parse_args()
+
+    entries = [
+        {"id": index, "movie_id": "tt0000000", "created_at": "2024-06-01T12:00:00", **row}
+        for index, row in enumerate(synthesize_rows(args.cues))
+    ]
+    response = {
+        "success": True,
+        "cached": True,
+        "data": {"imdb_id": "tt0000000", "language": "en", "entries_count": len(entries), "entries": entries},
+        "message": "使用快取字幕"
+    }
+
+    stdlib_ms = measure(lambda: json.dumps(response, ensure_ascii=False).encode('utf-8'), args.repeat)
+    fast_ms = measure(lambda: dumps(response), args.repeat)
+    body = dumps(response)
+
+    print(f"條目數: {args.cues}, 回應大小: {len(body) / 1024:.1f} KB")
+    print(f"json 序列化: {stdlib_ms:8.2f} ms")
+    print(f"dumps 序列化: {fast_ms:8.2f} ms  ({stdlib_ms / fast_ms:.1f}x)")
+
+    for encoding in supported_encodings():
+        compressed = compress(body, encoding)
+        elapsed = measure(lambda: compress(body, encoding), args.repeat)
+        print(f"{encoding:>6}: {len(compressed) / 1024:8.1f} KB  ({len(body) / len(compressed):.1f}x)  {elapsed:8.2f} ms")
+
+    cache = ResponseBodyCache()
+    encoding = supported_encodings()[0]
+    encode_body(response, encoding, cache, ("bench",))
+    hit_ms = measure(lambda: encode_body(response, encoding, cache, ("bench",)), args.repeat)
+    miss_ms = measure(lambda: encode_body(response, encoding), args.repeat)
+    print(f"未快取（序列化 + {encoding}）: {miss_ms:8.2f} ms")
+    print(f"快取命中: {hit_ms:8.3f} ms")
+    print(f"未壓縮快取命中: {measure(lambda: encode_body(response, IDENTITY, cache, ('bench',)), args.repeat):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+冷啟動基準測試
+
+使用方式:
+python benchmarks/bench_startup.py [--runs 5] [--top 10] [--no-warm-up]
+
+每次以新的 Python 程序量測（沒有已匯入的模組，接近 Space 冷啟動）:
+1. process: 程序啟動到 app 匯入完成（含直譯器啟動）
+2. import: 匯入 app 模組（建立 FastAPI 應用與路由，不連線資料庫）
+3. ready: 匯入後背景預熱所有依賴（詞表、資料庫、分析佇列、OpenSubtitles）直到完成
+4. --top: 以 -X importtime 列出匯入最久的模組
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+ready = None
+if {warm_up}:
+    app.warm_up_in_background(app.DEPENDENCIES).join()
+    ready = time.perf_counter() - imported
+print("BENCH " + json.dumps({{
+    "import": imported - started,
+    "ready": ready,
+    "dependencies": {{d.dependency_name: d.dependency_status()["status"] for d in app.DEPENDENCIES}}
+}}))
+"""
+
+
+def run_child(warm_up: bool, importtime: bool = False):
+    """以新程序匯入 app，回傳 (程序總耗時, 子程序量測結果, stderr)"""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD.format(warm_up=warm_up)]
+
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=APP_DIR, capture_output=True, text=True,
+                               env={**os.environ, "DEPENDENCY_WARM_UP": "false"})
+    elapsed = time.perf_counter() - started
+
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return elapsed, json.loads(line[len("BENCH "):]), completed.stderr
+    raise RuntimeError(f"子程序失敗:\n{completed.stderr[-2000:]}")
+
+
+def top_imports(stderr: str, count: int):
+    """解析 -X importtime 輸出，回傳累計耗時最久的模組"""
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    # 只列 app 直接匯入的模組（下一層縮排），避免同一段時間重複計算
+    direct = [row for row in rows if row[1] <= 3 and row[2] != "app"]
+    return sorted(direct, reverse=True)[:count]
+
+
+def summary(samples):
+    """中位數與最大值（秒）"""
+    return f"median {statistics.median(samples):6.3f}s  max {max(samples):6.3f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷啟動基準測試")
+    parser.add_argument("--runs", type=int, default=5, help="量測次數")
+    parser.add_argument("--top", type=int, default=10, help="列出匯入最久的模組數，0 表示不列出")
+    parser.add_argument("--no-warm-up", action="store_true", help="只量測匯入，不預熱依賴")
+    args = parser.parse_args()
+
+    process, imported, ready = [], [], []
+    last = None
+    for _ in range(args.runs):
+        elapsed, result, _ = run_child(not args.no_warm_up)
+        process.append(elapsed)
+        imported.append(result["import"])
+        if result["ready"] is not None:
+            ready.append(result["ready"])
+        last = result
+
+    print(f"量測次數: {args.runs}")
+    print(f"process: {summary(process)}")
+    print(f" import: {summary(imported)}")
+    if ready:
+        print(f"  ready: {summary(ready)}  （匯入後背景預熱）")
+        print(f"依賴狀態: {last['dependencies']}")
+
+    if args.top:
+        _, _, stderr = run_child(False, importtime=True)
+        print("匯入最久的模組（累計）:")
+        for cumulative_us, _, module in top_imports(stderr, args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
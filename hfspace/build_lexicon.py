@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+編譯 CEFR / 頻率詞表
+
+使用方式:
+python build_lexicon.py [來源 TSV] [輸出檔]
+
+來源格式為每行 單字<TAB>CEFR 等級[<TAB>頻率排名]，預設讀寫 LEXICON_SOURCE_PATH / LEXICON_PATH。
+部署時先執行一次即可，應用程式啟動時只需記憶體映射載入。
+"""
+
+import argparse
+import sys
+import time
+
+from config.settings import LEXICON_PATH, LEXICON_SOURCE_PATH
+from utils.lexicon import Lexicon, read_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="編譯 CEFR / 頻率詞表")
+    parser.add_argument("source", nargs="?", default=LEXICON_SOURCE_PATH, help="來源 TSV")
+    parser.add_argument("output", nargs="?", default=LEXICON_PATH, help="編譯後的詞表檔")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        count = Lexicon.build(read_source(args.source), args.output)
+    except FileNotFoundError:
+        print(f"找不到詞表來源: {args.source}")
+        sys.exit(1)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    lexicon = Lexicon.load(args.output)
+    print(f"詞條數: {count}")
+    print(f"編譯耗時: {build_ms:.1f} ms")
+    print(f"載入耗時: {lexicon.load_ms:.3f} ms")
+    print(f"雜湊表大小: {lexicon.table_size}，最長探測: {lexicon.max_probe}")
+
+
+if __name__ == "__main__":
+    main()
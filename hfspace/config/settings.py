@@ -26,15 +26,81 @@ DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 
 # 快取設定
 CACHE_TTL = 3600  # 1 小時
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))  # 讀穿快取最大筆數
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 讀穿快取最大位元組數
 REQUEST_TIMEOUT = 30  # 30 秒
 
 # 安全設定
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "subtitlelingo-secret")
 
+# 依賴（資料庫、OpenSubtitles、分析佇列）於第一次使用時建立，啟動後在背景預熱；失敗的依賴在重試間隔後的下一次使用時重試
+DEPENDENCY_WARM_UP = os.getenv("DEPENDENCY_WARM_UP", "true").lower() == "true"
+DEPENDENCY_RETRY_INTERVAL = float(os.getenv("DEPENDENCY_RETRY_INTERVAL", "30"))
+
 # 日誌設定
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# 記憶體內日誌環形緩衝區（Gradio 日誌面板與 /logs 端點），容量固定，舊記錄直接覆寫
+LOG_BUFFER_CAPACITY = int(os.getenv("LOG_BUFFER_CAPACITY", "2000"))
+LOG_BUFFER_LEVEL = os.getenv("LOG_BUFFER_LEVEL", "INFO")  # 低於此等級的記錄不進入緩衝區
+LOG_BUFFER_MAX_MESSAGE = int(os.getenv("LOG_BUFFER_MAX_MESSAGE", "2000"))  # 單筆訊息最大字元數
+LOG_STREAM_POLL_INTERVAL = float(os.getenv("LOG_STREAM_POLL_INTERVAL", "0.5"))  # SSE 串流檢查新記錄的間隔（秒）
+LOG_STREAM_HEARTBEAT = float(os.getenv("LOG_STREAM_HEARTBEAT", "15"))  # SSE 沒有新記錄時送出心跳的間隔（秒）
 
 # API 回應格式
 DEFAULT_PAGE_SIZE = 20
-MAX_PAGE_SIZE = 100
\ No newline at end of file
+MAX_PAGE_SIZE = 100
+
+# 統計計數器定期校正間隔（秒），0 表示停用
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "0"))
+
+# Turso 嵌入式副本設定（設定本地檔案路徑即啟用，讀取改由本地副本提供）
+TURSO_REPLICA_PATH = os.getenv("TURSO_REPLICA_PATH", "")
+TURSO_REPLICA_SYNC_INTERVAL = float(os.getenv("TURSO_REPLICA_SYNC_INTERVAL", "60"))  # 背景同步間隔（秒）
+TURSO_REPLICA_MAX_STALENESS = float(os.getenv("TURSO_REPLICA_MAX_STALENESS", "300"))  # 讀取容許的最大延遲（秒）
+TURSO_REPLICA_READ_YOUR_WRITES = os.getenv("TURSO_REPLICA_READ_YOUR_WRITES", "true").lower() == "true"
+
+# 影片延遲寫入佇列設定
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_JOURNAL_PATH = os.getenv("WRITE_BEHIND_JOURNAL_PATH", ".cache/write_behind.db")  # 本地持久化日誌
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "50"))  # 滿批立即寫入
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "2"))  # 定時寫入間隔（秒）
+
+# 背景分析工作佇列設定
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))  # 工作執行緒數，0 表示停用佇列改為同步分析
+ANALYSIS_QUEUE_MAX = int(os.getenv("ANALYSIS_QUEUE_MAX", "100"))  # 排隊與執行中的工作上限
+ANALYSIS_INLINE_WAIT = float(os.getenv("ANALYSIS_INLINE_WAIT", "5"))  # 分析端點等待結果的秒數，逾時改回傳工作 ID
+
+# 片庫批次分析設定
+BATCH_ANALYSIS_WORKERS = int(os.getenv("BATCH_ANALYSIS_WORKERS", str(os.cpu_count() or 2)))  # 分析程序數，0 表示在目前程序內執行
+BATCH_ANALYSIS_PAGE_SIZE = int(os.getenv("BATCH_ANALYSIS_PAGE_SIZE", "50"))  # 每頁影片數，每頁寫入一次並更新檢查點
+BATCH_ANALYSIS_MAX_WORKERS = int(os.getenv("BATCH_ANALYSIS_MAX_WORKERS", str(os.cpu_count() or 2)))  # 請求與命令列可指定的程序數上限
+BATCH_ANALYSIS_MAX_PAGE_SIZE = int(os.getenv("BATCH_ANALYSIS_MAX_PAGE_SIZE", "500"))  # 每頁影片數上限（一頁的字幕同時載入記憶體）
+BATCH_ANALYSIS_MAX_FAILED_IDS = int(os.getenv("BATCH_ANALYSIS_MAX_FAILED_IDS", "200"))  # 進度與檢查點保留的最近失敗影片數
+BATCH_ANALYSIS_CHECKPOINT_PATH = os.getenv("BATCH_ANALYSIS_CHECKPOINT_PATH", ".cache/batch_analysis.json")
+
+# 詞表設定（CEFR 等級與頻率排名）：啟動時若來源 TSV 較新則重新編譯，兩者皆無時難度評估使用啟發式規則
+LEXICON_SOURCE_PATH = os.getenv("LEXICON_SOURCE_PATH", "data/lexicon.tsv")
+LEXICON_PATH = os.getenv("LEXICON_PATH", ".cache/lexicon.bin")
+
+# 請求處理的執行器：阻塞 I/O（資料庫、上游 API）在執行緒池執行，解析與分析在程序池執行，事件迴圈只負責排程
+IO_EXECUTOR_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "16"))
+IO_EXECUTOR_QUEUE = int(os.getenv("IO_EXECUTOR_QUEUE", "256"))  # 等待執行緒的工作上限，超過時拒絕
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(2, os.cpu_count() or 1))))  # 0 表示 CPU 工作改在 I/O 執行緒池執行
+CPU_EXECUTOR_QUEUE = int(os.getenv("CPU_EXECUTOR_QUEUE", "32"))
+
+# /batch 端點：單次請求的子請求上限，與同一批次中同時執行的子請求數（資料庫與上游呼叫仍受上述執行緒池限制）
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# 回應壓縮與已壓縮回應體快取（orjson、brotli、zstandard 未安裝時退回 json 與 gzip）
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))  # 小於此大小的回應不壓縮
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))  # 帶 ETag 的回應可由瀏覽器與 CDN 直接使用的秒數，之後以 If-None-Match 重新驗證
+
+# 請求追蹤：各請求的上游、解析、資料庫與分析器區段彙總於 Server-Timing 標頭
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")  # none、jsonl（本地 JSON Lines 檔案）或 otel（需安裝 opentelemetry-api 與 SDK）
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", ".cache/traces.jsonl")
+TRACING_SLOW_MS = float(os.getenv("TRACING_SLOW_MS", "0"))  # jsonl 只匯出處理時間超過此毫秒數的請求
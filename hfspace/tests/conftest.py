@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# 測試不連線外部服務：分析佇列、延遲寫入與背景預熱停用，CPU 工作在 I/O 執行緒池執行
+os.environ.setdefault("ANALYSIS_WORKERS", "0")
+os.environ.setdefault("WRITE_BEHIND_ENABLED", "false")
+os.environ.setdefault("DEPENDENCY_WARM_UP", "false")
+os.environ.setdefault("CPU_EXECUTOR_WORKERS", "0")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.turso_client import TursoClient  # noqa: E402
+
+# 與 scripts/setup-database.js 相同的基本資料表（索引、觸發器與輔助資料表由 TursoClient 建立）
+BASE_SCHEMA = """
+CREATE TABLE movies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, imdb_id TEXT UNIQUE NOT NULL, title TEXT NOT NULL, year INTEGER,
+    type TEXT, poster_url TEXT, download_count INTEGER DEFAULT 0, overview TEXT, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE subtitles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, movie_id TEXT NOT NULL, sequence_number INTEGER NOT NULL,
+    start_time TEXT NOT NULL, end_time TEXT NOT NULL, text TEXT NOT NULL, created_at TEXT NOT NULL,
+    UNIQUE(movie_id, sequence_number)
+);
+CREATE TABLE subtitle_metadata (
+    movie_id TEXT PRIMARY KEY, file_id TEXT, file_name TEXT, language TEXT, download_count INTEGER,
+    rating REAL, content TEXT, created_at TEXT
+);
+CREATE TABLE vocabulary_notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, word TEXT, part_of_speech TEXT, definition_zh TEXT, level TEXT,
+    original_sentence TEXT, example_sentences TEXT, movie_id TEXT, dialogue_id TEXT, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE practice_exercises (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, movie_id TEXT, dialogue_id TEXT, question_type TEXT, question TEXT,
+    correct_answer TEXT, options TEXT, explanation TEXT, difficulty_level TEXT, created_at TEXT
+);
+CREATE TABLE analysis_results (
+    movie_id TEXT, analysis_type TEXT, data TEXT, created_at TEXT, PRIMARY KEY (movie_id, analysis_type)
+);
+"""
+
+
+def memory_connection() -> sqlite3.Connection:
+    """建立含基本資料表的記憶體資料庫（自動提交，交易由 TursoClient 控制）"""
+    conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+    conn.executescript(BASE_SCHEMA)
+    return conn
+
+
+@pytest.fixture
+def turso():
+    """以記憶體資料庫建立的 TursoClient"""
+    client = TursoClient(conn=memory_connection())
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def api(turso, monkeypatch):
+    """以記憶體資料庫執行的 API（OpenSubtitles 未設定），不觸發啟動與關閉事件"""
+    from fastapi.testclient import TestClient
+
+    import app
+    from utils.lazy import LazyDependency
+    from utils.opensubtitles import OpenSubtitlesClient
+
+    monkeypatch.setattr(app, "turso_client", LazyDependency("turso", lambda: turso, spec=TursoClient))
+    monkeypatch.setattr(app, "os_client", LazyDependency("opensubtitles", OpenSubtitlesClient, spec=OpenSubtitlesClient,
+                                                         configured=lambda: False))
+    monkeypatch.setattr(app, "movie_writer", None)
+    return TestClient(app.app)
@@ -0,0 +1,32 @@
+import json
+
+import api_handlers.analysis as analysis
+from api_handlers.analysis import DIALOGUE_EXCERPT_CHARS, summarize_dialogue
+
+
+def test_dialogue_summary_truncates_text():
+    entries = [{"index": index, "text": "word " * 50} for index in range(1, 11)]
+    dialogue = {"start_index": 1, "end_index": 10, "start_time": "00:00:01,000", "end_time": "00:00:30,000",
+                "duration": 29000, "entries": entries, "text": " ".join(entry["text"] for entry in entries)}
+
+    summary = summarize_dialogue(dialogue)
+
+    assert "entries" not in summary and "text" not in summary
+    assert summary["entry_count"] == 10
+    assert summary["text_length"] == len(dialogue["text"])
+    assert len(summary["excerpt"]) <= DIALOGUE_EXCERPT_CHARS + 1
+    assert summary["excerpt"].endswith("…")
+
+
+def test_lexicon_change_recomputes_difficulty_and_recommendations(monkeypatch):
+    monkeypatch.setattr(analysis, "lexicon_identity", lambda: "none")
+    stored = {"content_hash": "h", "section_versions": json.dumps(analysis.section_versions())}
+    before = analysis.analyzer_version()
+    assert analysis.stale_sections(stored, "h") == []
+
+    monkeypatch.setattr(analysis, "lexicon_identity", lambda: "120000-abcdef012345")
+
+    assert analysis.stale_sections(stored, "h") == ["difficulty_assessment"]
+    assert analysis.with_dependents(analysis.stale_sections(stored, "h")) == [
+        "difficulty_assessment", "learning_recommendations"]
+    assert analysis.analyzer_version() != before
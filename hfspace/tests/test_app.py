@@ -0,0 +1,12 @@
+import logging
+
+
+def test_request_log_omits_parameter_values(api, caplog):
+    with caplog.at_level(logging.INFO, logger="app"):
+        api.get("/movies/tt7654321/details")
+        api.get("/movies/search", params={"query": "secret title"})
+
+    logged = "\n".join(record.getMessage() for record in caplog.records)
+    assert "API: /movies/{movie_id}/details" in logged
+    assert "API: /movies/search | 參數: 2 個" in logged
+    assert "tt7654321" not in logged and "secret title" not in logged
@@ -0,0 +1,78 @@
+import asyncio
+
+from api_handlers.batch import BATCH_FAILED, BATCH_SKIPPED, BATCH_SUCCEEDED, handle_batch
+
+
+class StubAPI:
+    """只有 /ok、/boom 與 /hang 三個端點的路由表"""
+
+    def __init__(self):
+        self.cancelled = []
+
+    def resolve(self, endpoint):
+        return endpoint, {}
+
+    def unknown_endpoint(self, endpoint, data):
+        return {"success": False}
+
+    def validate(self, template, data):
+        return data
+
+    async def call(self, template, params, data, method):
+        if template == "/boom":
+            raise RuntimeError("boom")
+        if template == "/hang":
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled.append(template)
+                raise
+        return {"success": True, "data": data}
+
+
+def _outcomes(response):
+    return {result["id"]: result["outcome"] for result in response["data"]["results"]}
+
+
+def test_failing_sub_request_does_not_fail_the_batch():
+    response = asyncio.run(handle_batch({"requests": [
+        {"id": "a", "endpoint": "/boom"},
+        {"id": "b", "endpoint": "/ok"},
+        {"id": "c", "endpoint": "/ok", "depends_on": ["a"]}
+    ]}, StubAPI()))
+
+    assert response["success"]
+    assert _outcomes(response) == {"a": BATCH_FAILED, "b": BATCH_SUCCEEDED, "c": BATCH_SKIPPED}
+    assert response["data"]["results"][0]["result"]["message"] == "boom"
+
+
+def test_cancelled_batch_cancels_pending_sub_requests():
+    api = StubAPI()
+
+    async def run():
+        batch = asyncio.ensure_future(handle_batch({"requests": [
+            {"id": "a", "endpoint": "/hang"},
+            {"id": "b", "endpoint": "/hang"}
+        ]}, api))
+        await asyncio.sleep(0.05)
+        batch.cancel()
+        await asyncio.gather(batch, return_exceptions=True)
+
+    asyncio.run(run())
+    assert api.cancelled == ["/hang", "/hang"]
+
+
+def test_sub_requests_are_validated_with_the_route_model(api):
+    response = api.post("/batch", json={"requests": [
+        {"id": "search", "endpoint": "/movies/search", "data": {}},
+        {"id": "popular", "endpoint": "/movies/popular", "data": {"limit": 0}},
+        {"id": "details", "endpoint": "/movies/tt0000001/details"}
+    ]}).json()
+
+    results = {result["id"]: result for result in response["data"]["results"]}
+    assert results["search"]["outcome"] == BATCH_FAILED
+    assert results["search"]["result"]["error"] == "子請求參數錯誤"
+    assert "query" in results["search"]["result"]["message"]
+    assert results["popular"]["outcome"] == BATCH_FAILED
+    assert "limit" in results["popular"]["result"]["message"]
+    assert results["details"]["outcome"] != BATCH_SKIPPED
@@ -0,0 +1,32 @@
+import pytest
+from pydantic import ValidationError
+
+from api_handlers.batch_analysis import BatchAnalyzer
+from api_handlers.models import BatchAnalysisRequest
+from config.settings import BATCH_ANALYSIS_MAX_FAILED_IDS, BATCH_ANALYSIS_MAX_PAGE_SIZE, BATCH_ANALYSIS_MAX_WORKERS
+
+
+def test_request_rejects_oversized_workers_and_pages():
+    with pytest.raises(ValidationError):
+        BatchAnalysisRequest(workers=BATCH_ANALYSIS_MAX_WORKERS + 1)
+    with pytest.raises(ValidationError):
+        BatchAnalysisRequest(page_size=BATCH_ANALYSIS_MAX_PAGE_SIZE + 1)
+
+
+def test_analyzer_clamps_workers_and_page_size(turso, tmp_path):
+    analyzer = BatchAnalyzer(turso, workers=10_000, page_size=1_000_000,
+                             checkpoint_path=str(tmp_path / "checkpoint.json"))
+
+    assert analyzer.workers == BATCH_ANALYSIS_MAX_WORKERS
+    assert analyzer.page_size == BATCH_ANALYSIS_MAX_PAGE_SIZE
+
+
+def test_failed_ids_are_bounded(turso, tmp_path):
+    analyzer = BatchAnalyzer(turso, workers=0, checkpoint_path=str(tmp_path / "checkpoint.json"))
+    for index in range(BATCH_ANALYSIS_MAX_FAILED_IDS + 50):
+        analyzer._record_failure(f"tt{index}")
+
+    status = analyzer.status()
+    assert status["failed_count"] == BATCH_ANALYSIS_MAX_FAILED_IDS + 50
+    assert len(analyzer._progress["failed"]) == BATCH_ANALYSIS_MAX_FAILED_IDS
+    assert status["failed"][-1] == f"tt{BATCH_ANALYSIS_MAX_FAILED_IDS + 49}"
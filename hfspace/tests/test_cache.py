@@ -0,0 +1,32 @@
+from utils.cache import LRUCache, MISSING
+
+
+def test_invalidation_during_load_is_not_overwritten(turso):
+    def load():
+        # 讀取進行中，寫入端使同一鍵失效
+        turso.cache.invalidate(("movie", "tt1"))
+        return {"imdb_id": "tt1", "title": "Old"}
+
+    assert turso._cached_read(("movie", "tt1"), [], load)["title"] == "Old"
+    assert turso.cache.get(("movie", "tt1")) is MISSING
+
+
+def test_tag_invalidation_during_load_is_not_overwritten(turso):
+    def load():
+        turso.cache.invalidate_tag("subtitles:tt1")
+        return {"content_hash": "old"}
+
+    turso._cached_read(("subtitle", "tt1"), ["subtitles:tt1"], load)
+    assert turso.cache.get(("subtitle", "tt1")) is MISSING
+
+
+def test_unrelated_invalidation_keeps_the_loaded_value():
+    cache = LRUCache()
+    load = cache.begin_load("a", ["tag:a"])
+    cache.invalidate("b")
+    cache.invalidate_tag("tag:b")
+
+    assert cache.set("a", 1, ["tag:a"], load=load)
+    cache.end_load(load)
+    assert cache.get("a") == 1
+    assert not cache._key_generations and not cache._tag_generations
@@ -0,0 +1,37 @@
+import numpy as np
+
+from utils.coverage import CatalogTerms, bitset_count, bitset_update, known_mask
+
+
+def test_bitset_update_grows_and_clears_bits():
+    bitset = bitset_update(np.zeros(0, dtype=np.uint8), add=[0, 9, 17])
+
+    assert len(bitset) == 3
+    assert bitset_count(bitset) == 3
+
+    bitset = bitset_update(bitset, add=[9], remove=[0, 40])
+    assert len(bitset) == 6
+    assert bitset_count(bitset) == 2
+    assert known_mask(bitset, np.array([0, 9, 17, 40])).tolist() == [False, True, True, False]
+
+
+def test_known_mask_treats_ids_past_the_bitset_as_unknown():
+    bitset = bitset_update(np.zeros(0, dtype=np.uint8), add=[3])
+
+    assert known_mask(bitset, np.array([3, 8, 1000])).tolist() == [True, False, False]
+    assert known_mask(bitset, np.array([], dtype=np.uint32)).tolist() == []
+
+
+def test_catalog_coverage_counts_proper_nouns_as_known():
+    # 影片 a: term 0 x3、term 1 x1；影片 b: term 1 x2、專有名詞 term 2 x2
+    catalog = CatalogTerms(
+        movie_ids=["a", "b"],
+        offsets=np.array([0, 2, 4], dtype=np.int64),
+        term_ids=np.array([0, 1, 1, 2], dtype=np.uint32),
+        counts=np.array([3, 1, 2, 2], dtype=np.uint32),
+        proper=np.array([False, False, False, True])
+    )
+
+    assert catalog.coverage(np.zeros(0, dtype=np.uint8)).tolist() == [0.0, 0.5]
+    assert catalog.coverage(bitset_update(np.zeros(0, dtype=np.uint8), add=[0])).tolist() == [0.75, 0.5]
+    assert catalog.coverage(bitset_update(np.zeros(0, dtype=np.uint8), add=[1])).tolist() == [0.25, 1.0]
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from api_handlers.subtitles import parse_subtitle_content
+from utils.executors import ExecutionLayer
+from utils.subtitle_parser import SubtitleParser
+
+SRT = """1
+00:00:01,000 --> 00:00:03,000
+Where are you going?
+"""
+
+
+@pytest.fixture
+def layer():
+    layer = ExecutionLayer(io_workers=1, cpu_workers=1)
+    yield layer
+    layer.close()
+
+
+def test_process_pool_does_not_fork(layer):
+    entries, stats = asyncio.run(layer.cpu.run(parse_subtitle_content, SubtitleParser(), SRT))
+
+    assert layer.cpu._executor._mp_context.get_start_method() != "fork"
+    assert [entry["text"] for entry in entries] == ["Where are you going?"]
+    assert stats["total_entries"] == 1
+
+
+def test_process_pool_reraises_worker_errors(layer):
+    with pytest.raises(ValueError):
+        asyncio.run(layer.cpu.run(int, "not a number"))
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+import pytest
+
+from api_handlers import analysis
+from utils.job_queue import AnalysisJobQueue, JobQueueFullError, JOB_SUCCEEDED
+
+
+class JobStore:
+    """記錄工作狀態的資料庫替身；block 設定時 save_job 會等待，模擬緩慢的遠端寫入"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.block = None
+        self.writing = threading.Event()
+
+    def save_job(self, job):
+        self.writing.set()
+        if self.block:
+            self.block.wait(5)
+        self.jobs[job['job_id']] = dict(job)
+        return True
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def get_unfinished_jobs(self):
+        return []
+
+
+def _queue(store, runner=None):
+    return AnalysisJobQueue(store, runner or (lambda movie_id, analysis_type: {"success": True, "movie": movie_id}),
+                            version="v1", max_workers=1)
+
+
+def _finishes(fn, timeout: float = 1.0) -> bool:
+    """在另一個執行緒呼叫 fn，回傳是否在時限內完成"""
+    thread = threading.Thread(target=fn, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_database_write_does_not_hold_queue_lock():
+    store = JobStore()
+    queue = _queue(store)
+    store.block = threading.Event()
+    try:
+        submitter = threading.Thread(target=queue.submit, args=("tt1", "comprehensive"), daemon=True)
+        submitter.start()
+        assert store.writing.wait(1)
+
+        # 第一個工作仍在寫入資料庫時，狀態查詢、統計與重複提交不需等待
+        assert _finishes(queue.stats)
+        assert _finishes(queue.list_active)
+        duplicate = {}
+        assert _finishes(lambda: duplicate.update(queue.submit("tt1", "comprehensive")))
+        assert duplicate["deduplicated"] is True
+
+        store.block.set()
+        submitter.join(1)
+    finally:
+        store.block.set()
+        queue.close()
+
+
+def test_submit_returns_future_of_finished_job():
+    store = JobStore()
+    queue = _queue(store)
+    try:
+        job, future = queue.submit_with_future("tt1", "comprehensive")
+        assert future.result(timeout=1) == {"success": True, "movie": "tt1"}
+        assert queue.get(job['job_id'])['status'] == JOB_SUCCEEDED
+    finally:
+        queue.close()
+
+
+def test_analysis_returns_result_of_job_finished_before_wait(monkeypatch):
+    store = JobStore()
+    queue = _queue(store)
+    monkeypatch.setattr(analysis, "ANALYSIS_INLINE_WAIT", 0)
+    monkeypatch.setattr(analysis, "_cached_analysis_response", lambda movie_id, turso_client: None)
+    submit = queue.submit_with_future
+
+    def submit_and_finish(movie_id, analysis_type):
+        # 工作在處理器讀取 Future 之前已完成
+        job, future = submit(movie_id, analysis_type)
+        future.result(timeout=1)
+        return job, future
+
+    monkeypatch.setattr(queue, "submit_with_future", submit_and_finish)
+    try:
+        result = asyncio.run(analysis.handle_movie_analysis("tt1", None, None, queue))
+    finally:
+        queue.close()
+
+    assert result == {"success": True, "movie": "tt1"}
+
+
+def test_close_cancels_queued_jobs():
+    store = JobStore()
+    release = threading.Event()
+    queue = _queue(store, lambda movie_id, analysis_type: release.wait(5) and {"success": True})
+    queue.submit_with_future("tt1", "comprehensive")
+    _, queued = queue.submit_with_future("tt2", "comprehensive")
+
+    closer = threading.Thread(target=queue.close, daemon=True)
+    closer.start()
+    release.set()
+    closer.join(2)
+
+    assert queued.cancelled()
+    with pytest.raises(JobQueueFullError):
+        queue.submit("tt3", "comprehensive")
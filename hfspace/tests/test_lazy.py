@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+from utils.lazy import (
+    DependencyUnavailableError,
+    LazyDependency,
+    STATUS_DISABLED,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_READY
+)
+
+
+class Client:
+    def fetch(self):
+        return "ok"
+
+
+def _wait_ready(dependency: LazyDependency, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not dependency.is_ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_method_access_defers_creation():
+    created = []
+    dependency = LazyDependency("client", lambda: created.append(1) or Client(), spec=Client)
+
+    assert dependency
+    method = dependency.fetch
+    assert created == []
+    assert dependency.dependency_status()["status"] == STATUS_PENDING
+
+    assert method() == "ok"
+    assert created == [1]
+    assert dependency.dependency_status()["status"] == STATUS_READY
+
+
+def test_failed_dependency_is_falsy_within_retry_interval():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        raise RuntimeError("down")
+
+    dependency = LazyDependency("client", factory, spec=Client, retry_interval=60)
+
+    assert not dependency.warm_up()
+    assert not dependency
+    assert dependency.dependency_status() == {"status": STATUS_FAILED, "init_ms": None, "error": "down"}
+    with pytest.raises(DependencyUnavailableError):
+        dependency.instance()
+    assert len(attempts) == 1
+
+
+def test_failed_dependency_retries_in_background():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("down")
+        return Client()
+
+    dependency = LazyDependency("client", factory, spec=Client, retry_interval=0)
+    assert not dependency.warm_up()
+
+    # 失敗的依賴在呼叫端檢查時為 False，同時在背景重試
+    assert not dependency
+    _wait_ready(dependency)
+
+    assert dependency
+    assert dependency.fetch() == "ok"
+    assert len(attempts) == 2
+
+
+def test_unconfigured_dependency_is_disabled():
+    created = []
+    dependency = LazyDependency("client", lambda: created.append(1) or Client(), spec=Client,
+                                configured=lambda: False)
+
+    assert not dependency
+    assert dependency.get_nowait() is None
+    assert not dependency.warm_up()
+    assert dependency.dependency_status()["status"] == STATUS_DISABLED
+    with pytest.raises(DependencyUnavailableError):
+        dependency.instance()
+    assert created == []
+
+
+def test_popular_falls_back_to_database_without_opensubtitles(api, turso):
+    turso.save_movies([{"imdb_id": "tt1", "title": "Stored", "download_count": 5}])
+
+    response = api.get("/movies/popular")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert [movie["imdb_id"] for movie in body["data"]] == ["tt1"]
+
+
+def test_search_falls_back_to_database_when_opensubtitles_fails(api, turso, monkeypatch):
+    import app
+
+    def unavailable():
+        raise RuntimeError("upstream down")
+
+    client = LazyDependency("opensubtitles", unavailable, spec=Client, retry_interval=60)
+    client.warm_up()
+    monkeypatch.setattr(app, "os_client", client)
+    turso.save_movies([{"imdb_id": "tt2", "title": "Matrix", "download_count": 1}])
+
+    body = api.get("/movies/search", params={"query": "Matrix"}).json()
+
+    assert body["success"] is True
+    assert [movie["imdb_id"] for movie in body["data"]] == ["tt2"]
+
+
+def test_health_ignores_disabled_dependencies(api, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "DEPENDENCIES", [app.os_client])
+
+    response = api.get("/health", params={"ready": "true"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+    assert response.json()["dependencies"]["opensubtitles"]["status"] == STATUS_DISABLED
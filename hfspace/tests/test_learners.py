@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+from api_handlers.learners import handle_known_words
+
+
+def test_concurrent_known_word_updates_do_not_lose_words(turso, monkeypatch):
+    load = turso.get_known_words
+
+    def slow_load(user_id):
+        # 讓兩個更新的讀取重疊，未循序執行時後寫入者會覆蓋前者
+        record = load(user_id)
+        time.sleep(0.05)
+        return record
+
+    monkeypatch.setattr(turso, "get_known_words", slow_load)
+
+    async def run():
+        return await asyncio.gather(
+            handle_known_words({"user_id": "u1", "add": ["apple"]}, turso),
+            handle_known_words({"user_id": "u1", "add": ["banana"]}, turso)
+        )
+
+    assert all(response["success"] for response in asyncio.run(run()))
+    assert load("u1")["word_count"] == 2
@@ -0,0 +1,61 @@
+import logging
+import threading
+
+from utils.log_buffer import LogRingBuffer
+
+
+def _append(buffer: LogRingBuffer, message: str, level: int = logging.INFO) -> int:
+    return buffer.append(0.0, level, logging.getLevelName(level), "test", message)
+
+
+def test_wraparound_keeps_only_the_newest_entries():
+    buffer = LogRingBuffer(capacity=4)
+    for index in range(10):
+        _append(buffer, f"m{index}")
+
+    entries, cursor = buffer.since(0)
+
+    assert [entry[0] for entry in entries] == [7, 8, 9, 10]
+    assert cursor == 10
+    assert buffer.stats()["retained"] == 4
+
+
+def test_cursor_resumes_after_limit_and_skips_overwritten_entries():
+    buffer = LogRingBuffer(capacity=4)
+    for index in range(3):
+        _append(buffer, f"m{index}")
+
+    entries, cursor = buffer.since(0, limit=2)
+    assert [entry[0] for entry in entries] == [1, 2]
+
+    # 游標之後的記錄已有部分被覆寫，只回傳仍保留的記錄
+    for index in range(3, 8):
+        _append(buffer, f"m{index}")
+    entries, cursor = buffer.since(cursor)
+    assert [entry[0] for entry in entries] == [5, 6, 7, 8]
+    assert buffer.since(cursor) == ([], 8)
+
+
+def test_cursor_stops_at_a_slot_not_yet_written():
+    buffer = LogRingBuffer(capacity=8)
+    _append(buffer, "m1")
+    _append(buffer, "m2")
+    # 序號已配發、槽位尚未寫入
+    buffer.last_seq = 3
+
+    entries, cursor = buffer.since(0)
+
+    assert [entry[0] for entry in entries] == [1, 2]
+    assert cursor == 2
+
+
+def test_concurrent_appends_advance_last_seq_to_the_highest():
+    buffer = LogRingBuffer(capacity=64)
+    threads = [threading.Thread(target=lambda: [_append(buffer, "m") for _ in range(500)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert buffer.last_seq == 4000
+    assert [entry[0] for entry in buffer.since(0)[0]] == list(range(3937, 4001))
@@ -0,0 +1,22 @@
+import numpy as np
+
+from utils.analysis_context import AnalysisContext
+from utils.phrases import extract_collocations
+
+
+def _rows(texts):
+    return [{"index": index, "start_time": "00:00:01,000", "end_time": "00:00:02,000", "text": text}
+            for index, text in enumerate(texts, 1)]
+
+
+def test_one_word_cues_have_no_collocations():
+    tokens = np.array([0, 1, 0, 1], dtype=np.uint32)
+    cue_offsets = np.arange(5, dtype=np.uint32)
+    assert extract_collocations(tokens, cue_offsets, np.array([2, 2], dtype=np.uint32)) == []
+
+    assert AnalysisContext.from_rows(_rows(["Hey!", "What?", "Hey!", "No."])).collocations() == []
+
+
+def test_longer_ngrams_stop_at_cue_length():
+    context = AnalysisContext.from_rows(_rows(["Excuse me", "Hello", "Excuse me", "Thanks"] * 3))
+    assert [item["phrase"] for item in context.collocations()] == ["excuse me"]
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+
+import pytest
+
+from utils.replica import EmbeddedReplica
+from utils.turso_client import TursoClient
+from conftest import BASE_SCHEMA
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    """主資料庫與本地副本皆為 SQLite 檔案的 TursoClient（停用背景同步）"""
+    primary_path = str(tmp_path / "primary.db")
+    primary = sqlite3.connect(primary_path, check_same_thread=False, isolation_level=None)
+    primary.executescript(BASE_SCHEMA)
+    replica = EmbeddedReplica.from_sqlite_primary(primary_path, str(tmp_path / "replica.db"), sync_interval=0)
+    client = TursoClient(conn=primary, replica=replica)
+    yield client
+    client.close()
+
+
+def _syncs(client: TursoClient) -> int:
+    return client.replica.status()["sync_count"]
+
+
+def test_read_after_write_syncs_written_table(replicated: TursoClient):
+    replicated.save_movie({"imdb_id": "tt1", "title": "First"})
+    before = _syncs(replicated)
+
+    assert replicated.get_movie_by_imdb_id("tt1")["title"] == "First"
+    assert _syncs(replicated) == before + 1
+    assert not replicated.replica.status()["pending_writes"]
+
+
+def test_unrelated_write_does_not_sync_reads(replicated: TursoClient):
+    replicated.save_known_words("u1", b"\x01", 1)
+    assert replicated.replica.status()["pending_tables"] == ["user_known_words"]
+    before = _syncs(replicated)
+
+    replicated.get_popular_movies_page(10)
+
+    assert _syncs(replicated) == before
+    assert replicated.get_known_words("u1")["word_count"] == 1
+    assert _syncs(replicated) == before + 1
+
+
+def test_trigger_tables_are_marked(replicated: TursoClient):
+    replicated.save_movie({"imdb_id": "tt1", "title": "First"})
+
+    assert set(replicated.replica.status()["pending_tables"]) == {"movies", "stats_counters"}
+
+
+def _blocking_replica(fail: bool = False):
+    """同步進行中會停住的副本，回傳 (副本, 已進入同步, 放行同步)"""
+    entered, release = threading.Event(), threading.Event()
+
+    def sync():
+        entered.set()
+        release.wait(2)
+        if fail:
+            raise RuntimeError("primary unavailable")
+
+    return EmbeddedReplica(sqlite3.connect(":memory:", check_same_thread=False), sync, sync_interval=0), entered, release
+
+
+def test_write_during_sync_stays_dirty():
+    replica, entered, release = _blocking_replica()
+    replica.mark_dirty(["movies"])
+    syncing = threading.Thread(target=replica.sync)
+    syncing.start()
+    assert entered.wait(2)
+
+    # 同步複製快照期間寫入，不可被這次同步清除
+    replica.mark_dirty(["subtitles"])
+    release.set()
+    syncing.join(2)
+
+    assert replica.status()["pending_tables"] == ["subtitles"]
+
+
+def test_failed_sync_restores_dirty_tables():
+    replica, _, release = _blocking_replica(fail=True)
+    release.set()
+    replica.mark_dirty(["movies"])
+
+    assert not replica.sync()
+    assert replica.status()["pending_tables"] == ["movies"]
@@ -0,0 +1,122 @@
+import pytest
+
+from utils.lazy import LazyDependency
+from utils.opensubtitles import OpenSubtitlesClient
+
+SRT = """1
+00:00:01,000 --> 00:00:03,000
+Where are you going?
+
+2
+00:00:04,000 --> 00:00:06,000
+Back to the station.
+"""
+
+SRT_REFRESHED = """1
+00:00:01,000 --> 00:00:03,000
+We need to talk.
+"""
+
+
+class Downloads:
+    def __init__(self, *contents):
+        self.contents = list(contents)
+
+    def download_best_subtitle(self, imdb_id, language):
+        return self.contents.pop(0)
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    import app
+
+    stub = Downloads(SRT, SRT_REFRESHED)
+    monkeypatch.setattr(app, "os_client", LazyDependency("opensubtitles", lambda: stub, spec=OpenSubtitlesClient))
+    return stub
+
+
+def _texts(turso, imdb_id):
+    return [entry["text"] for entry in turso.get_subtitle_entries(imdb_id)]
+
+
+def test_fetch_saves_under_imdb_id_and_invalidates_cache(api, turso, downloads):
+    # 先讓快取記住「沒有字幕」
+    assert turso.get_subtitle_by_imdb_id("tt0000001") is None
+
+    fetched = api.post("/subtitles/fetch", json={"imdb_id": "tt0000001"}).json()
+    assert fetched["success"] and not fetched["cached"]
+
+    metadata = turso.get_subtitle_by_imdb_id("tt0000001")
+    assert metadata["file_name"] == "tt0000001_en.srt"
+    assert turso.get_subtitle_content_hash("tt0000001")
+    assert _texts(turso, "tt0000001") == ["Where are you going?", "Back to the station."]
+    assert turso.get_subtitle_by_imdb_id("None") is None
+    assert turso._execute_query("SELECT 1 FROM movie_terms WHERE movie_id = ?", ["tt0000001"])
+
+    cached = api.post("/subtitles/fetch", json={"imdb_id": "tt0000001"}).json()
+    assert cached["cached"] and cached["data"]["entries_count"] == 2
+
+    previous_hash = turso.get_subtitle_content_hash("tt0000001")
+    refreshed = api.post("/subtitles/fetch", json={"imdb_id": "tt0000001", "force_refresh": True}).json()
+    assert refreshed["success"] and not refreshed["cached"]
+    assert _texts(turso, "tt0000001") == ["We need to talk."]
+    assert turso.get_subtitle_content_hash("tt0000001") != previous_hash
+
+
+def test_save_subtitle_accepts_legacy_movie_id(turso):
+    entries = [{"index": 1, "start_time": "00:00:01,000", "end_time": "00:00:02,000", "text": "Hello there."}]
+    assert turso.save_subtitle({"movie_id": "tt0000002", "parsed_entries": entries}) == "tt0000002"
+    assert _texts(turso, "tt0000002") == ["Hello there."]
+
+
+def test_subtitle_etag_round_trip(api, turso, downloads):
+    assert api.post("/subtitles/fetch", json={"imdb_id": "tt0000003"}).json()["success"]
+
+    first = api.get("/subtitles/tt0000003", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["ETag"]
+    # 小回應不壓縮，ETag 與實際編碼一致
+    assert "Content-Encoding" not in first.headers and not etag.endswith('-gzip"')
+    assert first.headers["Cache-Control"].startswith("public")
+
+    again = api.get("/subtitles/tt0000003", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == etag
+
+    refreshed = api.post("/subtitles/fetch", json={"imdb_id": "tt0000003", "force_refresh": True})
+    assert "ETag" not in refreshed.headers and "Cache-Control" not in refreshed.headers
+    changed = api.get("/subtitles/tt0000003", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_compressed_etag_round_trip(api, turso, monkeypatch):
+    monkeypatch.setattr("utils.response.COMPRESSION_MIN_BYTES", 1)
+    turso.save_subtitle({"imdb_id": "tt0000004", "parsed_entries": [
+        {"index": 1, "start_time": "00:00:01,000", "end_time": "00:00:02,000", "text": "Hello there."}
+    ]})
+
+    first = api.get("/subtitles/tt0000004", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip" and first.headers["ETag"].endswith('-gzip"')
+
+    again = api.get("/subtitles/tt0000004",
+                    headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_post_ignores_if_none_match(api, turso, downloads):
+    assert api.post("/subtitles/fetch", json={"imdb_id": "tt0000005"}).json()["success"]
+    etag = api.get("/subtitles/tt0000005").headers["ETag"]
+
+    posted = api.post("/subtitles/fetch", json={"imdb_id": "tt0000005"}, headers={"If-None-Match": etag})
+    assert posted.status_code == 200 and posted.json()["cached"]
+    assert "ETag" not in posted.headers
+
+
+def test_get_routes_are_read_only(api, turso, downloads):
+    missing = api.get("/subtitles/tt0000006").json()
+    assert not missing["success"] and missing["error"] == "尚未抓取字幕"
+    assert len(downloads.contents) == 2 and turso.get_subtitle_by_imdb_id("tt0000006") is None
+
+    analysis = api.get("/movies/tt0000006/analysis")
+    assert not analysis.json()["success"] and analysis.json()["error"] == "尚未分析"
+    assert "ETag" not in analysis.headers
+    assert turso.get_analysis("tt0000006", "comprehensive") is None
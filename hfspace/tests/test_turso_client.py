@@ -0,0 +1,54 @@
+from utils.turso_client import TursoClient
+
+
+def _movie(imdb_id, download_count):
+    return {"imdb_id": imdb_id, "title": f"Movie {imdb_id}", "download_count": download_count}
+
+
+def _walk(fetch_page, limit):
+    """依 next_cursor 逐頁讀取，回傳所有 imdb_id"""
+    seen, cursor = [], None
+    while True:
+        page = fetch_page(limit, cursor)
+        seen.extend(movie["imdb_id"] for movie in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return seen
+
+
+def test_popular_pages_include_null_download_counts(turso: TursoClient):
+    turso.save_movies([_movie("tt1", 50), _movie("tt2", None), _movie("tt3", 10), _movie("tt4", None),
+                       _movie("tt5", 0), _movie("tt6", 10)])
+    # download_count 為 NULL 的影片與 0 同等排序，翻頁時不遺漏也不重複
+    turso.conn.execute("UPDATE movies SET download_count = NULL WHERE imdb_id IN ('tt2', 'tt4')")
+
+    seen = _walk(turso.get_popular_movies_page, 2)
+
+    assert seen == ["tt1", "tt6", "tt3", "tt5", "tt4", "tt2"]
+
+
+def test_search_pages_include_null_download_counts(turso: TursoClient):
+    turso.save_movies([_movie(f"tt{i}", None if i % 2 else i) for i in range(1, 8)])
+    turso.conn.execute("UPDATE movies SET download_count = NULL WHERE CAST(substr(imdb_id, 3) AS INTEGER) % 2 = 1")
+
+    seen = _walk(lambda limit, cursor: turso.search_movies_page("Movie", limit, cursor), 3)
+
+    assert sorted(seen) == [f"tt{i}" for i in range(1, 8)]
+    assert len(seen) == len(set(seen))
+
+
+def test_popular_page_with_cursor_seeks_the_popularity_index(turso: TursoClient):
+    turso.save_movies([_movie(f"tt{i}", i % 5) for i in range(1, 30)])
+    turso.conn.execute("ANALYZE")
+    cursor = turso.get_popular_movies_page(5)["next_cursor"]
+
+    queries = []
+    turso.conn.set_trace_callback(queries.append)
+    try:
+        turso.get_popular_movies_page(5, cursor)
+    finally:
+        turso.conn.set_trace_callback(None)
+    query = next(query for query in queries if "FROM movies" in query)
+
+    plan = " ".join(row[-1] for row in turso.conn.execute(f"EXPLAIN QUERY PLAN {query}"))
+    assert "SEARCH movies USING INDEX idx_movies_popularity" in plan
@@ -0,0 +1,68 @@
+import logging
+import time
+
+from utils.lazy import LazyDependency
+from utils.turso_client import TursoClient
+from utils.write_behind import WriteBehindQueue
+
+
+def _wait(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _unavailable_database(attempts=None) -> LazyDependency:
+    """初始化失敗的資料庫客戶端（重試間隔內不再重試）"""
+    def connect():
+        if attempts is not None:
+            attempts.append(1)
+        raise RuntimeError("turso down")
+
+    database = LazyDependency("turso", connect, spec=TursoClient, retry_interval=60)
+    database.warm_up()
+    return database
+
+
+def test_flushes_movies_to_database(turso, tmp_path):
+    queue = WriteBehindQueue(turso, str(tmp_path / "journal.db"), flush_interval=0.02)
+    try:
+        queue.enqueue_movies([{"imdb_id": "tt1", "title": "One"}, {"imdb_id": "tt1", "title": "One v2"}])
+        _wait(lambda: queue.pending_count() == 0)
+
+        assert turso.get_movie_by_imdb_id("tt1")["title"] == "One v2"
+        assert queue.stats()["coalesced"] == 1
+    finally:
+        queue.close()
+
+
+def test_pauses_while_database_unavailable(tmp_path, caplog):
+    attempts = []
+    queue = WriteBehindQueue(_unavailable_database(attempts), str(tmp_path / "journal.db"), flush_interval=0.02)
+    try:
+        with caplog.at_level(logging.WARNING, logger="utils.write_behind"):
+            queue.enqueue_movies([{"imdb_id": "tt1", "title": "One"}])
+            time.sleep(0.2)
+
+        assert queue.stats()["paused"] is True
+        assert queue.pending_count() == 1
+        # 暫停只記錄一次，不在每次定時寫入時重複記錄錯誤
+        assert len([record for record in caplog.records if record.name == "utils.write_behind"]) == 1
+        assert len(attempts) == 1
+    finally:
+        queue.close()
+
+
+def test_resumes_and_keeps_journal_across_restart(turso, tmp_path):
+    journal = str(tmp_path / "journal.db")
+    queue = WriteBehindQueue(_unavailable_database(), journal, flush_interval=0.02)
+    queue.enqueue_movies([{"imdb_id": "tt1", "title": "One"}])
+    queue.close()
+
+    # 重新啟動後資料庫可用，日誌中的影片寫入資料庫
+    restarted = WriteBehindQueue(turso, journal, flush_interval=0.02)
+    try:
+        _wait(lambda: restarted.pending_count() == 0)
+        assert turso.get_movie_by_imdb_id("tt1")["title"] == "One"
+    finally:
+        restarted.close()
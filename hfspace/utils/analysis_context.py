@@ -0,0 +1,192 @@
+import re
+import logging
+from array import array
+from collections import Counter
+from itertools import accumulate, chain
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from utils.subtitle_parser import SubtitleEntry, SubtitleParser
+from utils.pacing import compute_pacing, parse_timestamps_ms
+from utils.lexicon import Lexicon, lexical_profile
+from utils.phrases import extract_collocations
+
+logger = logging.getLogger(__name__)
+
+# 與原本詞彙分析一致的英文單字切分規則
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]+\b')
+
+
+# 以全小寫出現的單字；只以大寫開頭出現的單字多為專有名詞
+LOWERCASE_WORD_PATTERN = re.compile(r'\b[a-z]+\b')
+
+
+def tokenize(text: str) -> List[str]:
+    """將文字切分為小寫英文單字"""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def count_terms(texts: Iterable[str]) -> Tuple[Counter, Set[str]]:
+    """計算詞頻與曾以全小寫出現的單字"""
+    text = "\n".join(texts)
+    return Counter(WORD_PATTERN.findall(text.lower())), set(LOWERCASE_WORD_PATTERN.findall(text))
+
+
+class AnalysisContext:
+    """單次分析共用的前處理結果：字幕條目只轉換一次、全文只切詞一次"""
+
+    def __init__(self, entries: List[SubtitleEntry]):
+        self.entries = entries
+
+        # 整部影片的時間軸（毫秒），供語速與密度等向量化計算
+        count = len(entries)
+        self.start_ms = np.fromiter((entry.start_ms for entry in entries), dtype=np.int64, count=count)
+        self.end_ms = np.fromiter((entry.end_ms for entry in entries), dtype=np.int64, count=count)
+
+        # 詞彙表：term id -> 單字；tokens 以 term id 緊湊儲存
+        self.vocabulary: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        self.tokens = array('I')
+        # 每個條目在 tokens 中的起始位置，長度為條目數 + 1
+        self.cue_offsets = array('I', [0])
+        self.term_counts = array('I')
+
+        self._dialogues: Optional[List[Dict]] = None
+        self._counter: Counter = Counter()
+        self._sorted_terms: Optional[List[tuple]] = None
+        self._pacing: Optional[Dict[str, Any]] = None
+        self._lexical_profile: Optional[Dict[str, Any]] = None
+        self._collocations: Optional[List[Dict[str, Any]]] = None
+        self._lowercase_terms: Optional[Set[str]] = None
+        self._tokenize()
+
+    @classmethod
+    def from_rows(cls, subtitle_entries: List[Dict]) -> 'AnalysisContext':
+        """由資料庫字幕條目建立分析上下文，時間字串只向量化解析一次"""
+        if subtitle_entries and 'start_ms' in subtitle_entries[0]:
+            # 剛解析的條目已帶有毫秒
+            start_ms = [entry.get('start_ms', 0) or 0 for entry in subtitle_entries]
+            end_ms = [entry.get('end_ms', 0) or 0 for entry in subtitle_entries]
+        else:
+            start_ms = parse_timestamps_ms([entry.get('start_time', '') for entry in subtitle_entries]).tolist()
+            end_ms = parse_timestamps_ms([entry.get('end_time', '') for entry in subtitle_entries]).tolist()
+
+        entries = [
+            SubtitleEntry(
+                index=entry.get('sequence_number', entry.get('index', 0)),
+                start_time=entry.get('start_time', ''),
+                end_time=entry.get('end_time', ''),
+                text=entry.get('text', '') or '',
+                start_ms=start,
+                end_ms=end
+            )
+            for entry, start, end in zip(subtitle_entries, start_ms, end_ms)
+        ]
+        return cls(entries)
+
+    def _tokenize(self):
+        """逐條目切詞並建立 term id 陣列與詞頻（迴圈皆在 C 層執行）"""
+        findall = WORD_PATTERN.findall
+        words_per_cue = [findall(entry.text.lower()) for entry in self.entries]
+        all_words = list(chain.from_iterable(words_per_cue))
+
+        # Counter 保留首次出現順序，直接作為詞彙表
+        self._counter = Counter(all_words)
+        self.vocabulary = list(self._counter)
+        self.term_ids = {word: term_id for term_id, word in enumerate(self.vocabulary)}
+        self.term_counts = array('I', self._counter.values())
+        self.tokens = array('I', map(self.term_ids.__getitem__, all_words))
+        self.cue_offsets = array('I', accumulate(map(len, words_per_cue), initial=0))
+
+    @property
+    def total_tokens(self) -> int:
+        """總單字數"""
+        return len(self.tokens)
+
+    @property
+    def unique_terms(self) -> int:
+        """不重複單字數"""
+        return len(self.vocabulary)
+
+    @property
+    def counter(self) -> Counter:
+        """單字詞頻"""
+        return self._counter
+
+    def sorted_terms(self) -> List[tuple]:
+        """依詞頻由高到低排序的 (單字, 次數)"""
+        if self._sorted_terms is None:
+            self._sorted_terms = self.counter.most_common()
+        return self._sorted_terms
+
+    def lowercase_terms(self) -> Set[str]:
+        """片中曾以全小寫出現的單字（只計算一次）"""
+        if self._lowercase_terms is None:
+            self._lowercase_terms = set(LOWERCASE_WORD_PATTERN.findall("\n".join(entry.text for entry in self.entries)))
+        return self._lowercase_terms
+
+    def total_characters(self) -> int:
+        """所有單字的字元總數"""
+        return sum(len(word) * count for word, count in zip(self.vocabulary, self.term_counts))
+
+    def cue_word_counts(self) -> np.ndarray:
+        """每個條目的單字數"""
+        return np.diff(np.frombuffer(self.cue_offsets, dtype=np.uint32).astype(np.int64))
+
+    def pacing(self) -> Dict[str, Any]:
+        """每分鐘語速、字幕密度與停頓分佈（只計算一次）"""
+        if self._pacing is None:
+            self._pacing = compute_pacing(self.start_ms, self.end_ms, self.cue_word_counts())
+        return self._pacing
+
+    def token_levels(self, lexicon: Lexicon) -> Tuple[np.ndarray, np.ndarray]:
+        """每個 token 的 CEFR 等級與頻率排名；每個不重複單字只查詢詞表一次"""
+        term_levels, term_ranks = lexicon.lookup_terms(self.vocabulary)
+        tokens = np.frombuffer(self.tokens, dtype=np.uint32)
+        return term_levels[tokens], term_ranks[tokens]
+
+    def lexical_profile(self, lexicon: Lexicon) -> Dict[str, Any]:
+        """詞彙等級分佈與覆蓋率（只計算一次）"""
+        if self._lexical_profile is None:
+            self._lexical_profile = lexical_profile(*self.token_levels(lexicon))
+        return self._lexical_profile
+
+    def collocations(self) -> List[Dict[str, Any]]:
+        """片中的搭配詞與片語，附首次出現的字幕作為例句（只計算一次）"""
+        if self._collocations is None:
+            offsets = np.frombuffer(self.cue_offsets, dtype=np.uint32)
+            found = extract_collocations(
+                np.frombuffer(self.tokens, dtype=np.uint32), offsets, np.frombuffer(self.term_counts, dtype=np.uint32)
+            )
+            phrases = [" ".join(self.vocabulary[term_id] for term_id in self.tokens[item.start:item.start + item.n])
+                       for item in found]
+
+            # 較長片語所含的各段落出現次數；次數相同的較短 n-gram 只是片段，不重複列出
+            contained: Dict[str, int] = {}
+            for item, phrase in zip(found, phrases):
+                words = phrase.split()
+                for size in range(2, item.n):
+                    for offset in range(item.n - size + 1):
+                        part = " ".join(words[offset:offset + size])
+                        contained[part] = max(contained.get(part, 0), item.count)
+
+            self._collocations = []
+            for item, phrase in zip(found, phrases):
+                if contained.get(phrase, 0) >= item.count:
+                    continue
+                entry = self.entries[int(np.searchsorted(offsets, item.start, side='right')) - 1]
+                self._collocations.append({
+                    "phrase": phrase,
+                    "n": item.n,
+                    "count": item.count,
+                    "pmi": round(item.pmi, 3),
+                    "score": round(item.score, 3),
+                    "example": entry.text,
+                    "cue_index": entry.index
+                })
+        return self._collocations
+
+    def dialogues(self, subtitle_parser: SubtitleParser) -> List[Dict]:
+        """對話片段只提取一次"""
+        if self._dialogues is None:
+            self._dialogues = subtitle_parser.extract_dialogues(self.entries)
+        return self._dialogues
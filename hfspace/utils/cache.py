@@ -0,0 +1,161 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 快取未命中的標記值（None 也可能是合法的快取值）
+MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """估算快取值的記憶體大小（以 JSON 序列化長度近似）"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class LRUCache:
+    """以筆數與位元組數為上限的 LRU 快取，支援以標籤精準失效"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: Optional[float] = None, name: str = "cache"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+
+        # key -> (value, size, tags, expires_at)
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int, Tuple[str, ...], float]]' = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        # 失效世代：載入期間鍵或標籤被失效時，載入結果不寫回；沒有進行中的載入時歸零
+        self._key_generations: Dict[Hashable, int] = {}
+        self._tag_generations: Dict[str, int] = {}
+        self._clear_generation = 0
+        self._loads = 0
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        """取得快取值，未命中時回傳 MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            if entry[3] and entry[3] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def begin_load(self, key: Hashable, tags: Iterable[str] = ()) -> tuple:
+        """開始自資料來源載入，回傳目前的失效世代；載入結束後需呼叫 end_load"""
+        tags = tuple(tags)
+        with self._lock:
+            self._loads += 1
+            return key, tags, self._generation(key, tags)
+
+    def end_load(self, load: tuple):
+        """結束載入"""
+        with self._lock:
+            self._loads -= 1
+            if not self._loads:
+                self._key_generations.clear()
+                self._tag_generations.clear()
+
+    def _generation(self, key: Hashable, tags: Tuple[str, ...]) -> tuple:
+        """鍵與標籤目前的失效世代（呼叫端需持有鎖）"""
+        return (self._clear_generation, self._key_generations.get(key, 0),
+                tuple(self._tag_generations.get(tag, 0) for tag in tags))
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), size: Optional[int] = None,
+            load: Optional[tuple] = None) -> bool:
+        """寫入快取，超過單筆上限的值不快取；load 為 begin_load 的回傳值，載入期間已失效時不寫入"""
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return False
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        tags = tuple(tags)
+        with self._lock:
+            if load is not None and self._generation(load[0], load[1]) != load[2]:
+                return False
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, tags, expires_at)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, key: Hashable):
+        """使單一快取鍵失效"""
+        with self._lock:
+            if self._loads:
+                self._key_generations[key] = self._key_generations.get(key, 0) + 1
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag: str):
+        """使帶有指定標籤的所有快取鍵失效"""
+        with self._lock:
+            if self._loads:
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self._clear_generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        """移除快取鍵（呼叫端需持有鎖）"""
+        _, size, tags, _ = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        """取得命中率與記憶體用量指標"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,65 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# 語料庫影片數少於此值時 IDF 不具代表性，生字改用片內詞頻判斷
+MIN_CORPUS_DOCUMENTS = 10
+
+
+@dataclass
+class CorpusFrequencies:
+    """語料庫文件頻率：df 為出現該字的影片數，lower_df 為曾以全小寫出現的影片數"""
+    documents: int
+    df: Dict[str, int] = field(default_factory=dict)
+    lower_df: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def usable(self) -> bool:
+        """語料庫是否足以計算 IDF"""
+        return self.documents >= MIN_CORPUS_DOCUMENTS
+
+    def idf(self, terms: List[str]) -> np.ndarray:
+        """平滑 IDF：log((1 + N) / (1 + df)) + 1"""
+        df = np.fromiter((self.df.get(term, 0) for term in terms), dtype=np.float64, count=len(terms))
+        return np.log((1 + self.documents) / (1 + df)) + 1
+
+    def max_idf(self) -> float:
+        """只出現在一部影片的單字的 IDF"""
+        return math.log((1 + self.documents) / 2) + 1
+
+
+def pack_ids(values) -> bytes:
+    """uint32 陣列序列化為 BLOB"""
+    return np.asarray(values, dtype="<u4").tobytes()
+
+
+def unpack_ids(blob) -> np.ndarray:
+    """BLOB 還原為 uint32 陣列"""
+    if not blob:
+        return np.zeros(0, dtype=np.uint32)
+    return np.frombuffer(bytes(blob), dtype="<u4")
+
+
+def pack_flags(values) -> bytes:
+    """布林陣列序列化為 BLOB"""
+    return np.asarray(values, dtype=np.uint8).tobytes()
+
+
+def unpack_flags(blob) -> np.ndarray:
+    """BLOB 還原為布林陣列"""
+    if not blob:
+        return np.zeros(0, dtype=bool)
+    return np.frombuffer(bytes(blob), dtype=np.uint8).astype(bool)
+
+
+def sorted_term_arrays(term_ids: Dict[str, int], counts: Dict[str, int],
+                       lowercase: set) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """依 term id 排序的 (term id, 次數, 是否以小寫出現) 陣列"""
+    terms = list(counts)
+    ids = np.fromiter((term_ids[term] for term in terms), dtype=np.uint32, count=len(terms))
+    order = np.argsort(ids)
+    values = np.fromiter((counts[term] for term in terms), dtype=np.uint32, count=len(terms))
+    flags = np.fromiter((term in lowercase for term in terms), dtype=bool, count=len(terms))
+    return ids[order], values[order], flags[order]
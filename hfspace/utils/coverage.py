@@ -0,0 +1,147 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from utils.corpus import unpack_flags, unpack_ids
+
+logger = logging.getLogger(__name__)
+
+
+def bitset_from_bytes(blob) -> np.ndarray:
+    """BLOB 還原為位元組陣列（bit i 表示 term id i 為已知單字）"""
+    if not blob:
+        return np.zeros(0, dtype=np.uint8)
+    return np.frombuffer(bytes(blob), dtype=np.uint8).copy()
+
+
+def bitset_update(bitset: np.ndarray, add=(), remove=()) -> np.ndarray:
+    """設定或清除指定 term id 的位元，必要時擴充長度"""
+    add = np.asarray(add, dtype=np.int64)
+    remove = np.asarray(remove, dtype=np.int64)
+    highest = max(int(add.max()) if add.size else -1, int(remove.max()) if remove.size else -1)
+    if highest >= len(bitset) * 8:
+        bitset = np.concatenate([bitset, np.zeros(highest // 8 + 1 - len(bitset), dtype=np.uint8)])
+
+    if add.size:
+        np.bitwise_or.at(bitset, add >> 3, (1 << (add & 7)).astype(np.uint8))
+    if remove.size:
+        np.bitwise_and.at(bitset, remove >> 3, (~(1 << (remove & 7))).astype(np.uint8))
+    return bitset
+
+
+def known_lookup(bitset: np.ndarray, size: int) -> np.ndarray:
+    """位元組展開為長度 size 的布林查詢表，之後每個 term id 只需一次索引"""
+    lookup = np.zeros(size, dtype=bool)
+    bits = np.unpackbits(bitset, bitorder='little').view(bool)
+    count = min(len(bits), size)
+    lookup[:count] = bits[:count]
+    return lookup
+
+
+def known_mask(bitset: np.ndarray, term_ids: np.ndarray) -> np.ndarray:
+    """term id 陣列中哪些為已知單字；超出位元組範圍的 id 視為未知"""
+    ids = np.asarray(term_ids)
+    if not len(ids):
+        return np.zeros(0, dtype=bool)
+    return known_lookup(bitset, int(ids.max()) + 1)[ids]
+
+
+def bitset_count(bitset: np.ndarray) -> int:
+    """已知單字數"""
+    return int(np.unpackbits(bitset).sum()) if len(bitset) else 0
+
+
+def film_coverage(bitset: np.ndarray, term_ids: np.ndarray, counts: np.ndarray,
+                  lower_flags: np.ndarray) -> Tuple[float, np.ndarray]:
+    """影片 token 中已知單字的比例與未知單字的索引；專有名詞（不曾以小寫出現）視為已知"""
+    known = known_mask(bitset, term_ids) | ~lower_flags
+    total = counts.sum()
+    coverage = float(counts[known].sum() / total) if total else 0.0
+    return coverage, np.flatnonzero(~known)
+
+
+@dataclass
+class CatalogTerms:
+    """全片庫詞彙的 CSR 結構：第 i 部影片的詞彙為 term_ids[offsets[i]:offsets[i + 1]]，每部影片至少一個詞項"""
+    movie_ids: List[str] = field(default_factory=list)
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    term_ids: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.uint32))
+    counts: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.uint32))
+    proper: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    fingerprint: Any = None
+
+    def __post_init__(self):
+        # 專有名詞一律視為已知：排名時只需加總一般單字，專有名詞次數預先算好
+        starts = self.offsets[:-1]
+        self.totals = np.add.reduceat(self.counts, starts, dtype=np.uint64) if len(starts) else np.zeros(0)
+        self.proper_counts = np.add.reduceat(self.counts * self.proper, starts, dtype=np.uint64) if len(starts) else np.zeros(0)
+        self.counts = np.where(self.proper, 0, self.counts).astype(np.uint32)
+        self.vocabulary_size = int(self.term_ids.max()) + 1 if len(self.term_ids) else 0
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], fingerprint: Any = None) -> 'CatalogTerms':
+        """由 movie_terms 資料列建立"""
+        rows = [row for row in rows if row.get('term_ids')]
+        if not rows:
+            return cls(fingerprint=fingerprint)
+        ids = [unpack_ids(row['term_ids']) for row in rows]
+        return cls(
+            movie_ids=[row['movie_id'] for row in rows],
+            offsets=np.concatenate([[0], np.cumsum([len(item) for item in ids])]).astype(np.int64),
+            term_ids=np.concatenate(ids),
+            counts=np.concatenate([unpack_ids(row['term_counts']) for row in rows]),
+            proper=~np.concatenate([unpack_flags(row['lower_flags']) for row in rows]),
+            fingerprint=fingerprint
+        )
+
+    def coverage(self, bitset: np.ndarray) -> np.ndarray:
+        """每部影片的已知 token 比例：查詢表索引後以 reduceat 分段加總，整個片庫一次向量化計算"""
+        if not self.movie_ids:
+            return np.zeros(0)
+        known = known_lookup(bitset, self.vocabulary_size)[self.term_ids]
+        known_counts = np.add.reduceat(self.counts * known, self.offsets[:-1], dtype=np.uint64)
+        return (known_counts + self.proper_counts) / np.maximum(self.totals, 1)
+
+
+class CoverageEngine:
+    """學習者已知單字覆蓋率：全片庫詞彙常駐記憶體，語料庫索引變動時重新載入"""
+
+    def __init__(self, turso_client):
+        self.turso_client = turso_client
+        self._catalog = CatalogTerms()
+        self._lock = threading.Lock()
+
+    def catalog(self) -> CatalogTerms:
+        """取得片庫詞彙，movie_terms 有變動時重新載入"""
+        fingerprint = self.turso_client.get_movie_terms_fingerprint()
+        with self._lock:
+            if self._catalog.fingerprint != fingerprint or fingerprint is None:
+                rows = self.turso_client.get_all_movie_terms()
+                self._catalog = CatalogTerms.from_rows(rows, fingerprint)
+                logger.info(f"已載入片庫詞彙: {len(rows)} 部影片，{len(self._catalog.term_ids)} 個詞項")
+            return self._catalog
+
+    def rank(self, bitset: np.ndarray, limit: int = 20, min_coverage: float = 0.0,
+             max_coverage: float = 1.0) -> List[Dict[str, Any]]:
+        """依覆蓋率由高到低排出片庫影片"""
+        catalog = self.catalog()
+        coverage = catalog.coverage(bitset)
+        selected = np.flatnonzero((coverage >= min_coverage) & (coverage <= max_coverage))
+        selected = selected[np.argsort(-coverage[selected], kind='stable')][:limit]
+        return [
+            {"movie_id": catalog.movie_ids[index], "coverage": round(float(coverage[index]), 4)}
+            for index in selected
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """片庫詞彙快取狀態"""
+        catalog = self._catalog
+        arrays = (catalog.term_ids, catalog.counts, catalog.proper)
+        return {
+            "movies": len(catalog.movie_ids),
+            "terms": int(len(catalog.term_ids)),
+            "memory_kb": round(sum(array.nbytes for array in arrays) / 1024, 1)
+        }
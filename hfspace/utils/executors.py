@@ -0,0 +1,219 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.job_queue import latency_summary
+from utils.tracing import adopt_spans, collect_spans, tracing_active
+from config.settings import IO_EXECUTOR_WORKERS, IO_EXECUTOR_QUEUE, CPU_EXECUTOR_WORKERS, CPU_EXECUTOR_QUEUE
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """執行器等待中的工作已達上限"""
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: Dict[str, Any]):
+    """在工作執行緒或程序中執行，回傳 (開始時間, 是否成功, 結果或例外)；使用牆鐘時間以便跨程序比較"""
+    started = time.time()
+    try:
+        return started, True, fn(*args, **kwargs)
+    except Exception as e:
+        return started, False, e
+
+
+class BoundedExecutor:
+    """有等待上限的執行器，記錄每個工作的排隊時間與執行時間"""
+
+    def __init__(self, name: str, factory: Callable[[], Executor], max_workers: int, max_pending: int,
+                 history: int = 512, isolated: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # 程序池：contextvars 無法跨程序，追蹤區段由工作程序收集後帶回
+        self.isolated = isolated
+
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._queue_ms = deque(maxlen=history)
+        self._run_ms = deque(maxlen=history)
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._closed = False
+
+    def _get_executor(self) -> Executor:
+        """第一次提交時才建立執行緒池或程序池（呼叫端需持有鎖）"""
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交工作，結果為 _timed_call 的回傳值；等待中的工作超過上限時拒絕"""
+        with self._lock:
+            if self._closed:
+                raise ExecutorSaturatedError(f"{self.name} 執行器已關閉")
+            if self.in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"{self.name} 執行器等待中的工作已達上限 {self.max_pending}")
+            self.in_flight += 1
+            self.submitted += 1
+            executor = self._get_executor()
+
+        submitted_at = time.time()
+        try:
+            if self.isolated:
+                future = executor.submit(_timed_call, fn, args, kwargs)
+            else:
+                # 執行緒池沿用呼叫端的 contextvars（請求追蹤）
+                future = executor.submit(contextvars.copy_context().run, _timed_call, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(lambda done: self._record(done, submitted_at))
+        return future
+
+    def _record(self, future: Future, submitted_at: float):
+        """工作完成時記錄排隊與執行時間"""
+        finished = time.time()
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            started, ok, _ = future.result()
+            self._queue_ms.append(max(0.0, started - submitted_at) * 1000)
+            self._run_ms.append(max(0.0, finished - started) * 1000)
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    @staticmethod
+    def _unwrap(outcome) -> Any:
+        """取出結果，工作內的例外在呼叫端重新拋出"""
+        _, ok, value = outcome
+        if not ok:
+            raise value
+        return value
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """在事件迴圈中等待工作完成"""
+        if self.isolated and tracing_active():
+            return adopt_spans(self._unwrap(await asyncio.wrap_future(self.submit(collect_spans, fn, args, kwargs))))
+        return self._unwrap(await asyncio.wrap_future(self.submit(fn, *args, **kwargs)))
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """在工作執行緒中同步等待（只阻塞目前的執行緒，不可在事件迴圈中呼叫）"""
+        if self.isolated and tracing_active():
+            return adopt_spans(self._unwrap(self.submit(collect_spans, fn, args, kwargs).result()))
+        return self._unwrap(self.submit(fn, *args, **kwargs).result())
+
+    def stats(self) -> Dict[str, Any]:
+        """執行器深度與延遲指標"""
+        with self._lock:
+            queue_ms = list(self._queue_ms)
+            run_ms = list(self._run_ms)
+            in_flight = self.in_flight
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.max_workers),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_ms": latency_summary(queue_ms),
+            "run_ms": latency_summary(run_ms)
+        }
+
+    def close(self):
+        """停止接受新工作並等待進行中的工作結束"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            executor = self._executor
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        logger.info(f"{self.name} 執行器已關閉")
+
+
+def process_context():
+    """程序池的啟動方式：服務程序有多個執行緒，fork 可能複製到被其他執行緒持有的鎖，改用 forkserver（不支援時用 spawn）"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+class ExecutionLayer:
+    """請求處理的執行層：阻塞 I/O 使用執行緒池，CPU 密集工作使用程序池，兩者各自限制等待數量"""
+
+    def __init__(self, io_workers: int = IO_EXECUTOR_WORKERS, io_queue: int = IO_EXECUTOR_QUEUE,
+                 cpu_workers: int = CPU_EXECUTOR_WORKERS, cpu_queue: int = CPU_EXECUTOR_QUEUE):
+        io_workers = max(1, io_workers)
+        self.io = BoundedExecutor(
+            "io", lambda: ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="blocking-io"),
+            io_workers, io_queue
+        )
+        # 程序池的工作函式需定義在可匯入的模組層級、參數需可 pickle（工作程序重新匯入模組，不繼承父程序狀態）；
+        # 停用時 CPU 工作改在 I/O 執行緒池執行
+        self.cpu = BoundedExecutor(
+            "cpu", lambda: ProcessPoolExecutor(max_workers=cpu_workers, mp_context=process_context()),
+            cpu_workers, cpu_queue, isolated=True
+        ) if cpu_workers > 0 else self.io
+
+    def stats(self) -> Dict[str, Any]:
+        """各執行器指標"""
+        return {
+            "io": self.io.stats(),
+            "cpu": self.cpu.stats() if self.cpu is not self.io else None
+        }
+
+    def close(self):
+        """關閉所有執行器"""
+        self.io.close()
+        if self.cpu is not self.io:
+            self.cpu.close()
+
+
+_layer: Optional[ExecutionLayer] = None
+_layer_lock = threading.Lock()
+
+
+def get_executors() -> ExecutionLayer:
+    """取得全域執行層（第一次使用時建立）"""
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                _layer = ExecutionLayer()
+    return _layer
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """在 I/O 執行緒池執行阻塞呼叫（資料庫、上游 HTTP）"""
+    return await get_executors().io.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """在程序池執行 CPU 密集工作（字幕解析、分析）"""
+    return await get_executors().cpu.run(fn, *args, **kwargs)
+
+
+def call_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """由工作執行緒同步呼叫程序池，執行期間不佔用本程序的 GIL；程序池停用時直接在目前的執行緒執行，避免佔滿 I/O 執行緒池後互相等待"""
+    layer = get_executors()
+    if layer.cpu is layer.io:
+        return fn(*args, **kwargs)
+    return layer.cpu.call(fn, *args, **kwargs)
@@ -0,0 +1,251 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 工作狀態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class JobQueueFullError(RuntimeError):
+    """待處理工作已達上限"""
+
+
+def latency_summary(samples: Iterable[float]) -> Dict[str, float]:
+    """延遲樣本的 p50 / p95 / 最大值（毫秒）"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0, "p50": 0, "p95": 0, "max": 0}
+    return {
+        "count": len(ordered),
+        "p50": round(ordered[len(ordered) // 2], 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max": round(ordered[-1], 1)
+    }
+
+
+class AnalysisJobQueue:
+    """背景分析工作佇列：固定大小的工作執行緒池、依 (影片, 分析類型, 版本) 去重、狀態持久化於資料庫"""
+
+    def __init__(self, turso_client, runner: Callable[[str, str], Dict[str, Any]], version: str,
+                 max_workers: int = 2, max_pending: int = 100, history: int = 256):
+        """runner(movie_id, analysis_type) 回傳與同步 API 相同格式的回應"""
+        self.turso_client = turso_client
+        self.runner = runner
+        self.version = version
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        # 進行中與最近完成的工作，較舊的完成工作改由資料庫查詢
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._active: Dict[tuple, str] = {}
+        self._futures: Dict[str, Future] = {}
+        self._submitted_at: Dict[str, float] = {}
+        self._history = history
+
+        self._queue_ms = deque(maxlen=history)
+        self._run_ms = deque(maxlen=history)
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._closed = False
+
+        self._recover()
+
+    def _recover(self):
+        """重新排入上次關閉時尚未完成的工作"""
+        try:
+            jobs = self.turso_client.get_unfinished_jobs()
+        except Exception as e:
+            logger.error(f"讀取未完成分析工作失敗: {e}")
+            return
+
+        with self._lock:
+            reserved = [self._reserve(job['movie_id'], job['analysis_type'], job_id=job['job_id']) for job in jobs]
+        for job, future in reserved:
+            self._start(job, future)
+        if jobs:
+            logger.info(f"重新排入 {len(jobs)} 個未完成的分析工作")
+
+    def _key(self, movie_id: str, analysis_type: str) -> tuple:
+        """去重鍵"""
+        return (movie_id, analysis_type, self.version)
+
+    def submit(self, movie_id: str, analysis_type: str) -> Dict[str, Any]:
+        """提交分析工作；相同影片與版本已在進行中時回傳既有工作"""
+        job, _ = self.submit_with_future(movie_id, analysis_type)
+        return job
+
+    def submit_with_future(self, movie_id: str, analysis_type: str) -> Tuple[Dict[str, Any], Future]:
+        """提交分析工作並回傳 (工作, Future)；Future 於提交時取得，工作在呼叫端讀取前完成也能直接取得結果"""
+        if self._closed:
+            raise JobQueueFullError("分析佇列已關閉")
+
+        with self._lock:
+            existing = self._active.get(self._key(movie_id, analysis_type))
+            if existing:
+                self.deduplicated += 1
+                return {**self._jobs[existing], "deduplicated": True}, self._futures[existing]
+
+            if len(self._active) >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFullError(f"待處理分析工作已達上限 {self.max_pending}")
+
+            job, future = self._reserve(movie_id, analysis_type)
+            snapshot = dict(job)
+
+        self._start(job, future)
+        return {**snapshot, "deduplicated": False}, future
+
+    def _reserve(self, movie_id: str, analysis_type: str, job_id: Optional[str] = None) -> Tuple[Dict[str, Any], Future]:
+        """建立工作紀錄並佔用去重位置（呼叫端需持有鎖）"""
+        job = {
+            "job_id": job_id or uuid.uuid4().hex,
+            "movie_id": movie_id,
+            "analysis_type": analysis_type,
+            "analyzer_version": self.version,
+            "status": JOB_QUEUED,
+            "error": None,
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "queue_ms": None,
+            "run_ms": None
+        }
+
+        future: Future = Future()
+        self._jobs[job['job_id']] = job
+        self._active[self._key(movie_id, analysis_type)] = job['job_id']
+        self._futures[job['job_id']] = future
+        self._submitted_at[job['job_id']] = time.perf_counter()
+        self.submitted += 1
+        return job, future
+
+    def _start(self, job: Dict[str, Any], future: Future):
+        """寫入排隊狀態後交給執行緒池；不持有鎖，資料庫往返期間其他提交與狀態查詢不需等待"""
+        # 先寫入排隊狀態，避免覆蓋工作執行緒稍後寫入的執行中狀態
+        self.turso_client.save_job(dict(job))
+        try:
+            self._executor.submit(self._execute, job['job_id'], future)
+        except RuntimeError:
+            # 佇列已在寫入期間關閉：釋放去重位置，工作保留在資料庫，下次啟動時重新排入
+            with self._lock:
+                self._active.pop(self._key(job['movie_id'], job['analysis_type']), None)
+                self._futures.pop(job['job_id'], None)
+            future.cancel()
+            raise JobQueueFullError("分析佇列已關閉")
+
+    def _execute(self, job_id: str, future: Future):
+        """工作執行緒：執行工作並將結果交給提交時回傳的 Future"""
+        if future.set_running_or_notify_cancel():
+            future.set_result(self._run(job_id))
+
+    def _run(self, job_id: str) -> Dict[str, Any]:
+        """工作執行緒：執行分析並更新狀態"""
+        job = self._jobs[job_id]
+        started = time.perf_counter()
+        queue_ms = (started - self._submitted_at.pop(job_id, started)) * 1000
+        self._update(job, status=JOB_RUNNING, started_at=datetime.now().isoformat(), queue_ms=round(queue_ms, 1))
+
+        result: Dict[str, Any] = {}
+        try:
+            result = self.runner(job['movie_id'], job['analysis_type'])
+            if result.get('success'):
+                status, error = JOB_SUCCEEDED, None
+            else:
+                status, error = JOB_FAILED, result.get('message') or result.get('error')
+        except Exception as e:
+            logger.error(f"分析工作失敗 {job_id}: {e}")
+            status, error = JOB_FAILED, str(e)
+            result = {"success": False, "error": "影片分析失敗", "message": str(e)}
+
+        run_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._active.pop(self._key(job['movie_id'], job['analysis_type']), None)
+            self._futures.pop(job_id, None)
+            self._queue_ms.append(queue_ms)
+            self._run_ms.append(run_ms)
+            if status == JOB_SUCCEEDED:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self._trim_history()
+
+        self._update(job, status=status, error=error, finished_at=datetime.now().isoformat(), run_ms=round(run_ms, 1))
+        logger.info(f"分析工作 {job_id} {status}，等待 {queue_ms:.0f}ms，執行 {run_ms:.0f}ms")
+        return result
+
+    def _update(self, job: Dict[str, Any], **fields):
+        """更新工作狀態並寫入資料庫"""
+        job.update(fields)
+        if not self.turso_client.save_job(job):
+            logger.warning(f"分析工作狀態寫入失敗: {job['job_id']}")
+
+    def _trim_history(self):
+        """只在記憶體中保留最近完成的工作"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取得工作狀態"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self.turso_client.get_job(job_id)
+
+    def future(self, job_id: str) -> Optional[Future]:
+        """進行中工作的 Future，完成後結果為分析回應"""
+        return self._futures.get(job_id)
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        """進行中的工作"""
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job['status'] in ACTIVE_STATUSES]
+
+    def stats(self) -> Dict[str, Any]:
+        """佇列深度與延遲指標"""
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+            queue_ms = list(self._queue_ms)
+            run_ms = list(self._run_ms)
+        return {
+            "depth": statuses.count(JOB_QUEUED),
+            "running": statuses.count(JOB_RUNNING),
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "queue_wait_ms": latency_summary(queue_ms),
+            "run_ms": latency_summary(run_ms)
+        }
+
+    def close(self):
+        """停止接受新工作；未開始的工作保留在資料庫，下次啟動時重新排入"""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        # 未開始的工作不會執行，取消其 Future 讓等待中的呼叫端改回傳工作 ID
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+        logger.info("分析工作佇列已關閉")
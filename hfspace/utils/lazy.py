@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+from config.settings import DEPENDENCY_RETRY_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STATUS_PENDING = "pending"
+STATUS_INITIALIZING = "initializing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+STATUS_DISABLED = "disabled"
+
+
+class DependencyUnavailableError(RuntimeError):
+    """依賴初始化失敗（在重試間隔內不再重試）"""
+
+
+class LazyDependency(Generic[T]):
+    """延遲建立的依賴：第一次使用時才建立，失敗只影響自己，超過重試間隔後下一次使用時重試
+
+    可直接當作原物件使用：方法在呼叫時才建立依賴，因此 run_io(client.method, ...) 的連線發生在 I/O 執行緒而非事件迴圈；
+    spec 為依賴的類別，用來分辨方法與一般屬性（一般屬性存取會立即建立依賴）。
+    configured 檢查設定是否齊全（例如 API 金鑰），未設定時視為停用：不建立、不重試，真值為 False。"""
+
+    def __init__(self, dependency_name: str, factory: Callable[[], T], spec: Optional[type] = None,
+                 retry_interval: float = DEPENDENCY_RETRY_INTERVAL, configured: Optional[Callable[[], bool]] = None):
+        self.dependency_name = dependency_name
+        self._factory = factory
+        self._spec = spec
+        self._configured = configured
+        self._retry_interval = retry_interval
+        # 依賴可能合法地為 None（例如未設定詞表），以 _ready 判斷是否已建立
+        self._instance: Optional[T] = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self._initializing = False
+        self._scheduled = False
+        self._error: Optional[str] = None
+        self._failed_at = 0.0
+        self.init_seconds: Optional[float] = None
+
+    def instance(self) -> T:
+        """取得依賴，尚未建立時建立（阻塞目前的執行緒）"""
+        if self._ready:
+            return self._instance
+
+        if not self.is_configured:
+            raise DependencyUnavailableError(f"{self.dependency_name} 未設定")
+
+        with self._lock:
+            if self._ready:
+                return self._instance
+            if self._retry_pending():
+                raise DependencyUnavailableError(f"{self.dependency_name} 無法使用: {self._error}")
+
+            self._initializing = True
+            started = time.perf_counter()
+            try:
+                self._instance = self._factory()
+            except Exception as e:
+                self._error = str(e)
+                self._failed_at = time.monotonic()
+                logger.error(f"{self.dependency_name} 初始化失敗: {e}")
+                raise DependencyUnavailableError(f"{self.dependency_name} 無法使用: {e}") from e
+            finally:
+                self._initializing = False
+
+            self._ready = True
+            self._error = None
+            self.init_seconds = time.perf_counter() - started
+            logger.info(f"{self.dependency_name} 初始化完成，耗時 {self.init_seconds * 1000:.1f}ms")
+            return self._instance
+
+    def peek(self) -> Optional[T]:
+        """已建立時回傳依賴，否則為 None（不會觸發建立，可在事件迴圈中呼叫）"""
+        return self._instance
+
+    def get_nowait(self) -> Optional[T]:
+        """已建立時回傳依賴；否則在背景建立（失敗時遵守重試間隔）並回傳 None，呼叫端改用替代做法"""
+        if self._ready:
+            return self._instance
+        if not self.is_configured:
+            return None
+        with self._lock:
+            if self._scheduled or self._initializing or self._retry_pending():
+                return None
+            self._scheduled = True
+
+        def run():
+            try:
+                self.warm_up()
+            finally:
+                self._scheduled = False
+
+        threading.Thread(target=run, name=f"{self.dependency_name}-init", daemon=True).start()
+        return None
+
+    def _retry_pending(self) -> bool:
+        """上次初始化失敗且尚未超過重試間隔"""
+        return bool(self._error) and time.monotonic() - self._failed_at < self._retry_interval
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    @property
+    def is_configured(self) -> bool:
+        return self._configured is None or bool(self._configured())
+
+    def __bool__(self) -> bool:
+        """依賴可用（已建立，或尚未嘗試建立、第一次使用時建立）時為 True；停用或初始化失敗時為 False，
+        呼叫端沿用 `if client:` 改走替代做法。失敗且超過重試間隔時在背景重試，成功後恢復為 True"""
+        if self._ready:
+            return True
+        if not self.is_configured:
+            return False
+        if self._error:
+            self.get_nowait()
+            return False
+        return True
+
+    def warm_up(self) -> bool:
+        """預先建立依賴，失敗只記錄不拋出"""
+        try:
+            self.instance()
+            return True
+        except DependencyUnavailableError:
+            return False
+
+    def dependency_status(self) -> Dict[str, Any]:
+        """依賴狀態（健康檢查使用）"""
+        if self._ready:
+            status = STATUS_READY
+        elif not self.is_configured:
+            status = STATUS_DISABLED
+        elif self._initializing:
+            status = STATUS_INITIALIZING
+        elif self._error:
+            status = STATUS_FAILED
+        else:
+            status = STATUS_PENDING
+        return {
+            "status": status,
+            "init_ms": round(self.init_seconds * 1000, 1) if self.init_seconds is not None else None,
+            "error": self._error if status == STATUS_FAILED else None
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        # 只有 LazyDependency 本身沒有的屬性才會進入這裡；特殊屬性（pickle、copy 查詢的 __getstate__ 等）不轉送
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if self._ready:
+            return getattr(self._instance, name)
+        if self._spec is not None and callable(getattr(self._spec, name, None)):
+            def deferred(*args, **kwargs):
+                return getattr(self.instance(), name)(*args, **kwargs)
+            deferred.__name__ = name
+            return deferred
+        return getattr(self.instance(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyDependency {self.dependency_name} {self.dependency_status()['status']}>"
+
+
+def warm_up_in_background(dependencies: Iterable[LazyDependency]) -> threading.Thread:
+    """在背景執行緒依序預先建立依賴（前一個失敗不影響後面的）"""
+    dependencies = list(dependencies)
+
+    def run():
+        started = time.perf_counter()
+        ready = sum(dependency.warm_up() for dependency in dependencies)
+        logger.info(f"背景預熱完成: {ready}/{len(dependencies)} 個依賴可用，耗時 {time.perf_counter() - started:.2f}s")
+
+    thread = threading.Thread(target=run, name="dependency-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,333 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# CEFR 等級，編碼 1..6，0 表示詞表中沒有等級
+CEFR_LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2")
+LEVEL_CODES = {level: code for code, level in enumerate(CEFR_LEVELS, start=1)}
+# 頻率排名超過此值視為低頻詞
+RARE_FREQUENCY_RANK = 10000
+# 理解文本所需的詞彙覆蓋率
+COVERAGE_TARGET = 0.95
+
+# 檔案格式：標頭 + 開放定址雜湊表（鍵、頻率排名、等級三個平行陣列）
+_MAGIC = b"SLLX"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHIII12x")  # magic, version, flags, table_size, entry_count, max_probe
+_LOAD_FACTOR = 0.5
+
+# 常見不規則變化，規則變化由 lemma_candidates 的字尾規則處理
+IRREGULAR_LEMMAS = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "does": "do", "did": "do", "done": "do",
+    "went": "go", "gone": "go", "said": "say", "made": "make", "got": "get", "gotten": "get",
+    "took": "take", "taken": "take", "came": "come", "saw": "see", "seen": "see",
+    "knew": "know", "known": "know", "thought": "think", "told": "tell", "found": "find",
+    "gave": "give", "given": "give", "felt": "feel", "left": "leave", "kept": "keep",
+    "brought": "bring", "bought": "buy", "caught": "catch", "taught": "teach", "ran": "run",
+    "wrote": "write", "written": "write", "spoke": "speak", "spoken": "speak", "ate": "eat",
+    "eaten": "eat", "drank": "drink", "drunk": "drink", "began": "begin", "begun": "begin",
+    "forgot": "forget", "forgotten": "forget", "chose": "choose", "chosen": "choose",
+    "lost": "lose", "meant": "mean", "met": "meet", "paid": "pay", "sent": "send",
+    "stood": "stand", "understood": "understand", "won": "win", "heard": "hear",
+    "held": "hold", "led": "lead", "sat": "sit", "slept": "sleep", "fell": "fall",
+    "fallen": "fall", "flew": "fly", "flown": "fly", "broke": "break", "broken": "break",
+    "children": "child", "men": "man", "women": "woman", "people": "person",
+    "feet": "foot", "teeth": "tooth", "mice": "mouse", "better": "good", "best": "good",
+    "worse": "bad", "worst": "bad", "ll": "will", "ve": "have", "re": "be", "m": "be"
+}
+
+_VOWELS = set("aeiou")
+
+
+def _hash_word(word: str) -> int:
+    """64 位元單字雜湊，0 保留為空槽"""
+    value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return value or 1
+
+
+def lemma_candidates(word: str) -> List[str]:
+    """規則式詞形還原，依可能性排序回傳候選原形（不含原字）"""
+    if word in IRREGULAR_LEMMAS:
+        return [IRREGULAR_LEMMAS[word]]
+
+    candidates = []
+    length = len(word)
+
+    def add(stem: str):
+        if len(stem) >= 2 and stem != word and stem not in candidates:
+            candidates.append(stem)
+
+    if length > 4 and word.endswith("ies"):
+        add(word[:-3] + "y")
+    if length > 4 and word.endswith("ves"):
+        add(word[:-3] + "f")
+        add(word[:-3] + "fe")
+    if length > 3 and word.endswith("es"):
+        add(word[:-2])
+    if length > 3 and word.endswith("s") and not word.endswith("ss"):
+        add(word[:-1])
+
+    for suffix in ("ing", "ed", "er", "est"):
+        if length > len(suffix) + 2 and word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if suffix != "ing" and stem.endswith("i"):
+                # tried -> try, happier -> happy
+                add(stem[:-1] + "y")
+            if len(stem) > 2 and stem[-1] == stem[-2] and stem[-1] not in _VOWELS:
+                # running -> run, stopped -> stop
+                add(stem[:-1])
+            add(stem)
+            add(stem + "e")
+
+    if length > 4 and word.endswith("ly"):
+        add(word[:-2])
+        if word.endswith("ily"):
+            add(word[:-3] + "y")
+
+    return candidates
+
+
+class Lexicon:
+    """唯讀詞表：單字 -> (CEFR 等級, 頻率排名)，以記憶體映射的開放定址雜湊表 O(1) 查詢"""
+
+    def __init__(self, buffer, path: str = ""):
+        magic, version, _flags, table_size, entry_count, max_probe = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"不支援的詞表檔案格式: {path}")
+
+        self.path = path
+        self.table_size = table_size
+        self.entry_count = entry_count
+        self.max_probe = max_probe
+        self.load_ms = 0.0
+        self._identity: Optional[str] = None
+        self._buffer = buffer
+        self._mask = np.uint64(table_size - 1)
+
+        offset = _HEADER.size
+        self._keys = np.frombuffer(buffer, dtype="<u8", count=table_size, offset=offset)
+        offset += table_size * 8
+        self._ranks = np.frombuffer(buffer, dtype="<u4", count=table_size, offset=offset)
+        offset += table_size * 4
+        self._levels = np.frombuffer(buffer, dtype=np.uint8, count=table_size, offset=offset)
+
+    @property
+    def identity(self) -> str:
+        """詞表內容識別（詞條數與內容雜湊），第一次使用時才計算；詞表重新編譯後隨之改變"""
+        if self._identity is None:
+            digest = hashlib.sha1(self._buffer).hexdigest()[:12]
+            self._identity = f"{self.entry_count}-{digest}"
+        return self._identity
+
+    @classmethod
+    def load(cls, path: str) -> "Lexicon":
+        """以記憶體映射載入編譯後的詞表，不複製資料"""
+        started = time.perf_counter()
+        with open(path, "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        lexicon = cls(buffer, path)
+        lexicon.load_ms = (time.perf_counter() - started) * 1000
+        return lexicon
+
+    @staticmethod
+    def build(entries: Iterable[Tuple[str, Optional[str], Optional[int]]], path: str) -> int:
+        """將 (單字, CEFR 等級, 頻率排名) 編譯為詞表檔，回傳詞條數；同字重複時取較低等級與較前排名"""
+        merged: Dict[int, Tuple[int, int]] = {}
+        for word, level, rank in entries:
+            word = (word or "").strip().lower()
+            if not word:
+                continue
+            code = LEVEL_CODES.get((level or "").strip().upper(), 0)
+            rank = int(rank or 0)
+            key = _hash_word(word)
+            if key in merged:
+                old_code, old_rank = merged[key]
+                code = min(filter(None, (code, old_code)), default=0)
+                rank = min(filter(None, (rank, old_rank)), default=0)
+            merged[key] = (code, rank)
+
+        table_size = 1
+        while table_size < max(len(merged), 1) / _LOAD_FACTOR:
+            table_size <<= 1
+        mask = table_size - 1
+
+        keys = np.zeros(table_size, dtype="<u8")
+        ranks = np.zeros(table_size, dtype="<u4")
+        levels = np.zeros(table_size, dtype=np.uint8)
+        max_probe = 0
+        for key, (code, rank) in merged.items():
+            slot = key & mask
+            probe = 0
+            while keys[slot]:
+                slot = (slot + 1) & mask
+                probe += 1
+            keys[slot] = key
+            ranks[slot] = rank
+            levels[slot] = code
+            max_probe = max(max_probe, probe)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as handle:
+            handle.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, 0, table_size, len(merged), max_probe))
+            handle.write(keys.tobytes())
+            handle.write(ranks.tobytes())
+            handle.write(levels.tobytes())
+        os.replace(temp_path, path)
+        return len(merged)
+
+    def _find_slots(self, hashes: np.ndarray) -> np.ndarray:
+        """向量化線性探測，回傳每個雜湊所在槽位，找不到為 -1"""
+        slots = (hashes & self._mask).astype(np.int64)
+        found = np.full(len(hashes), -1, dtype=np.int64)
+        pending = np.arange(len(hashes))
+        mask = int(self._mask)
+
+        for _ in range(self.max_probe + 1):
+            if not len(pending):
+                break
+            current = self._keys[slots[pending]]
+            hit = current == hashes[pending]
+            found[pending[hit]] = slots[pending[hit]]
+            # 遇到空槽即確定不存在
+            pending = pending[~hit & (current != 0)]
+            slots[pending] = (slots[pending] + 1) & mask
+        return found
+
+    def lookup_terms(self, terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """批次查詢單字的等級與頻率排名，查不到時依序嘗試詞形還原的候選原形"""
+        count = len(terms)
+        levels = np.zeros(count, dtype=np.uint8)
+        ranks = np.zeros(count, dtype=np.uint32)
+        if not count:
+            return levels, ranks
+
+        slots = self._find_slots(np.fromiter((_hash_word(term) for term in terms), dtype=np.uint64, count=count))
+
+        # 未命中的單字展開為 (單字位置, 候選原形)，候選依優先順序排列
+        owners, candidates = [], []
+        for index in np.flatnonzero(slots < 0):
+            for candidate in lemma_candidates(terms[index]):
+                owners.append(index)
+                candidates.append(candidate)
+        if candidates:
+            owners = np.array(owners, dtype=np.int64)
+            candidate_slots = self._find_slots(np.fromiter(map(_hash_word, candidates), dtype=np.uint64, count=len(candidates)))
+            hit = candidate_slots >= 0
+            # 同一單字取第一個命中的候選
+            matched, first = np.unique(owners[hit], return_index=True)
+            slots[matched] = candidate_slots[hit][first]
+
+        known = slots >= 0
+        levels[known] = self._levels[slots[known]]
+        ranks[known] = self._ranks[slots[known]]
+        return levels, ranks
+
+    def lookup(self, word: str) -> Tuple[Optional[str], Optional[int]]:
+        """查詢單一單字的 (CEFR 等級, 頻率排名)"""
+        levels, ranks = self.lookup_terms([word.lower()])
+        return (CEFR_LEVELS[levels[0] - 1] if levels[0] else None, int(ranks[0]) or None)
+
+    def info(self) -> Dict[str, object]:
+        """詞表資訊與載入耗時"""
+        return {
+            "path": self.path,
+            "entries": self.entry_count,
+            "table_size": self.table_size,
+            "max_probe": self.max_probe,
+            "load_ms": round(self.load_ms, 3)
+        }
+
+
+def lexical_profile(levels: np.ndarray, ranks: np.ndarray) -> Dict[str, object]:
+    """由每個 token 的等級與排名計算等級分佈、達到覆蓋率目標所需等級與進階詞比例"""
+    total = len(levels)
+    found = (levels > 0) | (ranks > 0)
+    found_count = int(found.sum())
+
+    counts = np.bincount(levels, minlength=len(CEFR_LEVELS) + 1)[1:]
+    leveled = int(counts.sum())
+    cumulative = np.cumsum(counts) / leveled if leveled else np.zeros(len(CEFR_LEVELS))
+    coverage_index = min(int(np.searchsorted(cumulative, COVERAGE_TARGET)), len(CEFR_LEVELS) - 1)
+
+    advanced = found & ((levels >= LEVEL_CODES["C1"]) | (ranks > RARE_FREQUENCY_RANK))
+
+    return {
+        "level_distribution": {
+            level: round(int(count) / leveled, 4) if leveled else 0 for level, count in zip(CEFR_LEVELS, counts)
+        },
+        "coverage_level": CEFR_LEVELS[coverage_index] if leveled else None,
+        "coverage_target": COVERAGE_TARGET,
+        "advanced_ratio": round(int(advanced.sum()) / found_count, 4) if found_count else 0,
+        "unknown_ratio": round(1 - found_count / total, 4) if total else 0
+    }
+
+
+def read_source(path: str) -> Iterable[Tuple[str, Optional[str], Optional[int]]]:
+    """讀取 TSV 詞表來源：單字<TAB>CEFR 等級[<TAB>頻率排名]，# 開頭為註解"""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = [field.strip() for field in line.rstrip("\n").split("\t")]
+            if fields[0].lower() in ("word", "headword"):
+                # 標題列
+                continue
+            level = fields[1] if len(fields) > 1 else None
+            rank = fields[2] if len(fields) > 2 and fields[2].isdigit() else None
+            yield fields[0], level, int(rank) if rank else None
+
+
+_lexicon: Optional[Lexicon] = None
+_lexicon_loaded = False
+_lexicon_lock = threading.Lock()
+
+
+def lexicon_identity() -> str:
+    """目前使用的詞表識別，未載入詞表（啟發式評分）時為 none"""
+    lexicon = get_lexicon()
+    return lexicon.identity if lexicon else "none"
+
+
+def get_lexicon() -> Optional[Lexicon]:
+    """取得全域詞表（只載入一次）；編譯檔不存在或過期時由 TSV 來源重新編譯，皆無則回傳 None"""
+    global _lexicon, _lexicon_loaded
+    if _lexicon_loaded:
+        return _lexicon
+
+    with _lexicon_lock:
+        if _lexicon_loaded:
+            return _lexicon
+
+        from config.settings import LEXICON_PATH, LEXICON_SOURCE_PATH
+        try:
+            source_exists = bool(LEXICON_SOURCE_PATH) and os.path.exists(LEXICON_SOURCE_PATH)
+            if source_exists and (not os.path.exists(LEXICON_PATH)
+                                  or os.path.getmtime(LEXICON_PATH) < os.path.getmtime(LEXICON_SOURCE_PATH)):
+                started = time.perf_counter()
+                count = Lexicon.build(read_source(LEXICON_SOURCE_PATH), LEXICON_PATH)
+                logger.info(f"詞表編譯完成: {count} 個詞條，耗時 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+            if os.path.exists(LEXICON_PATH):
+                _lexicon = Lexicon.load(LEXICON_PATH)
+                logger.info(f"詞表載入完成: {_lexicon.entry_count} 個詞條，耗時 {_lexicon.load_ms:.2f}ms")
+            else:
+                logger.info("未設定詞表，難度評估使用啟發式規則")
+        except Exception as e:
+            logger.error(f"詞表載入失敗，難度評估改用啟發式規則: {e}")
+            _lexicon = None
+
+        _lexicon_loaded = True
+        return _lexicon
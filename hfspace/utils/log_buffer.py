@@ -0,0 +1,137 @@
+import itertools
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import LOG_BUFFER_CAPACITY, LOG_BUFFER_LEVEL, LOG_BUFFER_MAX_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+# 記錄欄位：(序號, 時間戳記, 等級數值, 等級名稱, 日誌名稱, 訊息)
+LogEntry = Tuple[int, float, int, str, str, str]
+
+
+def level_number(level: Any, default: int = logging.INFO) -> int:
+    """等級名稱或數值轉為等級數值，無法辨識時為 default"""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level or "").upper())
+    return value if isinstance(value, int) else default
+
+
+class LogRingBuffer:
+    """固定容量的日誌環形緩衝區：寫入槽位不取鎖，舊記錄直接被覆寫，記憶體用量固定
+
+    序號由 itertools.count 配發（CPython 中 next() 為原子操作），記錄寫入 序號 % 容量 的槽位；
+    讀取時以槽位內的序號確認記錄未被覆寫，因此讀寫不需互斥。只有推進 last_seq 時取一個極小的鎖，
+    避免較小的序號覆蓋較大的序號。"""
+
+    def __init__(self, capacity: int = LOG_BUFFER_CAPACITY, max_message: int = LOG_BUFFER_MAX_MESSAGE):
+        self.capacity = max(1, capacity)
+        self.max_message = max_message
+        self._slots: List[Optional[LogEntry]] = [None] * self.capacity
+        self._sequence = itertools.count(1)
+        self.last_seq = 0
+        self._last_seq_lock = threading.Lock()
+        self.dropped = 0
+
+    def append(self, created: float, levelno: int, levelname: str, name: str, message: str) -> int:
+        """寫入一筆記錄，回傳序號；過長的訊息截斷，避免單筆記錄佔用大量記憶體"""
+        if len(message) > self.max_message:
+            message = message[:self.max_message] + "…"
+        seq = next(self._sequence)
+        self._slots[seq % self.capacity] = (seq, created, levelno, levelname, name, message)
+        with self._last_seq_lock:
+            self.last_seq = max(self.last_seq, seq)
+        return seq
+
+    def since(self, after: int = 0, min_level: int = logging.NOTSET, limit: Optional[int] = None) -> Tuple[List[LogEntry], int]:
+        """取得序號大於 after 的記錄，回傳 (記錄, 下次查詢的 after)；已被覆寫的記錄略過"""
+        last = self.last_seq
+        first = max(after + 1, last - self.capacity + 1, 1)
+        entries = []
+        cursor = max(after, first - 1)
+        for seq in range(first, last + 1):
+            entry = self._slots[seq % self.capacity]
+            # 已配發序號但尚未寫入槽位：停止，下次查詢由 cursor 接續
+            if entry is None or entry[0] < seq:
+                break
+            # 讀取期間已被較新的記錄覆寫
+            if entry[0] > seq:
+                continue
+            cursor = seq
+            if entry[2] >= min_level:
+                entries.append(entry)
+                if limit and len(entries) >= limit:
+                    break
+        return entries, cursor
+
+    def tail(self, count: int, min_level: int = logging.NOTSET) -> Tuple[List[LogEntry], int]:
+        """最近 count 筆（符合等級的）記錄"""
+        entries, cursor = self.since(0, min_level)
+        return entries[-count:] if count else entries, cursor
+
+    def stats(self) -> Dict[str, Any]:
+        """緩衝區指標"""
+        return {
+            "capacity": self.capacity,
+            "last_seq": self.last_seq,
+            "retained": min(self.last_seq, self.capacity),
+            "dropped": self.dropped
+        }
+
+
+class RingBufferHandler(logging.Handler):
+    """寫入 LogRingBuffer 的日誌處理器；覆寫 handle 以略過 logging.Handler 的逐筆加鎖"""
+
+    def __init__(self, buffer: LogRingBuffer, level: int = logging.INFO):
+        super().__init__(level)
+        self.buffer = buffer
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            message = record.getMessage()
+            if record.exc_info and not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            if record.exc_text:
+                message = f"{message}\n{record.exc_text}"
+            self.buffer.append(record.created, record.levelno, record.levelname, record.name, message)
+        except Exception:
+            self.buffer.dropped += 1
+
+
+def entry_to_dict(entry: LogEntry) -> Dict[str, Any]:
+    """記錄轉為 API 回應格式"""
+    seq, created, _, levelname, name, message = entry
+    return {
+        "seq": seq,
+        "timestamp": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+        "level": levelname,
+        "logger": name,
+        "message": message
+    }
+
+
+def format_entry(entry: LogEntry) -> str:
+    """記錄轉為日誌面板的一行文字"""
+    _, created, _, levelname, name, message = entry
+    return f"[{datetime.fromtimestamp(created).strftime('%H:%M:%S')}] {levelname:<7} {name}: {message}"
+
+
+_buffer: Optional[LogRingBuffer] = None
+
+
+def install_log_buffer(level: Any = LOG_BUFFER_LEVEL) -> LogRingBuffer:
+    """在根日誌記錄器掛上環形緩衝區處理器（重複呼叫沿用同一個緩衝區）"""
+    global _buffer
+    if _buffer is None:
+        _buffer = LogRingBuffer()
+        logging.getLogger().addHandler(RingBufferHandler(_buffer, level_number(level)))
+    return _buffer
@@ -0,0 +1,272 @@
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prometheus 文字格式
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 延遲直方圖的區間上限（秒）：涵蓋快取命中的毫秒級查詢到上游逾時
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 收集器於匯出時回傳 (指標名稱, 型別, 說明, [(標籤, 數值)])
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+Collector = Callable[[], Iterable[Family]]
+
+
+class _Series:
+    """單一標籤組合的計數：每個執行緒累加自己的分片，記錄時不取鎖也不配置物件，匯出時才加總各分片"""
+
+    def __init__(self, width: int):
+        self._width = width
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> List[float]:
+        """目前執行緒的分片（每個執行緒第一次記錄時建立）"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self._width
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def totals(self) -> List[float]:
+        """加總各執行緒的分片"""
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0] * self._width
+        for shard in shards:
+            for index, value in enumerate(shard):
+                totals[index] += value
+        return totals
+
+
+class _CounterSeries(_Series):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        """累加"""
+        self._shard()[0] += amount
+
+
+class _HistogramSeries(_Series):
+    def __init__(self, bounds: Sequence[float]):
+        # 分片內容：各區間（含 +Inf）的計數，最後一格為總和
+        super().__init__(len(bounds) + 2)
+        self._bounds = bounds
+
+    def observe(self, value: float):
+        """記錄一筆觀測值"""
+        shard = self._shard()
+        shard[bisect.bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+
+class _Metric:
+    """有標籤的指標，各標籤組合的序列於第一次使用時建立"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """取得標籤組合對應的序列；標籤值須為有限集合（端點樣板、查詢名稱），不可放入使用者輸入"""
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._series[values] = self._new_series()
+        return series
+
+    def _new_series(self) -> _Series:
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], _Series]]:
+        with self._lock:
+            return list(self._series.items())
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不減的計數器"""
+    kind = "counter"
+
+    def _new_series(self) -> _CounterSeries:
+        return _CounterSeries()
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(dict(zip(self.labelnames, values)))} {_number(series.totals()[0])}"
+            for values, series in self._items()
+        ]
+
+
+class Histogram(_Metric):
+    """延遲直方圖"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, series in self._items():
+            labels = dict(zip(self.labelnames, values))
+            totals = series.totals()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), totals):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(totals[-1])}")
+            lines.append(f"{self.name}_count{_labels(labels)} {_number(cumulative)}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    """標籤值跳脫"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    """標籤轉為 {name="value"} 格式"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    """數值轉為 Prometheus 格式"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """指標登錄表：記錄型指標在熱路徑累加，狀態型指標（快取、佇列深度）由收集器在匯出時讀取"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """註冊記錄型指標"""
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Collector):
+        """註冊匯出時呼叫的收集器"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """以 Prometheus 文字格式匯出所有指標"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"指標收集失敗: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "subtitlelingo_http_request_duration_seconds",
+    "HTTP 請求處理時間（至回應標頭送出）",
+    ("route", "method", "status")
+)
+UPSTREAM_REQUEST_DURATION = REGISTRY.histogram(
+    "subtitlelingo_upstream_request_duration_seconds",
+    "OpenSubtitles API 請求時間（不含速率限制等待）",
+    ("endpoint", "outcome")
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "subtitlelingo_db_query_duration_seconds",
+    "資料庫查詢時間（含等待連線鎖）",
+    ("query",)
+)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    "subtitlelingo_db_query_errors_total",
+    "資料庫查詢失敗次數",
+    ("query",)
+)
+
+
+def cache_families(caches: Iterable) -> List[Family]:
+    """LRUCache 命中率與用量（匯出時讀取各快取的計數）"""
+    stats = [cache.stats() for cache in caches]
+    return [
+        ("subtitlelingo_cache_hits_total", "counter", "快取命中次數",
+         [({"cache": s["name"]}, s["hits"]) for s in stats]),
+        ("subtitlelingo_cache_misses_total", "counter", "快取未命中次數",
+         [({"cache": s["name"]}, s["misses"]) for s in stats]),
+        ("subtitlelingo_cache_hit_ratio", "gauge", "快取命中率",
+         [({"cache": s["name"]}, s["hit_rate"]) for s in stats]),
+        ("subtitlelingo_cache_entries", "gauge", "快取筆數",
+         [({"cache": s["name"]}, s["entries"]) for s in stats]),
+        ("subtitlelingo_cache_bytes", "gauge", "快取估計位元組數",
+         [({"cache": s["name"]}, s["bytes"]) for s in stats]),
+        ("subtitlelingo_cache_evictions_total", "counter", "快取淘汰次數",
+         [({"cache": s["name"]}, s["evictions"]) for s in stats])
+    ]
+
+
+def executor_families(executors: Dict[str, Dict]) -> List[Family]:
+    """執行器深度（BoundedExecutor.stats 的結果，停用的執行器為 None）"""
+    stats = {name: s for name, s in executors.items() if s}
+    return [
+        ("subtitlelingo_executor_in_flight", "gauge", "執行器執行中與等待中的工作數",
+         [({"executor": name}, s["in_flight"]) for name, s in stats.items()]),
+        ("subtitlelingo_executor_queue_depth", "gauge", "執行器等待中的工作數",
+         [({"executor": name}, s["queued"]) for name, s in stats.items()]),
+        ("subtitlelingo_executor_max_pending", "gauge", "執行器等待中工作上限",
+         [({"executor": name}, s["max_pending"]) for name, s in stats.items()]),
+        ("subtitlelingo_executor_rejected_total", "counter", "執行器因等待數已滿而拒絕的工作數",
+         [({"executor": name}, s["rejected"]) for name, s in stats.items()])
+    ]
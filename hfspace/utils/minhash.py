@@ -0,0 +1,55 @@
+import hashlib
+from typing import List
+
+import numpy as np
+
+# MinHash 簽章長度與 LSH 分段：32 段 × 每段 4 列，Jaccard 約 0.4 起有過半機率成為候選
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+# 每次計算的 term 數，限制中間矩陣大小
+HASH_CHUNK = 4096
+
+# multiply-shift 雜湊族 h(x) = (a·mix(x) + b) >> 32，a 為奇數；固定種子確保簽章在重新啟動後一致。
+# term id 多為連續整數，先以 splitmix64 打散，否則線性雜湊的最小值會偏向特定 id 而低估相似度
+_rng = np.random.default_rng(20240601)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 終混步驟"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def minhash_signature(term_ids: np.ndarray) -> np.ndarray:
+    """以語料庫 term id 集合計算 MinHash 簽章（uint32 × NUM_PERMUTATIONS）"""
+    signature = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint64)
+    ids = _mix(np.asarray(term_ids, dtype=np.uint64))
+    for start in range(0, len(ids), HASH_CHUNK):
+        chunk = ids[start:start + HASH_CHUNK, None]
+        hashed = (chunk * _MULTIPLIERS + _OFFSETS) >> _SHIFT
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """各 LSH 段的桶編號（含段序號的 64 位元雜湊，可直接存為 SQLite INTEGER）"""
+    bands = np.ascontiguousarray(signature, dtype="<u4").reshape(LSH_BANDS, ROWS_PER_BAND)
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.tobytes(), digest_size=8, key=index.to_bytes(2, 'little')).digest(),
+            'little', signed=True
+        )
+        for index, band in enumerate(bands)
+    ]
+
+
+def estimate_jaccard(signature: np.ndarray, candidates: List[np.ndarray]) -> np.ndarray:
+    """以簽章相同位置的比例估計 Jaccard 相似度"""
+    if not candidates:
+        return np.zeros(0)
+    return (np.vstack(candidates) == signature).mean(axis=1)
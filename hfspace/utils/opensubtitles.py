@@ -1,4 +1,3 @@
-import requests
 import time
 import logging
 from typing import List, Dict, Optional, Any
@@ -9,6 +8,8 @@ from config.settings import (
     OPENSUBTITLES_BASE_URL,
     OPENSUBTITLES_RATE_LIMIT
 )
+from utils.metrics import UPSTREAM_REQUEST_DURATION
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -59,7 +60,8 @@ class OpenSubtitlesClient:
 
     def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """發送 API 請求"""
-        self._wait_for_rate_limit()
+        with span("upstream.rate_limit_wait"):
+            self._wait_for_rate_limit()
 
         url = f"{self.base_url}{endpoint}"
         headers = {
@@ -67,13 +69,24 @@ class OpenSubtitlesClient:
             "User-Agent": self.user_agent
         }
 
+        # requests 匯入較慢，第一次呼叫上游時才匯入
+        import requests
+
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=30)
-            response.raise_for_status()
-            return response.json()
+            with span("upstream" + endpoint.replace("/", "."), {"http.method": "GET", "http.url": url}) as request_span:
+                response = requests.get(url, params=params, headers=headers, timeout=30)
+                request_span.set_attribute("http.status_code", response.status_code)
+                response.raise_for_status()
+                data = response.json()
+            outcome = "success"
+            return data
         except requests.exceptions.RequestException as e:
             logger.error(f"OpenSubtitles API 請求失敗: {e}")
             raise Exception(f"API 請求失敗: {str(e)}")
+        finally:
+            UPSTREAM_REQUEST_DURATION.labels(endpoint, outcome).observe(time.perf_counter() - started)
 
     def search_movies(self, query: str, page: int = 1) -> List[MovieInfo]:
         """搜尋影片"""
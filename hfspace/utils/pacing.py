@@ -0,0 +1,102 @@
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+from utils.subtitle_parser import SubtitleParser
+
+logger = logging.getLogger(__name__)
+
+# 標準時間字串長度 HH:MM:SS,mmm / HH:MM:SS.mmm
+_TIME_WIDTH = 12
+_DIGIT_POSITIONS = [0, 1, 3, 4, 6, 7, 9, 10, 11]
+# 各位數對應的毫秒權重
+_DIGIT_WEIGHTS = np.array([36000000, 3600000, 600000, 60000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+
+# 停頓分佈的區間下限（毫秒）
+PAUSE_BINS_MS = np.array([0, 250, 500, 1000, 2000, 5000, 10000, 30000], dtype=np.int64)
+LONG_PAUSE_MS = 5000
+
+
+def parse_timestamps_ms(values: List[str]) -> np.ndarray:
+    """向量化解析時間字串為毫秒，非標準格式逐筆退回 SubtitleParser.parse_time"""
+    count = len(values)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # 固定寬度 UCS-4 陣列可直接視為 (n, 寬度) 的字碼矩陣
+    strings = np.array([value or '' for value in values], dtype=f'U{_TIME_WIDTH + 4}')
+    codes = strings.view(np.uint32).reshape(count, _TIME_WIDTH + 4)
+    digits = codes[:, _DIGIT_POSITIONS].astype(np.int64) - ord('0')
+
+    valid = (
+        (np.char.str_len(strings) == _TIME_WIDTH)
+        & (codes[:, 2] == ord(':'))
+        & (codes[:, 5] == ord(':'))
+        & ((codes[:, 8] == ord(',')) | (codes[:, 8] == ord('.')))
+        & np.all((digits >= 0) & (digits <= 9), axis=1)
+    )
+
+    result = digits @ _DIGIT_WEIGHTS
+    result[~valid] = 0
+
+    for index in np.flatnonzero(~valid):
+        try:
+            result[index] = SubtitleParser.parse_time(values[index])[1]
+        except (ValueError, AttributeError):
+            logger.debug(f"無法解析時間字串: {values[index]!r}")
+
+    return result
+
+
+def compute_pacing(start_ms: np.ndarray, end_ms: np.ndarray, word_counts: np.ndarray,
+                   smoothing_minutes: int = 3) -> Dict[str, Any]:
+    """以整部影片的陣列計算每分鐘語速、字幕密度與停頓分佈"""
+    if len(start_ms) == 0:
+        return {}
+
+    durations = np.clip(end_ms - start_ms, 0, None)
+    word_counts = word_counts.astype(np.float64)
+    total_words = float(word_counts.sum())
+    speech_ms = float(durations.sum())
+    film_ms = float(max(int(end_ms.max()), 1))
+
+    # 每分鐘序列，以條目開始時間歸入分鐘
+    minutes = int(np.ceil(film_ms / 60000))
+    minute_index = np.clip(start_ms // 60000, 0, minutes - 1)
+    words_per_minute = np.bincount(minute_index, weights=word_counts, minlength=minutes)
+    cues_per_minute = np.bincount(minute_index, minlength=minutes)
+    speech_seconds_per_minute = np.bincount(minute_index, weights=durations, minlength=minutes) / 1000
+
+    # 移動平均視窗平滑語速曲線
+    window = max(1, min(smoothing_minutes, minutes))
+    smoothed = np.convolve(words_per_minute, np.ones(window) / window, mode='same')
+
+    # 相鄰條目的間隔，重疊視為零停頓
+    gaps = np.clip(start_ms[1:] - end_ms[:-1], 0, None) if len(start_ms) > 1 else np.zeros(0, dtype=np.int64)
+    # 每個停頓落在哪個區間，最後一個區間無上限
+    histogram = np.bincount(np.searchsorted(PAUSE_BINS_MS, gaps, side='right') - 1, minlength=len(PAUSE_BINS_MS))
+    percentiles = np.percentile(gaps, [10, 50, 90]) if len(gaps) else np.zeros(3)
+
+    return {
+        "duration_minutes": round(film_ms / 60000, 2),
+        "speech_minutes": round(speech_ms / 60000, 2),
+        "speech_ratio": round(speech_ms / film_ms, 4),
+        # 以實際說話時間計算的語速，與片長內的平均語速分開
+        "speech_wpm": round(total_words / (speech_ms / 60000), 1) if speech_ms else 0,
+        "overall_wpm": round(total_words / (film_ms / 60000), 1),
+        "peak_wpm": float(words_per_minute.max()),
+        "words_per_minute": words_per_minute.round(1).tolist(),
+        "words_per_minute_smoothed": smoothed.round(1).tolist(),
+        "cues_per_minute": cues_per_minute.tolist(),
+        "speech_seconds_per_minute": speech_seconds_per_minute.round(1).tolist(),
+        "pause_distribution": {
+            "bins_ms": PAUSE_BINS_MS.tolist(),
+            "counts": histogram.tolist(),
+            "p10_ms": round(float(percentiles[0]), 1),
+            "median_ms": round(float(percentiles[1]), 1),
+            "p90_ms": round(float(percentiles[2]), 1),
+            "mean_ms": round(float(gaps.mean()), 1) if len(gaps) else 0,
+            "long_pauses": int((gaps >= LONG_PAUSE_MS).sum())
+        }
+    }
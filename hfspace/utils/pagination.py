@@ -0,0 +1,57 @@
+import base64
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursorError(ValueError):
+    """無效的分頁游標"""
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """將排序鍵值編碼為不透明游標"""
+    raw = json.dumps(values, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], required_keys: List[str]) -> Optional[Dict[str, Any]]:
+    """解碼游標，空值表示第一頁"""
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception as e:
+        raise InvalidCursorError(f"無法解析分頁游標: {e}")
+
+    if not isinstance(values, dict) or any(key not in values for key in required_keys):
+        raise InvalidCursorError("分頁游標缺少排序欄位")
+
+    return values
+
+
+def clamp_page_size(limit: Any, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """限制每頁筆數在允許範圍內"""
+    try:
+        limit = int(limit) if limit is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def build_page(rows: List[Dict], limit: int, cursor_fn: Callable[[Dict], Dict[str, Any]]) -> Dict[str, Any]:
+    """以多取一筆的結果組出分頁，並產生下一頁游標"""
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    next_cursor = encode_cursor(cursor_fn(items[-1])) if has_more and items else None
+
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    }
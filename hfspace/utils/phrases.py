@@ -0,0 +1,112 @@
+from typing import List, NamedTuple
+
+import numpy as np
+
+# 片語長度範圍（字數）
+MIN_PHRASE_LENGTH = 2
+MAX_PHRASE_LENGTH = 4
+# 出現次數少於此值的 n-gram 不列入，PMI 對只出現一次的組合不可靠
+MIN_PHRASE_COUNT = 2
+# 片中詞頻最高的這些單字（至多詞彙量的一成）視為功能詞，全由功能詞組成的 n-gram 不算片語
+FUNCTION_WORD_COUNT = 40
+# term id 無法無損打包進 64 位元時改用乘法雜湊（碰撞機率可忽略）
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class Collocation(NamedTuple):
+    """n-gram 統計：start 為首次出現的 token 位置"""
+    n: int
+    start: int
+    count: int
+    pmi: float
+    score: float
+
+
+def ngram_keys(tokens: np.ndarray, n: int, vocabulary_size: int) -> np.ndarray:
+    """每個起點的 n-gram 整數鍵；詞彙表夠小時為無損打包，否則為雜湊"""
+    length = len(tokens) - n + 1
+    keys = tokens[:length].astype(np.uint64)
+    bits = max(int(vocabulary_size).bit_length(), 1)
+    if bits * n <= 64:
+        shift = np.uint64(bits)
+        for offset in range(1, n):
+            keys = (keys << shift) | tokens[offset:offset + length].astype(np.uint64)
+    else:
+        for offset in range(1, n):
+            keys = keys * HASH_MULTIPLIER + tokens[offset:offset + length].astype(np.uint64)
+    return keys
+
+
+def extract_collocations(tokens: np.ndarray, cue_offsets: np.ndarray, term_counts: np.ndarray,
+                         min_n: int = MIN_PHRASE_LENGTH, max_n: int = MAX_PHRASE_LENGTH,
+                         min_count: int = MIN_PHRASE_COUNT) -> List[Collocation]:
+    """以 PMI 找出 2~4 字的搭配詞；n-gram 不跨越字幕條目，依頻率加權的 PMI 由高到低排序"""
+    total = len(tokens)
+    if total < min_n or not len(term_counts):
+        return []
+
+    tokens = tokens.astype(np.int64)
+    vocabulary_size = len(term_counts)
+    # 每個 token 所屬的條目，n-gram 首尾須在同一條目
+    cue_of = np.repeat(np.arange(len(cue_offsets) - 1), np.diff(cue_offsets.astype(np.int64)))
+
+    function_words = np.zeros(vocabulary_size, dtype=bool)
+    function_count = min(FUNCTION_WORD_COUNT, vocabulary_size // 10)
+    function_words[np.argsort(-term_counts.astype(np.int64), kind='stable')[:function_count]] = True
+    token_function = function_words[tokens]
+
+    # 各長度在每個起點的 log2 機率，供切分點查詢；長度 1 即單字機率
+    log_p = {1: np.log2(term_counts.astype(np.float64) / total)[tokens]}
+
+    collocations = []
+    for n in range(2, max_n + 1):
+        length = total - n + 1
+        if length <= 0:
+            break
+
+        keys = ngram_keys(tokens, n, vocabulary_size)
+        starts = np.flatnonzero(cue_of[:length] == cue_of[n - 1:])
+        # 沒有條目容納得下 n 個字時，更長的 n-gram 也不存在
+        if not len(starts):
+            break
+        unique_keys, first, counts = np.unique(keys[starts], return_index=True, return_counts=True)
+
+        # 跨越條目的起點不會被查詢，機率以 0 次計即可
+        slot = np.minimum(np.searchsorted(unique_keys, keys), len(unique_keys) - 1)
+        found = unique_keys[slot] == keys
+        log_p[n] = np.where(found, np.log2(np.maximum(counts[slot], 1) / total), -np.inf)
+
+        if n < min_n:
+            continue
+
+        frequent = counts >= min_count
+        positions = starts[first[frequent]]
+        counts = counts[frequent]
+        if not len(positions):
+            continue
+
+        # 取所有二分切點中最小的 PMI：片語需在每個切點都緊密相連，
+        # 避免強片語前後接上任意單字（for by the way）也得到高分
+        pmi = np.full(len(positions), np.inf)
+        for split in range(1, n):
+            pmi = np.minimum(
+                pmi, log_p[n][positions] - log_p[split][positions] - log_p[n - split][positions + split]
+            )
+
+        all_function = np.ones(len(positions), dtype=bool)
+        repeated = np.ones(len(positions), dtype=bool)
+        for offset in range(n):
+            all_function &= token_function[positions + offset]
+            if offset:
+                repeated &= tokens[positions + offset] == tokens[positions]
+
+        # 排除全為功能詞（of the、it is）與重複同一字（no no）的組合
+        keep = ~all_function & ~repeated & (pmi > 0)
+        score = pmi * np.log2(counts)
+        collocations.extend(
+            Collocation(n, int(position), int(count), float(value), float(weighted))
+            for position, count, value, weighted in zip(positions[keep], counts[keep], pmi[keep], score[keep])
+        )
+
+    collocations.sort(key=lambda item: (-item.score, -item.n, item.start))
+    return collocations
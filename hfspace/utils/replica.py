@@ -0,0 +1,166 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+_table_patterns: Dict[str, re.Pattern] = {}
+
+
+def _table_pattern(table: str) -> re.Pattern:
+    """比對查詢中資料表名稱的正規表示式（整個單字、不分大小寫）"""
+    pattern = _table_patterns.get(table)
+    if pattern is None:
+        pattern = _table_patterns[table] = re.compile(rf"\b{re.escape(table)}\b", re.IGNORECASE)
+    return pattern
+
+
+class EmbeddedReplica:
+    """本地嵌入式唯讀副本，讀取在本地執行，定期自主資料庫同步"""
+
+    def __init__(self, connection: Any, sync_fn: Callable[[], None], sync_interval: float = 60,
+                 max_staleness: float = 300, read_your_writes: bool = True, name: str = "replica"):
+        self.connection = connection
+        self.name = name
+        self.sync_interval = sync_interval
+        self.max_staleness = max_staleness
+        self.read_your_writes = read_your_writes
+
+        self._sync_fn = sync_fn
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        # 未知範圍的寫入（任何讀取前都同步）與已知寫入的資料表（只有讀取這些資料表時才同步）
+        self._dirty = False
+        self._dirty_tables: Set[str] = set()
+        # 保護未同步寫入的標記；與 lock 分開，寫入端標記時不必等待進行中的同步
+        self._dirty_lock = threading.Lock()
+        self._last_sync = 0.0
+        self._sync_count = 0
+        self._sync_failures = 0
+        self._last_sync_seconds = 0.0
+
+    @classmethod
+    def from_libsql(cls, local_path: str, sync_url: str, auth_token: str, **kwargs) -> 'EmbeddedReplica':
+        """建立 libsql 嵌入式副本（Turso embedded replica）"""
+        import libsql_experimental as libsql
+
+        conn = libsql.connect(local_path, sync_url=sync_url, auth_token=auth_token)
+        return cls(conn, conn.sync, name=local_path, **kwargs)
+
+    @classmethod
+    def from_sqlite_primary(cls, primary_path: str, local_path: str, **kwargs) -> 'EmbeddedReplica':
+        """以本地 SQLite 檔案模擬主資料庫，供測試與離線開發使用"""
+        conn = sqlite3.connect(local_path, check_same_thread=False, isolation_level=None)
+
+        def sync():
+            # 以 SQLite backup API 將主資料庫完整複製到副本
+            primary = sqlite3.connect(primary_path)
+            try:
+                primary.backup(conn)
+            finally:
+                primary.close()
+
+        return cls(conn, sync, name=local_path, **kwargs)
+
+    def sync(self) -> bool:
+        """自主資料庫同步副本"""
+        with self.lock:
+            # 複製前先取出並清除標記：同步期間的寫入可能不在這次複製的快照內，需保留到下次同步
+            with self._dirty_lock:
+                dirty, dirty_tables = self._dirty, self._dirty_tables
+                self._dirty, self._dirty_tables = False, set()
+
+            started = time.perf_counter()
+            try:
+                self._sync_fn()
+            except Exception as e:
+                with self._dirty_lock:
+                    self._dirty = self._dirty or dirty
+                    self._dirty_tables |= dirty_tables
+                self._sync_failures += 1
+                logger.error(f"副本同步失敗 {self.name}: {e}")
+                return False
+
+            self._last_sync = time.monotonic()
+            self._last_sync_seconds = time.perf_counter() - started
+            self._sync_count += 1
+            return True
+
+    def mark_dirty(self, tables: Optional[Iterable[str]] = None):
+        """主資料庫已寫入：tables 為寫入的資料表，讀取這些資料表前需同步；None 表示範圍未知，下次任何讀取前都同步"""
+        if not self.read_your_writes:
+            return
+        with self._dirty_lock:
+            if tables is None:
+                self._dirty = True
+            else:
+                self._dirty_tables.update(table.lower() for table in tables)
+
+    def _reads_dirty_table(self, query: str) -> bool:
+        """查詢是否引用有未同步寫入的資料表（以資料表名稱比對，寧可多同步也不讀到舊資料）"""
+        with self._dirty_lock:
+            tables = tuple(self._dirty_tables)
+        return bool(tables) and any(_table_pattern(table).search(query) for table in tables)
+
+    def staleness(self) -> float:
+        """距上次同步的秒數"""
+        if not self._last_sync:
+            return float('inf')
+        return time.monotonic() - self._last_sync
+
+    def ensure_fresh(self, query: Optional[str] = None):
+        """副本過期，或查詢讀取有未同步寫入的資料表時先同步（未指定查詢時有任何未同步的寫入即同步）"""
+        pending = self._dirty or (self._reads_dirty_table(query) if query is not None else bool(self._dirty_tables))
+        if pending or self.staleness() > self.max_staleness:
+            if not self.sync() and self._last_sync == 0.0:
+                raise RuntimeError(f"副本尚未完成首次同步: {self.name}")
+
+    def execute(self, query: str, params: Optional[List] = None) -> Any:
+        """在本地副本執行唯讀查詢"""
+        with self.lock:
+            self.ensure_fresh(query)
+            return self.connection.execute(query, params or [])
+
+    def start(self):
+        """啟動背景定期同步"""
+        if self.sync_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+
+        def run():
+            while not self._stop.wait(self.sync_interval):
+                self.sync()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="replica-sync", daemon=True)
+        self._thread.start()
+        logger.info(f"副本背景同步已啟動，間隔 {self.sync_interval} 秒")
+
+    def status(self) -> Dict[str, Any]:
+        """取得副本同步狀態"""
+        staleness = self.staleness()
+        with self._dirty_lock:
+            dirty, dirty_tables = self._dirty, sorted(self._dirty_tables)
+        return {
+            "name": self.name,
+            "staleness_seconds": None if staleness == float('inf') else round(staleness, 3),
+            "max_staleness_seconds": self.max_staleness,
+            "sync_interval_seconds": self.sync_interval,
+            "sync_count": self._sync_count,
+            "sync_failures": self._sync_failures,
+            "last_sync_seconds": round(self._last_sync_seconds, 4),
+            "pending_writes": dirty or bool(dirty_tables),
+            "pending_tables": dirty_tables
+        }
+
+    def close(self):
+        """停止同步並關閉副本連線"""
+        self._stop.set()
+        try:
+            self.connection.close()
+        except Exception as e:
+            logger.error(f"關閉副本連線失敗: {e}")
@@ -0,0 +1,193 @@
+import dataclasses
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.cache import LRUCache, MISSING
+from config.settings import COMPRESSION_MIN_BYTES, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, HTTP_CACHE_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+# 序列化與壓縮套件為選用：未安裝時退回標準函式庫的 json 與 gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MEDIA_TYPE = "application/json"
+IDENTITY = "identity"
+# 各編碼的壓縮等級：取壓縮率與速度的折衷，回應體只壓縮一次並快取
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+# 用戶端同時接受多種編碼時的優先順序
+ENCODING_PREFERENCE = ("zstd", "br", "gzip")
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+_zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+
+
+def _default(value: Any) -> Any:
+    """序列化器不支援的型別：dataclass、numpy 純量與陣列，其餘轉為字串"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """序列化為 UTF-8 JSON 位元組"""
+    if orjson:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(value, ensure_ascii=False, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def supported_encodings() -> List[str]:
+    """目前環境可用的壓縮編碼（依優先順序）"""
+    available = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in ENCODING_PREFERENCE if available[encoding]]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """依 Accept-Encoding（含 q 值）選出回應編碼，都不接受時為 identity"""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    candidates = [
+        encoding for encoding in supported_encodings()
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return IDENTITY
+    # q 值較高者優先，同分時依伺服器偏好
+    return max(candidates, key=lambda encoding: (accepted.get(encoding, accepted.get("*", 0.0)),
+                                                 -ENCODING_PREFERENCE.index(encoding)))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """以指定編碼壓縮"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return _zstd_compressor.compress(body)
+    return body
+
+
+class ResponseBodyCache:
+    """已序列化與已壓縮的回應體快取：同一個鍵的各編碼版本只產生一次"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.cache = LRUCache(max_entries, max_bytes, name="responses")
+
+    def get(self, key: Hashable, encoding: str) -> Optional[bytes]:
+        """取得指定編碼的回應體"""
+        variants = self.cache.get(key)
+        if variants is MISSING:
+            return None
+        return variants.get(encoding)
+
+    def put(self, key: Hashable, encoding: str, identity: bytes, body: bytes):
+        """加入一個編碼版本（連同未壓縮版本，供其他編碼再利用）"""
+        variants = self.cache.get(key)
+        variants = dict(variants) if variants is not MISSING else {}
+        variants[IDENTITY] = identity
+        variants[encoding] = body
+        self.cache.set(key, variants, size=sum(len(value) for value in variants.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        """快取指標"""
+        return self.cache.stats()
+
+
+def encode_body(value: Any, encoding: str, cache: Optional[ResponseBodyCache] = None,
+                cache_key: Optional[Hashable] = None) -> Tuple[bytes, str]:
+    """序列化並壓縮回應，回傳 (回應體, 實際編碼)；小於門檻的回應不壓縮。
+    有 cache_key 時先查快取，重複請求不再序列化與壓縮"""
+    if cache is not None and cache_key is not None:
+        cached = cache.get(cache_key, encoding)
+        if cached is not None:
+            return cached, encoding
+        identity = cache.get(cache_key, IDENTITY)
+    else:
+        identity = None
+
+    if identity is None:
+        identity = dumps(value)
+    if encoding == IDENTITY or len(identity) < COMPRESSION_MIN_BYTES:
+        encoding, body = IDENTITY, identity
+    else:
+        body = compress(identity, encoding)
+
+    if cache is not None and cache_key is not None:
+        cache.put(cache_key, encoding, identity, body)
+    return body, encoding
+
+
+def entity_tag(*parts: Any) -> str:
+    """由版本資訊（內容雜湊、分析器版本等）產生強 ETag，不需讀取回應內容"""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def tag_for_encoding(etag: str, encoding: str) -> str:
+    """壓縮後的位元組不同，強 ETag 需帶上編碼後綴"""
+    return etag if encoding == IDENTITY else f'"{etag[1:-1]}-{encoding}"'
+
+
+def not_modified_encoding(if_none_match: Optional[str], etag: str, encoding: str) -> Optional[str]:
+    """If-None-Match 與 ETag 相符時（弱比較，忽略 W/ 前綴與編碼後綴），回傳 304 應標示的實際編碼，不相符時為 None。
+    小於門檻的回應不壓縮，需有回應體才知道；用戶端送回的標籤帶有當時的編碼後綴，
+    有後綴表示回應體達壓縮門檻，以本次協商的編碼標示，沒有則與 200 回應相同為 identity"""
+    if not if_none_match:
+        return None
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return encoding
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        tag, _, suffix = candidate.strip('"').partition("-")
+        if tag == base:
+            return encoding if suffix else IDENTITY
+    return None
+
+
+def cache_headers(etag: str, encoding: str) -> Dict[str, str]:
+    """可重新驗證回應的快取標頭"""
+    return {
+        "ETag": tag_for_encoding(etag, encoding),
+        "Cache-Control": f"public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding"
+    }
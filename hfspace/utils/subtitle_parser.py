@@ -1,8 +1,9 @@
 import re
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import Any, List, Dict, Tuple, Optional
 from dataclasses import dataclass
-import chardet
+
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -76,8 +77,11 @@ class SubtitleParser:
 
         # 檢測編碼
         if isinstance(content, bytes):
+            # chardet 只在內容為位元組時需要，延遲匯入
+            import chardet
             try:
-                detected = chardet.detect(content)
+                with span("parser.detect_encoding", {"subtitle.bytes": len(content)}):
+                    detected = chardet.detect(content)
                 encoding = detected['encoding']
                 logger.info(f"檢測到編碼: {encoding} (信心度: {detected.get('confidence', 0):.2f})")
                 content = content.decode(encoding)
@@ -137,8 +141,11 @@ class SubtitleParser:
 
         # 檢測編碼
         if isinstance(content, bytes):
+            # chardet 只在內容為位元組時需要，延遲匯入
+            import chardet
             try:
-                detected = chardet.detect(content)
+                with span("parser.detect_encoding", {"subtitle.bytes": len(content)}):
+                    detected = chardet.detect(content)
                 encoding = detected['encoding']
                 logger.info(f"檢測到編碼: {encoding} (信心度: {detected.get('confidence', 0):.2f})")
                 content = content.decode(encoding)
@@ -218,15 +225,19 @@ class SubtitleParser:
 
     def parse(self, content: str, format: Optional[str] = None) -> List[SubtitleEntry]:
         """解析字幕內容"""
-        if not format:
-            format = self.auto_detect_format(content)
-
-        if format.lower() == 'vtt':
-            return self.parse_vtt(content)
-        elif format.lower() == 'srt':
-            return self.parse_srt(content)
-        else:
-            raise ValueError(f"不支援的字幕格式: {format}")
+        with span("parser.parse") as parse_span:
+            if not format:
+                format = self.auto_detect_format(content)
+            parse_span.set_attribute("subtitle.format", format)
+
+            if format.lower() == 'vtt':
+                entries = self.parse_vtt(content)
+            elif format.lower() == 'srt':
+                entries = self.parse_srt(content)
+            else:
+                raise ValueError(f"不支援的字幕格式: {format}")
+            parse_span.set_attribute("subtitle.entries", len(entries))
+            return entries
 
     def extract_dialogues(self, entries: List[SubtitleEntry], min_duration: int = 2000) -> List[Dict]:
         """提取對話片段（基於時間間隔）"""
@@ -263,6 +274,8 @@ class SubtitleParser:
                 'index': entry.index,
                 'start_time': entry.start_time,
                 'end_time': entry.end_time,
+                'start_ms': entry.start_ms,
+                'end_ms': entry.end_ms,
                 'text': entry.text
             })
 
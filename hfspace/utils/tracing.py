@@ -0,0 +1,209 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.settings import TRACING_ENABLED, TRACING_EXPORTER, TRACING_EXPORT_PATH, TRACING_SLOW_MS
+
+logger = logging.getLogger(__name__)
+
+# OpenTelemetry 為選用：TRACING_EXPORTER=otel 且已安裝時，區段同時送往 OpenTelemetry 追蹤器（由部署端設定 SDK 與匯出器）
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+EXPORTER_NONE = "none"
+EXPORTER_JSONL = "jsonl"
+EXPORTER_OTEL = "otel"
+
+# Server-Timing 的指標名稱只能是 token 字元
+SERVER_TIMING_NAME_PATTERN = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+class Span:
+    """一個計時區段；時間以 Unix 奈秒記錄，跨程序收集的區段可直接合併"""
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "_started",
+                 "_token", "_otel", "_otel_scope")
+
+    def __init__(self, trace: 'Trace', name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id: Optional[str] = None
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self._started = 0
+        self._token = None
+        self._otel = None
+        self._otel_scope = None
+
+    def set_attribute(self, key: str, value: Any):
+        """補上執行後才知道的屬性（筆數、狀態碼等）"""
+        self.attributes[key] = value
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def __enter__(self) -> 'Span':
+        self.parent_id = _current_span.get()
+        self._token = _current_span.set(self.span_id)
+        if _tracer is not None:
+            self._otel_scope = _tracer.start_as_current_span(self.name, attributes=dict(self.attributes))
+            self._otel = self._otel_scope.__enter__()
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+        if self._otel_scope is not None:
+            self._otel_scope.__exit__(exc_type, exc, tb)
+        self.trace.spans.append(self)
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP JSON 的區段欄位"""
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes
+        }
+
+
+class _NullSpan:
+    """未追蹤時的區段：不計時也不配置物件"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """一個請求的所有區段（多個執行緒同時附加，list.append 為原子操作）"""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: List[Span] = []
+
+    def server_timing(self, root: Optional[Span] = None) -> str:
+        """依區段名稱彙總的 Server-Timing 標頭值；巢狀區段各自列出，例如 parser.parse 包含 parser.detect_encoding"""
+        totals: Dict[str, Tuple[float, int]] = {}
+        for span in list(self.spans):
+            if span is root:
+                continue
+            duration, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (duration + span.duration_ms, count + 1)
+
+        parts = [
+            f'{SERVER_TIMING_NAME_PATTERN.sub("_", name)};dur={duration:.1f};desc="x{count}"'
+            for name, (duration, count) in sorted(totals.items(), key=lambda item: -item[1][0])
+        ]
+        if root is not None:
+            parts.append(f"total;dur={root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in list(self.spans)]
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span", default=None)
+_tracer = otel_trace.get_tracer("subtitlelingo") if otel_trace and TRACING_EXPORTER == EXPORTER_OTEL else None
+_export_lock = threading.Lock()
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """在目前的請求追蹤中開啟區段，屬性名稱沿用 OpenTelemetry 慣例（db.operation、http.route 等）；
+    沒有進行中的追蹤時回傳不計時的空區段"""
+    trace = _current_trace.get()
+    if trace is None:
+        return NULL_SPAN
+    return Span(trace, name, attributes if attributes is not None else {})
+
+
+def tracing_active() -> bool:
+    """目前的執行緒或協程是否在追蹤中"""
+    return _current_trace.get() is not None
+
+
+def start_trace() -> Optional[Trace]:
+    """開始新的請求追蹤（追蹤停用時為 None）"""
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def collect_spans(fn: Callable, args: tuple, kwargs: Dict[str, Any]) -> Tuple[Any, List[Dict[str, Any]]]:
+    """在程序池中執行並收集區段，回傳 (結果, 區段)；由 adopt_spans 併入呼叫端的追蹤"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        return fn(*args, **kwargs), [
+            {"name": s.name, "span_id": s.span_id, "parent_id": s.parent_id, "attributes": s.attributes,
+             "start_ns": s.start_ns, "end_ns": s.end_ns}
+            for s in trace.spans
+        ]
+    finally:
+        _current_trace.reset(token)
+
+
+def adopt_spans(outcome: Tuple[Any, List[Dict[str, Any]]]) -> Any:
+    """把程序池回傳的區段併入目前的追蹤，最上層區段接在目前的區段下"""
+    value, spans = outcome
+    trace = _current_trace.get()
+    if trace is not None:
+        parent_id = _current_span.get()
+        for data in spans:
+            adopted = Span(trace, data["name"], data["attributes"])
+            adopted.span_id = data["span_id"]
+            adopted.parent_id = data["parent_id"] or parent_id
+            adopted.start_ns = data["start_ns"]
+            adopted.end_ns = data["end_ns"]
+            trace.spans.append(adopted)
+    return value
+
+
+def should_export(root: Span) -> bool:
+    """是否由本地匯出器寫出（只有 jsonl 匯出器且超過 TRACING_SLOW_MS 的請求）"""
+    return TRACING_EXPORTER == EXPORTER_JSONL and root.duration_ms >= TRACING_SLOW_MS
+
+
+def export_trace(trace: Trace):
+    """本地匯出器：以 JSON Lines 附加到 TRACING_EXPORT_PATH，每行一個 OTLP 格式的區段"""
+    try:
+        lines = "".join(json.dumps(span, ensure_ascii=False, default=str) + "\n" for span in trace.to_dicts())
+        directory = os.path.dirname(TRACING_EXPORT_PATH)
+        with _export_lock:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(TRACING_EXPORT_PATH, "a", encoding="utf-8") as f:
+                f.write(lines)
+    except Exception as e:
+        logger.error(f"匯出追蹤失敗: {e}")
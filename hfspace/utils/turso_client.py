@@ -1,29 +1,358 @@
-import libsql_experimental as libsql
+import hashlib
 import logging
 import json
-from typing import Dict, List, Any, Optional
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime
-from config.settings import TURSO_URL, TURSO_AUTH_TOKEN
+from config.settings import (
+    TURSO_URL,
+    TURSO_AUTH_TOKEN,
+    TURSO_REPLICA_PATH,
+    TURSO_REPLICA_SYNC_INTERVAL,
+    TURSO_REPLICA_MAX_STALENESS,
+    TURSO_REPLICA_READ_YOUR_WRITES,
+    STATS_RECONCILE_INTERVAL,
+    CACHE_TTL,
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_BYTES
+)
+from utils.cache import LRUCache, MISSING
+from utils.metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS
+from utils.tracing import span
+from utils.pagination import build_page, decode_cursor
+from utils.replica import EmbeddedReplica
+from utils.analysis_context import count_terms
+from utils.corpus import CorpusFrequencies, pack_flags, pack_ids, sorted_term_arrays, unpack_flags, unpack_ids
+from utils.minhash import band_buckets, estimate_jaccard, minhash_signature
 
 logger = logging.getLogger(__name__)
 
+# 熱門排序的 keyset 條件（參數依序為 download_count、download_count、imdb_id）；
+# 列值比較 (a, b) < (?, ?) 無法在運算式索引上定位，只能掃描，拆成首欄範圍條件才能由 idx_movies_popularity 直接定位
+POPULARITY_AFTER = "COALESCE(download_count, 0) <= ? AND (COALESCE(download_count, 0) < ? OR imdb_id < ?)"
+
+# 啟動時確保存在的索引與輔助結構
+SCHEMA_STATEMENTS = [
+    # 熱門/搜尋影片的 keyset 分頁排序鍵；download_count 可能為 NULL，排序與比較一律以 COALESCE 視為 0
+    "DROP INDEX IF EXISTS idx_movies_download_count",
+    "CREATE INDEX IF NOT EXISTS idx_movies_popularity ON movies (COALESCE(download_count, 0) DESC, imdb_id DESC)",
+    # 字幕條目的 keyset 分頁排序鍵（與 UNIQUE(movie_id, sequence_number) 相同，舊資料庫可能缺少）
+    "CREATE INDEX IF NOT EXISTS idx_subtitles_movie_sequence ON subtitles (movie_id, sequence_number)",
+    # 統計計數器，由觸發器維護，reconcile_counters 校正
+    """
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0,
+            reconciled_at TEXT
+        )
+    """,
+    """
+        INSERT OR IGNORE INTO stats_counters (name, value) VALUES
+            ('movies', 0), ('movies_with_subtitles', 0), ('vocabulary_notes', 0), ('exercises', 0),
+            ('corpus_documents', 0)
+    """,
+    # INSERT OR REPLACE 的衝突刪除不會觸發 DELETE 觸發器，因此以 BEFORE INSERT 檢查是否為新資料
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_movies_count_insert BEFORE INSERT ON movies
+        WHEN NOT EXISTS (SELECT 1 FROM movies WHERE imdb_id = NEW.imdb_id)
+        BEGIN
+            UPDATE stats_counters SET value = value + 1 WHERE name = 'movies';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_movies_count_delete AFTER DELETE ON movies
+        BEGIN
+            UPDATE stats_counters SET value = value - 1 WHERE name = 'movies';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_subtitles_count_insert BEFORE INSERT ON subtitles
+        WHEN NOT EXISTS (SELECT 1 FROM subtitles WHERE movie_id = NEW.movie_id)
+        BEGIN
+            UPDATE stats_counters SET value = value + 1 WHERE name = 'movies_with_subtitles';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_subtitles_count_delete AFTER DELETE ON subtitles
+        WHEN NOT EXISTS (SELECT 1 FROM subtitles WHERE movie_id = OLD.movie_id)
+        BEGIN
+            UPDATE stats_counters SET value = value - 1 WHERE name = 'movies_with_subtitles';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_vocabulary_count_insert AFTER INSERT ON vocabulary_notes
+        BEGIN
+            UPDATE stats_counters SET value = value + 1 WHERE name = 'vocabulary_notes';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_vocabulary_count_delete AFTER DELETE ON vocabulary_notes
+        BEGIN
+            UPDATE stats_counters SET value = value - 1 WHERE name = 'vocabulary_notes';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_exercises_count_insert BEFORE INSERT ON practice_exercises
+        WHEN NEW.id IS NULL OR NOT EXISTS (SELECT 1 FROM practice_exercises WHERE id = NEW.id)
+        BEGIN
+            UPDATE stats_counters SET value = value + 1 WHERE name = 'exercises';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_exercises_count_delete AFTER DELETE ON practice_exercises
+        BEGIN
+            UPDATE stats_counters SET value = value - 1 WHERE name = 'exercises';
+        END
+    """,
+    # 背景分析工作狀態，重新啟動後可恢復未完成的工作
+    """
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            job_id TEXT PRIMARY KEY,
+            movie_id TEXT NOT NULL,
+            analysis_type TEXT NOT NULL,
+            analyzer_version TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            submitted_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            queue_ms REAL,
+            run_ms REAL
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs (status, submitted_at)",
+    # 語料庫詞彙索引：每個單字出現在幾部影片（df），以及曾以全小寫出現的影片數（區分專有名詞）
+    """
+        CREATE TABLE IF NOT EXISTS corpus_terms (
+            term_id INTEGER PRIMARY KEY,
+            term TEXT NOT NULL UNIQUE,
+            df INTEGER NOT NULL DEFAULT 0,
+            lower_df INTEGER NOT NULL DEFAULT 0
+        )
+    """,
+    # 每部影片的詞彙，term id 遞增排序的 uint32 BLOB；重新儲存字幕時據此扣除舊的文件頻率
+    """
+        CREATE TABLE IF NOT EXISTS movie_terms (
+            movie_id TEXT PRIMARY KEY,
+            term_ids BLOB NOT NULL,
+            term_counts BLOB NOT NULL,
+            lower_flags BLOB NOT NULL,
+            total_tokens INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """,
+    # 每部影片的片語與搭配詞，供生字筆記使用
+    """
+        CREATE TABLE IF NOT EXISTS movie_phrases (
+            movie_id TEXT NOT NULL,
+            phrase TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            pmi REAL,
+            score REAL,
+            example TEXT,
+            cue_index INTEGER,
+            created_at TEXT,
+            PRIMARY KEY (movie_id, phrase)
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_movie_phrases_score ON movie_phrases (movie_id, score DESC)",
+    # 學習者已知單字：以語料庫 term id 為位元位置的位元組
+    """
+        CREATE TABLE IF NOT EXISTS user_known_words (
+            user_id TEXT PRIMARY KEY,
+            bitset BLOB NOT NULL,
+            word_count INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """,
+    # 相似影片索引：每部影片詞彙集合的 MinHash 簽章與 LSH 分段桶，隨語料庫索引一併更新
+    """
+        CREATE TABLE IF NOT EXISTS movie_minhash (
+            movie_id TEXT PRIMARY KEY,
+            signature BLOB NOT NULL,
+            term_count INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS lsh_bands (
+            bucket INTEGER NOT NULL,
+            movie_id TEXT NOT NULL,
+            PRIMARY KEY (bucket, movie_id)
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_lsh_bands_movie ON lsh_bands (movie_id)",
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_corpus_documents_insert BEFORE INSERT ON movie_terms
+        WHEN NOT EXISTS (SELECT 1 FROM movie_terms WHERE movie_id = NEW.movie_id)
+        BEGIN
+            UPDATE stats_counters SET value = value + 1 WHERE name = 'corpus_documents';
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_corpus_documents_delete AFTER DELETE ON movie_terms
+        BEGIN
+            UPDATE stats_counters SET value = value - 1 WHERE name = 'corpus_documents';
+        END
+    """,
+]
+
+# 既有資料表後來新增的欄位 (資料表, 欄位, 型別)，啟動時補上
+COLUMN_MIGRATIONS = [
+    # 字幕內容雜湊，分析結果以此判斷是否過期
+    ("subtitle_metadata", "content_hash", "TEXT"),
+    ("analysis_results", "content_hash", "TEXT"),
+    ("analysis_results", "analyzer_version", "TEXT"),
+    ("analysis_results", "section_versions", "TEXT"),
+]
+
+SAVE_MOVIE_QUERY = """
+    INSERT OR REPLACE INTO movies (
+        imdb_id, title, year, type, poster_url,
+        download_count, overview, created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SAVE_ANALYSIS_QUERY = """
+    INSERT OR REPLACE INTO analysis_results (
+        movie_id, analysis_type, data, content_hash,
+        analyzer_version, section_versions, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+SAVE_JOB_QUERY = """
+    INSERT OR REPLACE INTO analysis_jobs (
+        job_id, movie_id, analysis_type, analyzer_version, status, error,
+        submitted_at, started_at, finished_at, queue_ms, run_ms
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 計數器名稱與精確統計查詢（稽核與校正用）
+EXACT_COUNT_QUERIES = {
+    'movies': "SELECT COUNT(*) as count FROM movies",
+    'movies_with_subtitles': "SELECT COUNT(DISTINCT movie_id) as count FROM subtitles",
+    'vocabulary_notes': "SELECT COUNT(*) as count FROM vocabulary_notes",
+    'exercises': "SELECT COUNT(*) as count FROM practice_exercises",
+    'corpus_documents': "SELECT COUNT(*) as count FROM movie_terms",
+}
+
+# IN 查詢每批參數數量
+IN_QUERY_CHUNK = 500
+
+# 由 SQL 推得的查詢名稱（動詞_資料表），作為延遲指標的標籤
+# 寫入語句的目標資料表（用於副本只在讀取相關資料表時才同步）
+WRITE_TABLE_PATTERN = re.compile(
+    r"^\s*(?:insert(?:\s+or\s+\w+)?\s+into|replace\s+into|update(?:\s+or\s+\w+)?|delete\s+from)\s+(\w+)", re.IGNORECASE
+)
+# 觸發器連帶寫入的資料表
+TRIGGER_TABLES = {
+    "movies": ("stats_counters",),
+    "subtitles": ("stats_counters",),
+    "vocabulary_notes": ("stats_counters",),
+    "practice_exercises": ("stats_counters",),
+    "movie_terms": ("stats_counters",),
+}
+QUERY_TABLE_PATTERN = re.compile(r"\b(?:from|into|update)\s+(\w+)", re.IGNORECASE)
+QUERY_NAME_CACHE_MAX = 1024
+_query_names: Dict[str, str] = {}
+
 class TursoClient:
     """Turso 資料庫客戶端"""
 
-    def __init__(self):
-        if not TURSO_URL or not TURSO_AUTH_TOKEN:
-            raise ValueError("Turso 連線資訊未設定")
+    def __init__(self, conn: Any = None, replica: Optional[EmbeddedReplica] = None):
+        """conn 為主資料庫連線（寫入），replica 為本地嵌入式副本（讀取）；未提供時依設定建立"""
+        # 連線會被背景工作共用，需序列化存取
+        self._lock = threading.RLock()
+        self._reconcile_stop = threading.Event()
+        self._reconcile_thread = None
+
+        if conn is None:
+            if not TURSO_URL or not TURSO_AUTH_TOKEN:
+                raise ValueError("Turso 連線資訊未設定")
+            # libsql 只在連線遠端資料庫時需要（測試與工具可傳入任何 DB-API 連線）
+            import libsql_experimental as libsql
+            conn = libsql.connect(TURSO_URL, auth_token=TURSO_AUTH_TOKEN)
 
-        self.conn = libsql.connect(TURSO_URL, auth_token=TURSO_AUTH_TOKEN)
+            if replica is None and TURSO_REPLICA_PATH:
+                replica = EmbeddedReplica.from_libsql(
+                    TURSO_REPLICA_PATH, TURSO_URL, TURSO_AUTH_TOKEN,
+                    sync_interval=TURSO_REPLICA_SYNC_INTERVAL,
+                    max_staleness=TURSO_REPLICA_MAX_STALENESS,
+                    read_your_writes=TURSO_REPLICA_READ_YOUR_WRITES
+                )
+
+        self.conn = conn
+        self.replica = replica
+        # 熱門查詢的讀穿快取，由對應的寫入方法精準失效
+        self.cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, ttl=CACHE_TTL, name="turso")
         logger.info("Turso 資料庫連線成功")
+        self._ensure_schema()
+
+        if self.replica:
+            self.replica.sync()
+            self.replica.start()
+            logger.info(f"嵌入式副本讀取模式已啟用: {self.replica.name}")
+
+        if STATS_RECONCILE_INTERVAL > 0:
+            self.start_counter_reconciler(STATS_RECONCILE_INTERVAL)
+
+    def _ensure_schema(self):
+        """建立必要的索引與輔助資料表"""
+        for statement in SCHEMA_STATEMENTS:
+            if not self._execute_update(statement):
+                logger.warning(f"無法套用資料庫結構: {statement}")
+        self._ensure_columns()
+
+        # 新建立的計數器尚未校正，先以精確值初始化
+        try:
+            pending = self._execute_query("SELECT name FROM stats_counters WHERE reconciled_at IS NULL")
+            if pending:
+                self.reconcile_counters()
+        except Exception as e:
+            logger.warning(f"初始化統計計數器失敗: {e}")
+
+    def _ensure_columns(self):
+        """補上舊資料庫缺少的欄位"""
+        for table, column, column_type in COLUMN_MIGRATIONS:
+            try:
+                # 結構查詢直接讀主資料庫，副本此時可能尚未同步
+                with self._lock:
+                    existing = {row['name'] for row in _rows_to_dicts(self.conn.execute(f"PRAGMA table_info({table})"))}
+                if existing and column not in existing:
+                    if self._execute_update(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"):
+                        logger.info(f"已新增欄位 {table}.{column}")
+            except Exception as e:
+                logger.warning(f"無法檢查欄位 {table}.{column}: {e}")
+
+    def _cached_read(self, key: tuple, tags: List[str], loader) -> Any:
+        """讀穿快取：命中時直接回傳，否則載入並快取非空結果；載入期間被寫入失效時不寫回舊值"""
+        value = self.cache.get(key)
+        if value is not MISSING:
+            return value
+
+        load = self.cache.begin_load(key, tags)
+        try:
+            value = loader()
+            if value:
+                self.cache.set(key, value, tags, load=load)
+        finally:
+            self.cache.end_load(load)
+        return value
 
     def _execute_query(self, query: str, params: Optional[List] = None) -> List[Dict]:
         """執行查詢"""
         try:
-            result = self.conn.execute(query, params or [])
-            if hasattr(result, 'rows'):
-                return [dict(row) for row in result.rows]
-            return []
+            with _observe_query("db.query", query):
+                if self.replica:
+                    # 讀取由本地副本提供
+                    with self.replica.lock:
+                        return _rows_to_dicts(self.replica.execute(query, params))
+                with self._lock:
+                    return _rows_to_dicts(self.conn.execute(query, params or []))
         except Exception as e:
             logger.error(f"執行查詢失敗: {e}")
             logger.error(f"查詢: {query}")
@@ -33,7 +362,10 @@ class TursoClient:
     def _execute_update(self, query: str, params: Optional[List] = None) -> bool:
         """執行更新/插入操作"""
         try:
-            self.conn.execute(query, params or [])
+            with _observe_query("db.update", query):
+                with self._lock:
+                    self.conn.execute(query, params or [])
+            self._mark_written(query)
             return True
         except Exception as e:
             logger.error(f"執行更新失敗: {e}")
@@ -41,30 +373,49 @@ class TursoClient:
             logger.error(f"參數: {params}")
             return False
 
+    def _execute_batch(self, query: str, params_list: List[List]) -> bool:
+        """在單一交易中執行多筆更新，失敗時整批回滾"""
+        with self._lock:
+            try:
+                with _observe_query("db.batch", query) as batch_span:
+                    batch_span.set_attribute("db.rows", len(params_list))
+                    self.conn.execute("BEGIN")
+                    self.conn.executemany(query, params_list)
+                    self.conn.execute("COMMIT")
+            except Exception as e:
+                logger.error(f"批次更新失敗: {e}")
+                logger.error(f"查詢: {query}")
+                try:
+                    self.conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+                return False
+
+        self._mark_written(query)
+        return True
+
+    def _mark_written(self, query: Optional[str] = None, tables: Tuple[str, ...] = ()):
+        """通知副本主資料庫已寫入：依寫入語句或指定的資料表（含觸發器連帶寫入的資料表），無法判斷時視為全部"""
+        if not self.replica:
+            return
+        if query is not None:
+            match = WRITE_TABLE_PATTERN.match(query)
+            if not match:
+                self.replica.mark_dirty()
+                return
+            tables = (match.group(1).lower(),)
+        written = set(tables)
+        for table in tables:
+            written.update(TRIGGER_TABLES.get(table, ()))
+        self.replica.mark_dirty(written)
+
     # === 影片相關操作 ===
     def save_movie(self, movie_data: Dict[str, Any]) -> str:
         """儲存影片資訊"""
         try:
-            query = """
-                INSERT OR REPLACE INTO movies (
-                    imdb_id, title, year, type, poster_url,
-                    download_count, overview, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-
-            params = [
-                movie_data.get('imdb_id'),
-                movie_data.get('title'),
-                movie_data.get('year'),
-                movie_data.get('type'),
-                movie_data.get('poster_url'),
-                movie_data.get('download_count', 0),
-                movie_data.get('overview', ''),
-                movie_data.get('created_at', datetime.now().isoformat()),
-                movie_data.get('updated_at', datetime.now().isoformat())
-            ]
-
-            if self._execute_update(query, params):
+            updated = self._execute_update(SAVE_MOVIE_QUERY, _movie_params(movie_data))
+            self.cache.invalidate(('movie', movie_data.get('imdb_id')))
+            if updated:
                 logger.info(f"影片儲存成功: {movie_data.get('title')}")
                 return movie_data.get('imdb_id')
             return None
@@ -73,12 +424,32 @@ class TursoClient:
             logger.error(f"儲存影片失敗: {e}")
             return None
 
+    def save_movies(self, movies: List[Dict[str, Any]]) -> bool:
+        """以單一交易批次儲存多部影片"""
+        if not movies:
+            return True
+
+        try:
+            updated = self._execute_batch(SAVE_MOVIE_QUERY, [_movie_params(movie) for movie in movies])
+            for movie in movies:
+                self.cache.invalidate(('movie', movie.get('imdb_id')))
+            if updated:
+                logger.info(f"批次儲存影片成功: {len(movies)} 部")
+            return updated
+
+        except Exception as e:
+            logger.error(f"批次儲存影片失敗: {e}")
+            return False
+
     def get_movie_by_imdb_id(self, imdb_id: str) -> Optional[Dict]:
         """根據 IMDb ID 取得影片"""
         try:
-            query = "SELECT * FROM movies WHERE imdb_id = ?"
-            result = self._execute_query(query, [imdb_id])
-            return result[0] if result else None
+            def load():
+                query = "SELECT * FROM movies WHERE imdb_id = ?"
+                result = self._execute_query(query, [imdb_id])
+                return result[0] if result else None
+
+            return self._cached_read(('movie', imdb_id), [], load)
         except Exception as e:
             logger.error(f"取得影片失敗 {imdb_id}: {e}")
             return None
@@ -109,19 +480,66 @@ class TursoClient:
             logger.error(f"取得熱門影片失敗: {e}")
             return []
 
+    def get_popular_movies_page(self, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """以 keyset 分頁取得熱門影片，深層頁面與第一頁成本相同"""
+        after = decode_cursor(cursor, ['download_count', 'imdb_id'])
+        try:
+            if after:
+                sql = f"""
+                    SELECT * FROM movies
+                    WHERE {POPULARITY_AFTER}
+                    ORDER BY COALESCE(download_count, 0) DESC, imdb_id DESC
+                    LIMIT ?
+                """
+                params = [after['download_count'], after['download_count'], after['imdb_id'], limit + 1]
+            else:
+                sql = "SELECT * FROM movies ORDER BY COALESCE(download_count, 0) DESC, imdb_id DESC LIMIT ?"
+                params = [limit + 1]
+
+            result = self._execute_query(sql, params)
+            return build_page(result, limit, _movie_cursor)
+        except Exception as e:
+            logger.error(f"分頁取得熱門影片失敗: {e}")
+            return build_page([], limit, _movie_cursor)
+
+    def search_movies_page(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """以 keyset 分頁搜尋影片"""
+        after = decode_cursor(cursor, ['download_count', 'imdb_id'])
+        try:
+            search_term = f"%{query}%"
+            params = [search_term, search_term]
+            keyset_clause = ""
+            if after:
+                keyset_clause = f"AND {POPULARITY_AFTER}"
+                params.extend([after['download_count'], after['download_count'], after['imdb_id']])
+            params.append(limit + 1)
+
+            sql = f"""
+                SELECT * FROM movies
+                WHERE (title LIKE ? OR overview LIKE ?) {keyset_clause}
+                ORDER BY COALESCE(download_count, 0) DESC, imdb_id DESC
+                LIMIT ?
+            """
+            result = self._execute_query(sql, params)
+            return build_page(result, limit, _movie_cursor)
+        except Exception as e:
+            logger.error(f"分頁搜尋影片失敗: {e}")
+            return build_page([], limit, _movie_cursor)
+
     # === 字幕相關操作 ===
     def save_subtitle(self, subtitle_data: Dict[str, Any]) -> str:
-        """儲存字幕內容"""
+        """儲存字幕內容（影片 ID 取自 imdb_id，相容舊呼叫端的 movie_id）"""
+        movie_id = subtitle_data.get('imdb_id') or subtitle_data.get('movie_id')
         try:
             # 先刪除現有字幕
             self._execute_update(
                 "DELETE FROM subtitles WHERE movie_id = ?",
-                [subtitle_data.get('movie_id')]
+                [movie_id]
             )
 
             # 儲存字幕條目
+            entries = subtitle_data.get('parsed_entries') or []
             if 'parsed_entries' in subtitle_data:
-                entries = subtitle_data['parsed_entries']
                 for entry in entries:
                     query = """
                         INSERT INTO subtitles (
@@ -130,7 +548,7 @@ class TursoClient:
                         ) VALUES (?, ?, ?, ?, ?, ?)
                     """
                     params = [
-                        subtitle_data.get('movie_id'),
+                        movie_id,
                         entry.get('index', 0),
                         entry.get('start_time'),
                         entry.get('end_time'),
@@ -143,52 +561,458 @@ class TursoClient:
             metadata_query = """
                 INSERT OR REPLACE INTO subtitle_metadata (
                     movie_id, file_id, file_name, language, download_count,
-                    rating, content, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    rating, content, content_hash, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """
             metadata_params = [
-                subtitle_data.get('movie_id'),
+                movie_id,
                 subtitle_data.get('file_id'),
                 subtitle_data.get('file_name'),
                 subtitle_data.get('language', 'en'),
                 subtitle_data.get('download_count', 0),
                 subtitle_data.get('rating', 0),
                 subtitle_data.get('content', ''),
+                subtitle_content_hash(entries),
                 datetime.now().isoformat()
             ]
             self._execute_update(metadata_query, metadata_params)
 
-            logger.info(f"字幕儲存成功: {subtitle_data.get('movie_id')}")
-            return subtitle_data.get('movie_id')
+            # 增量更新語料庫文件頻率
+            if entries:
+                self.index_subtitle_terms(movie_id, entries)
+
+            self.cache.invalidate_tag(f"subtitles:{movie_id}")
+            logger.info(f"字幕儲存成功: {movie_id}")
+            return movie_id
 
         except Exception as e:
+            self.cache.invalidate_tag(f"subtitles:{movie_id}")
             logger.error(f"儲存字幕失敗: {e}")
             return None
 
     def get_subtitle_by_imdb_id(self, imdb_id: str) -> Optional[Dict]:
         """取得影片字幕元資料"""
         try:
-            query = "SELECT * FROM subtitle_metadata WHERE movie_id = ?"
-            result = self._execute_query(query, [imdb_id])
-            return result[0] if result else None
+            def load():
+                query = "SELECT * FROM subtitle_metadata WHERE movie_id = ?"
+                result = self._execute_query(query, [imdb_id])
+                return result[0] if result else None
+
+            return self._cached_read(('subtitle', imdb_id), [f"subtitles:{imdb_id}"], load)
         except Exception as e:
             logger.error(f"取得字幕元資料失敗 {imdb_id}: {e}")
             return None
 
     def get_subtitle_entries(self, imdb_id: str) -> List[Dict]:
         """取得影片字幕條目"""
+        try:
+            def load():
+                query = """
+                    SELECT * FROM subtitles
+                    WHERE movie_id = ?
+                    ORDER BY sequence_number
+                """
+                return self._execute_query(query, [imdb_id])
+
+            return self._cached_read(('subtitle_entries', imdb_id), [f"subtitles:{imdb_id}"], load)
+        except Exception as e:
+            logger.error(f"取得字幕條目失敗 {imdb_id}: {e}")
+            return []
+
+    def get_movie_ids_with_subtitles(self, after: Optional[str] = None, limit: int = 100) -> List[str]:
+        """依 movie_id 遞增以 keyset 方式列出有字幕的影片"""
+        try:
+            result = self._execute_query(
+                "SELECT movie_id FROM subtitle_metadata WHERE movie_id > ? ORDER BY movie_id LIMIT ?",
+                [after or '', limit]
+            )
+            return [row['movie_id'] for row in result]
+        except Exception as e:
+            logger.error(f"列出有字幕的影片失敗: {e}")
+            return []
+
+    def get_movies_by_imdb_ids(self, imdb_ids: List[str]) -> Dict[str, Dict]:
+        """批次取得影片資訊（不經快取），以 imdb_id 為鍵"""
+        movies = {}
+        try:
+            for start in range(0, len(imdb_ids), IN_QUERY_CHUNK):
+                chunk = imdb_ids[start:start + IN_QUERY_CHUNK]
+                rows = self._execute_query(
+                    f"SELECT * FROM movies WHERE imdb_id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                movies.update((row['imdb_id'], row) for row in rows)
+        except Exception as e:
+            logger.error(f"批次取得影片資訊失敗: {e}")
+        return movies
+
+    def get_subtitle_content_hashes(self, movie_ids: List[str]) -> Dict[str, Optional[str]]:
+        """批次取得字幕內容雜湊（不經快取）"""
+        hashes = {}
+        try:
+            for start in range(0, len(movie_ids), IN_QUERY_CHUNK):
+                chunk = movie_ids[start:start + IN_QUERY_CHUNK]
+                rows = self._execute_query(
+                    f"SELECT movie_id, content_hash FROM subtitle_metadata WHERE movie_id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                hashes.update((row['movie_id'], row.get('content_hash')) for row in rows)
+        except Exception as e:
+            logger.error(f"批次取得字幕內容雜湊失敗: {e}")
+        return hashes
+
+    def stream_subtitle_entries(self, movie_ids: List[str], chunk_size: int = 20) -> Iterator[Tuple[str, List[Dict]]]:
+        """逐部產生 (movie_id, 字幕條目)，每次查詢一批影片且不經快取，避免大量回填時佔滿快取"""
+        for start in range(0, len(movie_ids), chunk_size):
+            chunk = movie_ids[start:start + chunk_size]
+            try:
+                rows = self._execute_query(
+                    f"""
+                        SELECT movie_id, sequence_number, start_time, end_time, text FROM subtitles
+                        WHERE movie_id IN ({', '.join('?' * len(chunk))})
+                        ORDER BY movie_id, sequence_number
+                    """,
+                    chunk
+                )
+            except Exception as e:
+                logger.error(f"批次讀取字幕條目失敗: {e}")
+                rows = []
+
+            grouped: Dict[str, List[Dict]] = {}
+            for row in rows:
+                grouped.setdefault(row['movie_id'], []).append(row)
+            for movie_id in chunk:
+                yield movie_id, grouped.get(movie_id, [])
+
+    def get_subtitle_content_hash(self, imdb_id: str) -> Optional[str]:
+        """取得字幕內容雜湊，舊資料缺少時由字幕條目計算並回填"""
+        try:
+            def load():
+                result = self._execute_query(
+                    "SELECT content_hash FROM subtitle_metadata WHERE movie_id = ?", [imdb_id]
+                )
+                if result and result[0].get('content_hash'):
+                    return result[0]['content_hash']
+
+                entries = self.get_subtitle_entries(imdb_id)
+                if not entries:
+                    return None
+                content_hash = subtitle_content_hash(entries)
+                self._execute_update(
+                    "UPDATE subtitle_metadata SET content_hash = ? WHERE movie_id = ?", [content_hash, imdb_id]
+                )
+                return content_hash
+
+            return self._cached_read(('subtitle_hash', imdb_id), [f"subtitles:{imdb_id}"], load)
+        except Exception as e:
+            logger.error(f"取得字幕內容雜湊失敗 {imdb_id}: {e}")
+            return None
+
+    def get_subtitle_entries_page(self, imdb_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """以 keyset 分頁取得字幕條目"""
+        after = decode_cursor(cursor, ['sequence_number'])
         try:
             query = """
                 SELECT * FROM subtitles
-                WHERE movie_id = ?
+                WHERE movie_id = ? AND sequence_number > ?
                 ORDER BY sequence_number
+                LIMIT ?
             """
-            result = self._execute_query(query, [imdb_id])
-            return result
+            start = after['sequence_number'] if after else -1
+            result = self._execute_query(query, [imdb_id, start, limit + 1])
+            return build_page(result, limit, _entry_cursor)
         except Exception as e:
-            logger.error(f"取得字幕條目失敗 {imdb_id}: {e}")
+            logger.error(f"分頁取得字幕條目失敗 {imdb_id}: {e}")
+            return build_page([], limit, _entry_cursor)
+
+    # === 語料庫詞彙索引 ===
+    def index_subtitle_terms(self, movie_id: str, entries: List[Dict]) -> bool:
+        """由字幕條目計算詞頻並更新語料庫索引"""
+        counts, lowercase = count_terms(entry.get('text') or '' for entry in entries)
+        return self.update_corpus_index(movie_id, counts, lowercase)
+
+    def update_corpus_index(self, movie_id: str, counts: Dict[str, int], lowercase: set) -> bool:
+        """單一交易內先扣除該影片舊的詞彙再加入新的詞彙，成本與影片的不重複單字數成正比"""
+        if not movie_id or not counts:
+            return False
+
+        terms = list(counts)
+        with self._lock:
+            try:
+                self.conn.execute("BEGIN")
+                previous = _rows_to_dicts(self.conn.execute(
+                    "SELECT term_ids, lower_flags FROM movie_terms WHERE movie_id = ?", [movie_id]
+                ))
+                if previous:
+                    old_ids = unpack_ids(previous[0]['term_ids'])
+                    old_flags = unpack_flags(previous[0]['lower_flags'])
+                    self.conn.executemany(
+                        "UPDATE corpus_terms SET df = df - 1, lower_df = lower_df - ? WHERE term_id = ?",
+                        [(int(flag), int(term_id)) for term_id, flag in zip(old_ids, old_flags)]
+                    )
+
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO corpus_terms (term, df, lower_df) VALUES (?, 0, 0)",
+                    [(term,) for term in terms]
+                )
+                self.conn.executemany(
+                    "UPDATE corpus_terms SET df = df + 1, lower_df = lower_df + ? WHERE term = ?",
+                    [(int(term in lowercase), term) for term in terms]
+                )
+
+                term_ids = {}
+                for start in range(0, len(terms), IN_QUERY_CHUNK):
+                    chunk = terms[start:start + IN_QUERY_CHUNK]
+                    rows = _rows_to_dicts(self.conn.execute(
+                        f"SELECT term_id, term FROM corpus_terms WHERE term IN ({', '.join('?' * len(chunk))})", chunk
+                    ))
+                    term_ids.update((row['term'], row['term_id']) for row in rows)
+
+                ids, values, flags = sorted_term_arrays(term_ids, counts, lowercase)
+                self.conn.execute(
+                    """
+                        INSERT OR REPLACE INTO movie_terms (
+                            movie_id, term_ids, term_counts, lower_flags, total_tokens, updated_at
+                        ) VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [movie_id, pack_ids(ids), pack_ids(values), pack_flags(flags),
+                     int(values.sum()), datetime.now().isoformat()]
+                )
+                self._write_minhash(movie_id, ids[flags])
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                logger.error(f"更新語料庫索引失敗 {movie_id}: {e}")
+                try:
+                    self.conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+                return False
+
+        self._mark_written(tables=("corpus_terms", "movie_terms", "movie_minhash", "lsh_bands"))
+        logger.info(f"語料庫索引已更新: {movie_id}，{len(terms)} 個不重複單字")
+        return True
+
+    def _write_minhash(self, movie_id: str, term_ids) -> None:
+        """以詞彙集合（排除專有名詞）重算 MinHash 簽章並取代 LSH 桶；呼叫端須持有鎖並在交易中"""
+        self.conn.execute("DELETE FROM lsh_bands WHERE movie_id = ?", [movie_id])
+        if not len(term_ids):
+            self.conn.execute("DELETE FROM movie_minhash WHERE movie_id = ?", [movie_id])
+            return
+
+        signature = minhash_signature(term_ids)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO movie_minhash (movie_id, signature, term_count, updated_at) VALUES (?, ?, ?, ?)",
+            [movie_id, pack_ids(signature), len(term_ids), datetime.now().isoformat()]
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO lsh_bands (bucket, movie_id) VALUES (?, ?)",
+            [(bucket, movie_id) for bucket in band_buckets(signature)]
+        )
+
+    def ensure_minhash(self, movie_id: str) -> bool:
+        """語料庫索引早於相似影片索引的影片，由 movie_terms 補建簽章"""
+        try:
+            if self._execute_query("SELECT 1 FROM movie_minhash WHERE movie_id = ?", [movie_id]):
+                return True
+            result = self._execute_query("SELECT term_ids, lower_flags FROM movie_terms WHERE movie_id = ?", [movie_id])
+            if not result:
+                return False
+
+            term_ids = unpack_ids(result[0]['term_ids'])[unpack_flags(result[0]['lower_flags'])]
+            with self._lock:
+                try:
+                    self.conn.execute("BEGIN")
+                    self._write_minhash(movie_id, term_ids)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+            self._mark_written(tables=("movie_minhash", "lsh_bands"))
+            return True
+        except Exception as e:
+            logger.error(f"補建相似影片索引失敗 {movie_id}: {e}")
+            return False
+
+    def find_similar_movies(self, movie_id: str, limit: int = 10, candidate_limit: int = 200) -> List[Dict[str, Any]]:
+        """由 LSH 桶找出候選影片，再以 MinHash 簽章估計詞彙 Jaccard 相似度排序"""
+        try:
+            if not self.ensure_minhash(movie_id):
+                return []
+            result = self._execute_query("SELECT signature FROM movie_minhash WHERE movie_id = ?", [movie_id])
+            if not result:
+                return []
+            signature = unpack_ids(result[0]['signature'])
+
+            buckets = band_buckets(signature)
+            candidates = self._execute_query(
+                f"""
+                    SELECT movie_id, COUNT(*) AS shared_bands FROM lsh_bands
+                    WHERE bucket IN ({', '.join('?' * len(buckets))}) AND movie_id != ?
+                    GROUP BY movie_id
+                    ORDER BY shared_bands DESC
+                    LIMIT ?
+                """,
+                [*buckets, movie_id, candidate_limit]
+            )
+            if not candidates:
+                return []
+
+            shared = {row['movie_id']: row['shared_bands'] for row in candidates}
+            ids = list(shared)
+            rows = self._execute_query(
+                f"SELECT movie_id, signature FROM movie_minhash WHERE movie_id IN ({', '.join('?' * len(ids))})", ids
+            )
+            if not rows:
+                return []
+
+            similarity = estimate_jaccard(signature, [unpack_ids(row['signature']) for row in rows])
+            ranked = sorted(zip(rows, similarity), key=lambda item: -item[1])[:limit]
+            return [
+                {
+                    "movie_id": row['movie_id'],
+                    "similarity": round(float(value), 4),
+                    "shared_bands": shared[row['movie_id']]
+                }
+                for row, value in ranked
+            ]
+
+        except Exception as e:
+            logger.error(f"查詢相似影片失敗 {movie_id}: {e}")
+            return []
+
+    def get_corpus_size(self) -> int:
+        """語料庫中已建立索引的影片數"""
+        try:
+            result = self._execute_query("SELECT value FROM stats_counters WHERE name = 'corpus_documents'")
+            if result:
+                return result[0]['value']
+            result = self._execute_query(EXACT_COUNT_QUERIES['corpus_documents'])
+            return result[0]['count'] if result else 0
+        except Exception as e:
+            logger.error(f"取得語料庫大小失敗: {e}")
+            return 0
+
+    def get_movie_corpus_frequencies(self, movie_id: str, entries: Optional[List[Dict]] = None) -> Optional[CorpusFrequencies]:
+        """取得影片中各單字的語料庫文件頻率；尚未建立索引且提供字幕條目時先補建"""
+        try:
+            result = self._execute_query("SELECT term_ids FROM movie_terms WHERE movie_id = ?", [movie_id])
+            if not result and entries:
+                if self.index_subtitle_terms(movie_id, entries):
+                    result = self._execute_query("SELECT term_ids FROM movie_terms WHERE movie_id = ?", [movie_id])
+            if not result:
+                return None
+
+            term_ids = unpack_ids(result[0]['term_ids']).tolist()
+            frequencies = CorpusFrequencies(documents=self.get_corpus_size())
+            for start in range(0, len(term_ids), IN_QUERY_CHUNK):
+                chunk = term_ids[start:start + IN_QUERY_CHUNK]
+                rows = self._execute_query(
+                    f"SELECT term, df, lower_df FROM corpus_terms WHERE term_id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                for row in rows:
+                    frequencies.df[row['term']] = row['df']
+                    frequencies.lower_df[row['term']] = row['lower_df']
+            return frequencies
+
+        except Exception as e:
+            logger.error(f"取得語料庫文件頻率失敗 {movie_id}: {e}")
+            return None
+
+    def get_movie_terms(self, movie_id: str) -> Optional[Dict]:
+        """取得影片的詞彙索引列（term id、次數、小寫旗標 BLOB）"""
+        try:
+            result = self._execute_query(
+                "SELECT movie_id, term_ids, term_counts, lower_flags, total_tokens FROM movie_terms WHERE movie_id = ?",
+                [movie_id]
+            )
+            return result[0] if result else None
+        except Exception as e:
+            logger.error(f"取得影片詞彙索引失敗 {movie_id}: {e}")
+            return None
+
+    def get_all_movie_terms(self) -> List[Dict]:
+        """取得全片庫的詞彙索引列，供覆蓋率排名常駐記憶體"""
+        try:
+            return self._execute_query(
+                "SELECT movie_id, term_ids, term_counts, lower_flags FROM movie_terms ORDER BY movie_id"
+            )
+        except Exception as e:
+            logger.error(f"取得片庫詞彙索引失敗: {e}")
+            return []
+
+    def get_movie_terms_fingerprint(self) -> Optional[tuple]:
+        """片庫詞彙索引的版本指紋（影片數與最後更新時間）"""
+        try:
+            result = self._execute_query("SELECT COUNT(*) AS count, MAX(updated_at) AS updated FROM movie_terms")
+            return (result[0]['count'], result[0]['updated']) if result else None
+        except Exception as e:
+            logger.error(f"取得片庫詞彙索引指紋失敗: {e}")
+            return None
+
+    def get_term_ids(self, terms: List[str], create: bool = False) -> Dict[str, int]:
+        """取得單字的語料庫 term id；create 時為尚未出現在片庫的單字配置 id"""
+        term_ids = {}
+        try:
+            if create and terms:
+                self._execute_batch(
+                    "INSERT OR IGNORE INTO corpus_terms (term, df, lower_df) VALUES (?, 0, 0)", [[term] for term in terms]
+                )
+            for start in range(0, len(terms), IN_QUERY_CHUNK):
+                chunk = terms[start:start + IN_QUERY_CHUNK]
+                rows = self._execute_query(
+                    f"SELECT term_id, term FROM corpus_terms WHERE term IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                term_ids.update((row['term'], row['term_id']) for row in rows)
+        except Exception as e:
+            logger.error(f"取得 term id 失敗: {e}")
+        return term_ids
+
+    def get_terms_by_ids(self, term_ids: List[int]) -> Dict[int, str]:
+        """由 term id 取得單字"""
+        terms = {}
+        try:
+            for start in range(0, len(term_ids), IN_QUERY_CHUNK):
+                chunk = term_ids[start:start + IN_QUERY_CHUNK]
+                rows = self._execute_query(
+                    f"SELECT term_id, term FROM corpus_terms WHERE term_id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                terms.update((row['term_id'], row['term']) for row in rows)
+        except Exception as e:
+            logger.error(f"由 term id 取得單字失敗: {e}")
+        return terms
+
+    def get_all_terms(self) -> List[Dict]:
+        """取得語料庫所有單字與 term id"""
+        try:
+            return self._execute_query("SELECT term_id, term FROM corpus_terms")
+        except Exception as e:
+            logger.error(f"取得語料庫單字失敗: {e}")
             return []
 
+    # === 學習者已知單字 ===
+    def get_known_words(self, user_id: str) -> Optional[Dict]:
+        """取得學習者的已知單字位元組"""
+        try:
+            def load():
+                result = self._execute_query("SELECT * FROM user_known_words WHERE user_id = ?", [user_id])
+                return result[0] if result else None
+
+            return self._cached_read(('known_words', user_id), [], load)
+        except Exception as e:
+            logger.error(f"取得已知單字失敗 {user_id}: {e}")
+            return None
+
+    def save_known_words(self, user_id: str, bitset: bytes, word_count: int) -> bool:
+        """儲存學習者的已知單字位元組"""
+        try:
+            updated = self._execute_update(
+                "INSERT OR REPLACE INTO user_known_words (user_id, bitset, word_count, updated_at) VALUES (?, ?, ?, ?)",
+                [user_id, bitset, word_count, datetime.now().isoformat()]
+            )
+            self.cache.invalidate(('known_words', user_id))
+            return updated
+        except Exception as e:
+            logger.error(f"儲存已知單字失敗 {user_id}: {e}")
+            return False
+
     # === 生字筆記相關操作 ===
     def save_vocabulary(self, vocab_data: Dict[str, Any]) -> str:
         """儲存生字筆記"""
@@ -320,66 +1144,334 @@ class TursoClient:
     def save_analysis(self, analysis_data: Dict[str, Any]) -> bool:
         """儲存分析結果"""
         try:
-            query = """
-                INSERT OR REPLACE INTO analysis_results (
-                    movie_id, analysis_type, data, created_at
-                ) VALUES (?, ?, ?, ?)
-            """
-
-            params = [
-                analysis_data.get('movie_id'),
-                analysis_data.get('analysis_type'),
-                json.dumps(analysis_data.get('data', {})),
-                datetime.now().isoformat()
-            ]
-
-            return self._execute_update(query, params)
+            updated = self._execute_update(SAVE_ANALYSIS_QUERY, _analysis_params(analysis_data))
+            self.cache.invalidate(('analysis', analysis_data.get('movie_id'), analysis_data.get('analysis_type')))
+            self.cache.invalidate(('analysis_version', analysis_data.get('movie_id'), analysis_data.get('analysis_type')))
+            return updated
         except Exception as e:
             logger.error(f"儲存分析結果失敗: {e}")
             return False
 
+    def save_analyses(self, analyses: List[Dict[str, Any]]) -> bool:
+        """在單一交易中批次儲存多筆分析結果"""
+        if not analyses:
+            return True
+        try:
+            saved = self._execute_batch(SAVE_ANALYSIS_QUERY, [_analysis_params(analysis) for analysis in analyses])
+            for analysis in analyses:
+                self.cache.invalidate(('analysis', analysis.get('movie_id'), analysis.get('analysis_type')))
+                self.cache.invalidate(('analysis_version', analysis.get('movie_id'), analysis.get('analysis_type')))
+            if saved:
+                logger.info(f"批次儲存分析結果成功: {len(analyses)} 筆")
+            return saved
+        except Exception as e:
+            logger.error(f"批次儲存分析結果失敗: {e}")
+            return False
+
+    def get_analyses(self, movie_ids: List[str], analysis_type: str) -> Dict[str, Dict]:
+        """批次取得多部影片的分析結果（不經快取），以 movie_id 為鍵"""
+        analyses = {}
+        try:
+            for start in range(0, len(movie_ids), IN_QUERY_CHUNK):
+                chunk = movie_ids[start:start + IN_QUERY_CHUNK]
+                rows = self._execute_query(
+                    f"SELECT * FROM analysis_results WHERE analysis_type = ? AND movie_id IN ({', '.join('?' * len(chunk))})",
+                    [analysis_type, *chunk]
+                )
+                analyses.update((row['movie_id'], row) for row in rows)
+        except Exception as e:
+            logger.error(f"批次取得分析結果失敗: {e}")
+        return analyses
+
     def get_analysis(self, movie_id: str, analysis_type: str) -> Optional[Dict]:
         """取得分析結果"""
         try:
-            query = "SELECT * FROM analysis_results WHERE movie_id = ? AND analysis_type = ?"
-            result = self._execute_query(query, [movie_id, analysis_type])
-            return result[0] if result else None
+            def load():
+                query = "SELECT * FROM analysis_results WHERE movie_id = ? AND analysis_type = ?"
+                result = self._execute_query(query, [movie_id, analysis_type])
+                return result[0] if result else None
+
+            return self._cached_read(('analysis', movie_id, analysis_type), [], load)
         except Exception as e:
             logger.error(f"取得分析結果失敗 {movie_id}: {e}")
             return None
 
-    def get_statistics(self) -> Dict[str, Any]:
-        """取得資料庫統計資訊"""
+    def get_analysis_version(self, movie_id: str, analysis_type: str) -> Optional[Dict]:
+        """只取得分析結果的版本欄位（不含分析內容），供 ETag 與過期判斷"""
         try:
-            stats = {}
+            def load():
+                result = self._execute_query(
+                    """
+                    SELECT movie_id, analysis_type, content_hash, analyzer_version, section_versions, created_at
+                    FROM analysis_results WHERE movie_id = ? AND analysis_type = ?
+                    """,
+                    [movie_id, analysis_type]
+                )
+                return result[0] if result else None
+
+            return self._cached_read(('analysis_version', movie_id, analysis_type), [], load)
+        except Exception as e:
+            logger.error(f"取得分析版本失敗 {movie_id}: {e}")
+            return None
+
+    # === 片語相關操作 ===
+    def save_movie_phrases(self, phrases_by_movie: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """在單一交易中以新的片語取代各影片既有的片語"""
+        if not phrases_by_movie:
+            return True
+
+        now = datetime.now().isoformat()
+        with self._lock:
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "DELETE FROM movie_phrases WHERE movie_id = ?", [(movie_id,) for movie_id in phrases_by_movie]
+                )
+                self.conn.executemany(
+                    """
+                        INSERT OR REPLACE INTO movie_phrases (
+                            movie_id, phrase, n, count, pmi, score, example, cue_index, created_at
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (movie_id, item['phrase'], item['n'], item['count'], item.get('pmi'), item.get('score'),
+                         item.get('example'), item.get('cue_index'), now)
+                        for movie_id, phrases in phrases_by_movie.items()
+                        for item in phrases
+                    ]
+                )
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                logger.error(f"儲存片語失敗: {e}")
+                try:
+                    self.conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+                return False
+
+        self._mark_written(tables=("movie_phrases",))
+        for movie_id in phrases_by_movie:
+            self.cache.invalidate(('phrases', movie_id))
+        return True
+
+    def get_movie_phrases(self, movie_id: str, limit: int = 30) -> List[Dict]:
+        """取得影片的片語，依分數由高到低"""
+        try:
+            def load():
+                query = "SELECT * FROM movie_phrases WHERE movie_id = ? ORDER BY score DESC"
+                return self._execute_query(query, [movie_id])
+
+            return (self._cached_read(('phrases', movie_id), [], load) or [])[:limit]
+        except Exception as e:
+            logger.error(f"取得片語失敗 {movie_id}: {e}")
+            return []
 
-            # 影片統計
-            movie_count = self._execute_query("SELECT COUNT(*) as count FROM movies")
-            stats['movies'] = movie_count[0]['count'] if movie_count else 0
+    # === 分析工作相關操作 ===
+    def save_job(self, job: Dict[str, Any]) -> bool:
+        """儲存分析工作狀態"""
+        try:
+            params = [
+                job.get('job_id'),
+                job.get('movie_id'),
+                job.get('analysis_type'),
+                job.get('analyzer_version'),
+                job.get('status'),
+                job.get('error'),
+                job.get('submitted_at'),
+                job.get('started_at'),
+                job.get('finished_at'),
+                job.get('queue_ms'),
+                job.get('run_ms')
+            ]
+            return self._execute_update(SAVE_JOB_QUERY, params)
+        except Exception as e:
+            logger.error(f"儲存分析工作失敗: {e}")
+            return False
 
-            # 字幕統計
-            subtitle_count = self._execute_query("SELECT COUNT(DISTINCT movie_id) as count FROM subtitles")
-            stats['movies_with_subtitles'] = subtitle_count[0]['count'] if subtitle_count else 0
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """取得分析工作狀態"""
+        try:
+            result = self._execute_query("SELECT * FROM analysis_jobs WHERE job_id = ?", [job_id])
+            return result[0] if result else None
+        except Exception as e:
+            logger.error(f"取得分析工作失敗 {job_id}: {e}")
+            return None
 
-            # 生字筆記統計
-            vocab_count = self._execute_query("SELECT COUNT(*) as count FROM vocabulary_notes")
-            stats['vocabulary_notes'] = vocab_count[0]['count'] if vocab_count else 0
+    def get_unfinished_jobs(self) -> List[Dict]:
+        """取得排隊中或執行中的分析工作"""
+        try:
+            query = """
+                SELECT * FROM analysis_jobs
+                WHERE status IN ('queued', 'running')
+                ORDER BY submitted_at
+            """
+            return self._execute_query(query)
+        except Exception as e:
+            logger.error(f"取得未完成分析工作失敗: {e}")
+            return []
 
-            # 練習題統計
-            exercise_count = self._execute_query("SELECT COUNT(*) as count FROM practice_exercises")
-            stats['exercises'] = exercise_count[0]['count'] if exercise_count else 0
+    # === 統計相關操作 ===
+    def get_statistics(self, exact: bool = False) -> Dict[str, Any]:
+        """取得資料庫統計資訊，預設讀取計數器，exact=True 時執行完整統計（稽核用）"""
+        if exact:
+            return self._get_exact_statistics()
 
+        try:
+            rows = self._execute_query("SELECT name, value, reconciled_at FROM stats_counters")
+            stats = {name: 0 for name in EXACT_COUNT_QUERIES}
+            reconciled_at = None
+            for row in rows:
+                if row['name'] in stats:
+                    stats[row['name']] = row['value']
+                    reconciled_at = max(filter(None, [reconciled_at, row.get('reconciled_at')]), default=None)
+            stats['reconciled_at'] = reconciled_at
+            return stats
+
+        except Exception as e:
+            logger.error(f"讀取統計計數器失敗，改用精確統計: {e}")
+            return self._get_exact_statistics()
+
+    def _get_exact_statistics(self) -> Dict[str, Any]:
+        """以完整資料表統計取得精確數值"""
+        try:
+            stats = {}
+            for name, query in EXACT_COUNT_QUERIES.items():
+                result = self._execute_query(query)
+                stats[name] = result[0]['count'] if result else 0
+            stats['exact'] = True
             return stats
 
         except Exception as e:
             logger.error(f"取得統計資訊失敗: {e}")
             return {}
 
+    def reconcile_counters(self) -> Dict[str, Any]:
+        """以精確統計覆寫計數器，修正觸發器可能累積的誤差"""
+        now = datetime.now().isoformat()
+        reconciled = {}
+        for name, query in EXACT_COUNT_QUERIES.items():
+            # 單一陳述式內完成計算與寫入，避免與並行寫入交錯
+            if self._execute_update(
+                f"UPDATE stats_counters SET value = ({query}), reconciled_at = ? WHERE name = ?",
+                [now, name]
+            ):
+                reconciled[name] = now
+        logger.info(f"統計計數器校正完成: {list(reconciled)}")
+        return reconciled
+
+    def start_counter_reconciler(self, interval: float):
+        """啟動背景定期校正計數器"""
+        if self._reconcile_thread and self._reconcile_thread.is_alive():
+            return
+
+        def run():
+            while not self._reconcile_stop.wait(interval):
+                try:
+                    self.reconcile_counters()
+                except Exception as e:
+                    logger.error(f"定期校正統計計數器失敗: {e}")
+
+        self._reconcile_stop.clear()
+        self._reconcile_thread = threading.Thread(target=run, name="stats-reconciler", daemon=True)
+        self._reconcile_thread.start()
+        logger.info(f"統計計數器定期校正已啟動，間隔 {interval} 秒")
+
     def close(self):
         """關閉資料庫連線"""
         try:
+            self._reconcile_stop.set()
+            if self.replica:
+                self.replica.close()
             if hasattr(self, 'conn'):
                 self.conn.close()
                 logger.info("Turso 資料庫連線已關閉")
         except Exception as e:
-            logger.error(f"關閉資料庫連線失敗: {e}")
\ No newline at end of file
+            logger.error(f"關閉資料庫連線失敗: {e}")
+
+
+def _movie_params(movie_data: Dict[str, Any]) -> List:
+    """影片寫入參數"""
+    return [
+        movie_data.get('imdb_id'),
+        movie_data.get('title'),
+        movie_data.get('year'),
+        movie_data.get('type'),
+        movie_data.get('poster_url'),
+        movie_data.get('download_count', 0),
+        movie_data.get('overview', ''),
+        movie_data.get('created_at', datetime.now().isoformat()),
+        movie_data.get('updated_at', datetime.now().isoformat())
+    ]
+
+
+def _analysis_params(analysis_data: Dict[str, Any]) -> List:
+    """分析結果寫入參數"""
+    return [
+        analysis_data.get('movie_id'),
+        analysis_data.get('analysis_type'),
+        json.dumps(analysis_data.get('data', {})),
+        analysis_data.get('content_hash'),
+        analysis_data.get('analyzer_version'),
+        json.dumps(analysis_data.get('section_versions', {})),
+        datetime.now().isoformat()
+    ]
+
+
+def subtitle_content_hash(entries: List[Dict]) -> Optional[str]:
+    """字幕條目內容雜湊，解析後的條目與資料庫條目計算結果一致"""
+    if not entries:
+        return None
+    digest = hashlib.sha256()
+    for entry in entries:
+        sequence = entry.get('sequence_number', entry.get('index', 0))
+        digest.update(f"{sequence}\x1f{entry.get('start_time')}\x1f{entry.get('end_time')}\x1f{entry.get('text')}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _query_name(query: str) -> str:
+    """查詢名稱，例如 select_movies、insert_subtitles；同一段 SQL 只解析一次"""
+    name = _query_names.get(query)
+    if name is None:
+        words = query.split(None, 1)
+        verb = words[0].lower() if words else "unknown"
+        table = QUERY_TABLE_PATTERN.search(query)
+        name = f"{verb}_{table.group(1).lower()}" if table else verb
+        if len(_query_names) < QUERY_NAME_CACHE_MAX:
+            _query_names[query] = name
+    return name
+
+
+@contextmanager
+def _observe_query(operation: str, query: str):
+    """記錄查詢延遲、失敗次數與追蹤區段（含等待連線鎖的時間）"""
+    name = _query_name(query)
+    started = time.perf_counter()
+    with span(operation, {"db.system": "libsql", "db.operation": name}) as query_span:
+        try:
+            yield query_span
+        except Exception:
+            DB_QUERY_ERRORS.labels(name).inc()
+            raise
+        finally:
+            DB_QUERY_DURATION.labels(name).observe(time.perf_counter() - started)
+
+
+def _rows_to_dicts(result: Any) -> List[Dict]:
+    """將查詢結果轉為 dict 列表，支援 ResultSet.rows 與 DB-API cursor"""
+    if hasattr(result, 'rows'):
+        return [dict(row) for row in result.rows]
+    description = getattr(result, 'description', None)
+    if description:
+        columns = [column[0] for column in description]
+        return [dict(zip(columns, row)) for row in result.fetchall()]
+    return []
+
+
+def _movie_cursor(movie: Dict) -> Dict[str, Any]:
+    """影片列表的排序鍵"""
+    return {'download_count': movie.get('download_count') or 0, 'imdb_id': movie.get('imdb_id')}
+
+
+def _entry_cursor(entry: Dict) -> Dict[str, Any]:
+    """字幕條目的排序鍵"""
+    return {'sequence_number': entry.get('sequence_number', entry.get('index', 0))}
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def _movie_to_dict(movie: Any) -> Dict[str, Any]:
+    """將 MovieInfo 或 dict 正規化為可序列化的 dict"""
+    if is_dataclass(movie):
+        return asdict(movie)
+    return dict(movie)
+
+
+class WriteBehindQueue:
+    """影片寫入的延遲批次佇列：依 imdb_id 合併、本地日誌持久化、定時或滿批寫入"""
+
+    def __init__(self, turso_client, journal_path: str, max_batch: int = 50, flush_interval: float = 2.0):
+        self.turso_client = turso_client
+        self.journal_path = journal_path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # 序列化 flush，避免背景執行緒與關閉流程同時寫入
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_seconds = 0.0
+        # 資料庫停用或初始化失敗時暫停寫入，資料保留在本地日誌，恢復後接續
+        self.paused = False
+
+        journal_dir = os.path.dirname(journal_path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self._journal = sqlite3.connect(journal_path, check_same_thread=False, isolation_level=None)
+        self._journal.execute("PRAGMA journal_mode=WAL")
+        self._journal.execute("PRAGMA synchronous=NORMAL")
+        self._journal.execute("""
+            CREATE TABLE IF NOT EXISTS pending_movies (
+                imdb_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL
+            )
+        """)
+        self._recover()
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def _recover(self):
+        """重新載入上次未寫入的日誌項目"""
+        rows = self._journal.execute("SELECT imdb_id, payload FROM pending_movies").fetchall()
+        for imdb_id, payload in rows:
+            self._pending[imdb_id] = json.loads(payload)
+        if rows:
+            logger.info(f"從寫入日誌恢復 {len(rows)} 筆未完成的影片寫入")
+            self._wakeup.set()
+
+    def enqueue_movies(self, movies: List[Any]) -> int:
+        """加入待寫入影片，同一 imdb_id 只保留最新一筆"""
+        records = []
+        for movie in movies:
+            record = _movie_to_dict(movie)
+            if record.get('imdb_id'):
+                records.append(record)
+        if not records:
+            return 0
+
+        now = time.time()
+        with self._lock:
+            # 先寫本地日誌再回應，確保當機後可恢復
+            self._journal.execute("BEGIN")
+            self._journal.executemany(
+                "INSERT OR REPLACE INTO pending_movies (imdb_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                [(record['imdb_id'], json.dumps(record, ensure_ascii=False, default=str), now) for record in records]
+            )
+            self._journal.execute("COMMIT")
+
+            for record in records:
+                if record['imdb_id'] in self._pending:
+                    self.coalesced += 1
+                self._pending[record['imdb_id']] = record
+            self.enqueued += len(records)
+            pending_count = len(self._pending)
+
+        if pending_count >= self.max_batch:
+            self._wakeup.set()
+        return len(records)
+
+    def _run(self):
+        """背景寫入迴圈"""
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            if not self._database_available():
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"延遲寫入失敗: {e}")
+
+    def _database_available(self) -> bool:
+        """資料庫是否可寫入（延遲建立的客戶端失敗時為 False，並在背景重試）；狀態改變時記錄一次"""
+        available = bool(self.turso_client)
+        if available == self.paused:
+            self.paused = not available
+            if self.paused:
+                logger.warning(f"資料庫無法使用，暫停延遲寫入（{len(self._pending)} 筆保留在日誌中）")
+            else:
+                logger.info("資料庫已恢復，繼續延遲寫入")
+        return available
+
+    def flush(self) -> int:
+        """將待寫入影片分批寫入資料庫，回傳成功筆數"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    batch_ids = list(self._pending)[:self.max_batch]
+                    batch = [self._pending[imdb_id] for imdb_id in batch_ids]
+
+                started = time.perf_counter()
+                if not self.turso_client.save_movies(batch):
+                    self.failures += 1
+                    logger.warning(f"延遲寫入批次失敗，{len(batch)} 筆將於下次重試")
+                    break
+
+                with self._lock:
+                    done = []
+                    for imdb_id, record in zip(batch_ids, batch):
+                        # 寫入期間若有更新版本，保留在佇列中等下一批
+                        if self._pending.get(imdb_id) is record:
+                            del self._pending[imdb_id]
+                            done.append((imdb_id,))
+                    self._journal.execute("BEGIN")
+                    self._journal.executemany("DELETE FROM pending_movies WHERE imdb_id = ?", done)
+                    self._journal.execute("COMMIT")
+
+                self.batches += 1
+                self.flushed += len(batch)
+                self.last_flush_seconds = time.perf_counter() - started
+                written += len(batch)
+        return written
+
+    def pending_count(self) -> int:
+        """待寫入筆數"""
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """取得佇列指標"""
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "paused": self.paused,
+            "last_flush_seconds": round(self.last_flush_seconds, 4)
+        }
+
+    def close(self):
+        """停止背景執行緒並寫完所有待寫入資料"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+
+        try:
+            if self._database_available():
+                self.flush()
+        except Exception as e:
+            logger.error(f"關閉前寫入失敗: {e}")
+
+        remaining = len(self._pending)
+        if remaining:
+            logger.warning(f"仍有 {remaining} 筆影片未寫入，已保留在日誌中待下次啟動恢復")
+        self._journal.close()
+        logger.info("延遲寫入佇列已關閉")